@@ -0,0 +1,176 @@
+"""
+多设备批量分析
+
+大量同类小设备逐台调用 analyze_device_status 时，系统提示词和分析要求在每个请求中
+重复发送。批量模式把多台设备的紧凑记录打包进一个请求：
+- 按 token 预算和输出长度上限决定每批的设备数
+- 要求模型返回以 device_id 区分的 JSON 数组，逐项校验后拆分回单台设备的结果
+- 响应中缺失或不合格的设备单独重试（使用 analyze_device_status）
+- compare_throughput 对比单台模式和批量模式的每秒设备数
+
+使用示例:
+    results = agent.analyze_devices_batch(devices, token_budget=6000)
+    comparison = compare_throughput(agent, devices[:50])
+    print_throughput_comparison(comparison)
+"""
+
+import json
+import re
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+VALID_STATUSES = ("normal", "warning", "abnormal", "fault")
+
+_CJK = re.compile("[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+_JSON_ARRAY = re.compile(r"\[.*\]", re.DOTALL)
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符约 1.5 个字符一个 token，其他约 4 个字符一个 token"""
+    cjk = len(_CJK.findall(text))
+    return int(cjk / 1.5 + (len(text) - cjk) / 4) + 1
+
+
+def compact_device(device: Dict[str, Any]) -> str:
+    """设备记录的紧凑 JSON（无缩进、无多余空格）"""
+    return json.dumps(device, ensure_ascii=False, separators=(",", ":"))
+
+
+def pack_batches(
+    devices: Sequence[Dict[str, Any]],
+    token_budget: int,
+    max_batch_size: int,
+    overhead_tokens: int = 0
+) -> List[List[int]]:
+    """
+    按顺序把设备装入批次，每批的输入 token 不超过预算、设备数不超过上限
+
+    Args:
+        devices: 设备数据列表
+        token_budget: 每个请求的输入 token 预算（含提示词）
+        max_batch_size: 每批的最大设备数
+        overhead_tokens: 每个请求固定的提示词 token 数
+
+    Returns:
+        批次列表，每批为设备在 devices 中的下标；单台超出预算的设备独占一批
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = overhead_tokens
+    for index, device in enumerate(devices):
+        tokens = estimate_tokens(compact_device(device))
+        if current and (used + tokens > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current, used = [], overhead_tokens
+        current.append(index)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_batch_response(text: str, device_ids: Sequence[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    解析并校验批量响应
+
+    每项必须是包含本批 device_id 的对象，status 为合法状态，health_score 为 0-100 的数字；
+    重复的 device_id 只保留第一项，不属于本批的项被忽略。
+
+    Args:
+        text: 模型回答（允许被 ```json 代码块或其他文字包裹）
+        device_ids: 本批的设备 ID
+
+    Returns:
+        (device_id -> 结果, 缺失或不合格的 device_id 列表)
+    """
+    expected = set(device_ids)
+    results: Dict[str, Dict[str, Any]] = {}
+    match = _JSON_ARRAY.search(text or "")
+    items = []
+    if match:
+        try:
+            items = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            items = []
+    if not isinstance(items, list):
+        items = []
+
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        device_id = str(item.get("device_id", ""))
+        if device_id not in expected or device_id in results:
+            continue
+        if str(item.get("status", "")).lower() not in VALID_STATUSES:
+            continue
+        score = item.get("health_score")
+        if not isinstance(score, (int, float)) or not 0 <= score <= 100:
+            continue
+        results[device_id] = item
+
+    missing = [device_id for device_id in device_ids if device_id not in results]
+    return results, missing
+
+
+def compare_throughput(
+    agent: Any,
+    devices: Sequence[Dict[str, Any]],
+    max_workers: int = 4,
+    **batch_kwargs: Any
+) -> Dict[str, Any]:
+    """
+    用同样的并发度分别以单台模式和批量模式分析同一组设备，对比吞吐量
+
+    Args:
+        agent: DeviceMonitorAgent
+        devices: 设备数据列表
+        max_workers: 同时在途的最大请求数
+        **batch_kwargs: 传给 analyze_devices_batch 的其他参数
+
+    Returns:
+        {"single": {...}, "batch": {...}, "speedup": 批量/单台的每秒设备数之比}
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(agent.analyze_device_status, devices))
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    agent.analyze_devices_batch(devices, max_workers=max_workers, **batch_kwargs)
+    batch_seconds = time.perf_counter() - start
+    batch_stats = dict(agent.last_batch_stats)
+
+    single = {
+        "devices": len(devices),
+        "requests": len(devices),
+        "seconds": round(single_seconds, 2),
+        "devices_per_second": round(len(devices) / single_seconds, 2) if single_seconds else None,
+    }
+    batch = {
+        "devices": len(devices),
+        "requests": batch_stats["requests"],
+        "batches": batch_stats["batches"],
+        "retried": batch_stats["retried"],
+        "seconds": round(batch_seconds, 2),
+        "devices_per_second": round(len(devices) / batch_seconds, 2) if batch_seconds else None,
+    }
+    speedup = (round(batch["devices_per_second"] / single["devices_per_second"], 2)
+               if batch["devices_per_second"] and single["devices_per_second"] else None)
+    return {"single": single, "batch": batch, "speedup": speedup}
+
+
+def print_throughput_comparison(comparison: Dict[str, Any]):
+    """打印单台模式与批量模式的吞吐量对比"""
+    single, batch = comparison["single"], comparison["batch"]
+    print("=" * 60)
+    print("📦 单台分析 vs 批量分析")
+    print("=" * 60)
+    print(f"  单台模式: {single['devices']} 台, {single['requests']} 个请求, "
+          f"{single['seconds']} 秒, {single['devices_per_second']} 台/秒")
+    print(f"  批量模式: {batch['devices']} 台, {batch['batches']} 批 + {batch['retried']} 台单独重试, "
+          f"{batch['seconds']} 秒, {batch['devices_per_second']} 台/秒")
+    if comparison["speedup"] is not None:
+        print(f"  🚀 吞吐量提升: {comparison['speedup']}x")
+    print("=" * 60)
@@ -4,11 +4,68 @@
 """
 
 import os
+import sys
 import json
-import requests
+import threading
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 
+# 共享模块（客户端流控、按需导入）位于仓库根目录
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+from lazy_imports import LazyModule
+from xpulink_concurrency import AdaptiveController, get_controller
+from model_router import ModelRouter, parse_triage
+from maintenance_store import MaintenanceStore, compact_record
+from batch_analysis import compact_device, estimate_tokens, pack_batches, parse_batch_response
+
+# requests 在第一次调用模型时才导入，冷启动时不必付出上百毫秒的导入开销
+requests = LazyModule("requests")
+
+DEFAULT_BASE_URL = "https://www.xpulink.ai/v1"
+
+# 对话请求的读超时按 max_tokens 放宽：基础 60 秒，另按最慢每秒 20 个 token 预留生成时间
+REQUEST_TIMEOUT_BASE = 60
+MIN_TOKENS_PER_SECOND = 20
+
+# Agent 系统提示词
+SYSTEM_PROMPT = """你是一个专业的工业设备监控和运维专家AI助手。你的职责包括：
+
+1. **设备状态分析**：根据设备运行数据，判断设备是否正常运行
+2. **故障诊断**：分析异常数据、错误日志，定位故障原因
+3. **预防性维护**：基于历史数据预测潜在问题
+4. **运维建议**：提供专业的维修和维护建议
+5. **报告生成**：生成结构化的诊断报告
+
+你的分析应该：
+- 准确：基于数据和事实进行判断
+- 全面：考虑多个维度（性能、日志、历史记录）
+- 专业：使用专业术语，提供技术细节
+- 可操作：给出具体的下一步操作建议
+- 结构化：按照清晰的格式组织信息
+
+在回答时，请保持专业、客观、详细。"""
+
+# 进程内共享的 HTTP 会话（复用连接）和 Agent 实例
+_session = None
+_agents: Dict[tuple, "DeviceMonitorAgent"] = {}
+_registry_lock = threading.Lock()
+
+
+def _get_session():
+    """进程内共享的 requests.Session，首次使用时创建"""
+    global _session
+    with _registry_lock:
+        if _session is None:
+            _session = requests.Session()
+            # 连接池与并发上限（AIMDLimiter 默认最大 64）一致，避免高并发时丢弃连接
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=64)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
 
 class DeviceMonitorAgent:
     """
@@ -23,77 +80,97 @@ class DeviceMonitorAgent:
     - 自动化报告生成
     """
 
-    def __init__(self, api_key: Optional[str] = None, model: str = "qwen3-32b"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "qwen3-32b",
+                 base_url: str = DEFAULT_BASE_URL,
+                 controller: Optional[AdaptiveController] = None,
+                 router: Optional[ModelRouter] = None,
+                 maintenance_store: Optional[MaintenanceStore] = None):
         """
         初始化设备监控Agent
 
         Args:
             api_key: XPULink API Key，如未提供则从环境变量读取
             model: 使用的模型名称，默认为 qwen3-32b
+            base_url: API 基础 URL
+            controller: 并发控制与熔断，默认与同进程其他客户端共享 "xpulink-chat"
+            router: 分级模型路由，提供时 analyze_device_status 和 query 先初筛，按需升级
+            maintenance_store: 维修记录存储，analyze_maintenance_history 未传入记录时使用
         """
         self.api_key = api_key or os.getenv("XPULINK_API_KEY")
         if not self.api_key:
             raise ValueError("请提供 API Key 或在环境变量中设置 XPULINK_API_KEY")
 
         self.model = model
-        self.base_url = "https://www.xpulink.ai/v1/chat/completions"
+        self.controller = controller or get_controller("xpulink-chat")
+        self.router = router
+        self.maintenance_store = maintenance_store
+        # 最近一次批量分析的统计信息(批次数、请求数、重试设备数等)
+        self.last_batch_stats: Dict[str, Any] = {}
+        self.base_url = f"{base_url.rstrip('/')}/chat/completions"
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
 
-        # Agent 系统提示词
-        self.system_prompt = """你是一个专业的工业设备监控和运维专家AI助手。你的职责包括：
+        # Agent 系统提示词（模块常量，不在每次构造时重新生成）
+        self.system_prompt = SYSTEM_PROMPT
 
-1. **设备状态分析**：根据设备运行数据，判断设备是否正常运行
-2. **故障诊断**：分析异常数据、错误日志，定位故障原因
-3. **预防性维护**：基于历史数据预测潜在问题
-4. **运维建议**：提供专业的维修和维护建议
-5. **报告生成**：生成结构化的诊断报告
-
-你的分析应该：
-- 准确：基于数据和事实进行判断
-- 全面：考虑多个维度（性能、日志、历史记录）
-- 专业：使用专业术语，提供技术细节
-- 可操作：给出具体的下一步操作建议
-- 结构化：按照清晰的格式组织信息
-
-在回答时，请保持专业、客观、详细。"""
-
-    def _call_llm(self, messages: List[Dict[str, str]],
-                  temperature: float = 0.7,
-                  max_tokens: int = 2000) -> str:
+    def _chat_completion(self, messages: List[Dict[str, str]],
+                         temperature: float = 0.7,
+                         max_tokens: int = 2000,
+                         model: Optional[str] = None) -> Dict[str, Any]:
         """
-        调用大语言模型
+        调用对话接口，返回完整响应（包含 usage）
 
         Args:
             messages: 对话消息列表
             temperature: 温度参数，控制随机性
             max_tokens: 最大生成token数
+            model: 使用的模型，默认为 self.model
 
         Returns:
-            模型生成的文本内容
+            接口返回的 JSON
+
+        Raises:
+            CircuitOpenError: 接口持续失败、熔断器打开时立即抛出（RuntimeError 的子类）
         """
         payload = {
-            "model": self.model,
+            "model": model or self.model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens
         }
 
         try:
-            response = requests.post(
+            response = self.controller.call(
+                _get_session().post,
                 self.base_url,
                 headers=self.headers,
                 json=payload,
-                timeout=60
+                timeout=REQUEST_TIMEOUT_BASE + max_tokens / MIN_TOKENS_PER_SECOND
             )
             response.raise_for_status()
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+            return response.json()
         except requests.exceptions.RequestException as e:
             raise RuntimeError(f"API 调用失败: {str(e)}")
 
+    def _call_llm(self, messages: List[Dict[str, str]],
+                  temperature: float = 0.7,
+                  max_tokens: int = 2000) -> str:
+        """
+        调用大语言模型
+
+        Args:
+            messages: 对话消息列表
+            temperature: 温度参数，控制随机性
+            max_tokens: 最大生成token数
+
+        Returns:
+            模型生成的文本内容
+        """
+        result = self._chat_completion(messages, temperature=temperature, max_tokens=max_tokens)
+        return result["choices"][0]["message"]["content"]
+
     def analyze_device_status(self, device_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         分析设备运行状态
@@ -132,14 +209,154 @@ class DeviceMonitorAgent:
             {"role": "user", "content": prompt}
         ]
 
-        response = self._call_llm(messages, temperature=0.3)
+        routing = None
+        if self.router is not None:
+            triage_prompt = f"""请快速判断以下设备的运行状态：
 
-        return {
+```json
+{json.dumps(device_data, ensure_ascii=False)}
+```
+
+只输出一个JSON对象，不要输出其他内容，包含以下字段：
+- status: 设备状态（normal/warning/abnormal/fault）
+- confidence: 你对该判断的置信度（0-1），数据不足或难以判断时给出较低的值
+- health_score: 健康度评分（0-100）
+- key_findings: 关键发现列表（不超过3条）
+- risks: 潜在风险列表（没有时为空列表）
+- anomalies: 异常项列表（没有时为空列表）
+- summary: 一句话总结
+"""
+            triage_messages = [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": triage_prompt}
+            ]
+            response, routing = self.router.route(
+                self, "device_status", triage_messages, messages, temperature=0.3
+            )
+            if not routing["escalated"]:
+                # 初筛结果与完整分析的字段保持一致，调用方不必区分两种来源
+                triage = parse_triage(response)
+                if triage is not None:
+                    triage.setdefault("risks", [])
+                    triage.setdefault("anomalies", [])
+                    response = json.dumps(triage, ensure_ascii=False, indent=2)
+        else:
+            response = self._call_llm(messages, temperature=0.3)
+
+        result = {
             "device_id": device_data.get("device_id", "unknown"),
             "timestamp": datetime.now().isoformat(),
             "analysis": response,
             "raw_data": device_data
         }
+        if routing is not None:
+            result["routing"] = routing
+        return result
+
+    def analyze_devices_batch(self, devices: List[Dict[str, Any]],
+                              token_budget: int = 6000,
+                              max_batch_size: int = 20,
+                              output_tokens_per_device: int = 250,
+                              max_output_tokens: int = 8000,
+                              max_workers: int = 4) -> List[Dict[str, Any]]:
+        """
+        批量分析多台设备：多台设备的紧凑记录打包进一个请求，减少重复发送的提示词
+
+        Args:
+            devices: 设备数据列表，每台必须有唯一的 device_id
+            token_budget: 每个请求的输入 token 预算（估算值，含提示词）
+            max_batch_size: 每批的最大设备数
+            output_tokens_per_device: 每台设备预留的输出 token 数
+            max_output_tokens: 每个请求的最大输出 token 数，同时限制每批的设备数
+            max_workers: 同时在途的最大请求数
+
+        Returns:
+            与 analyze_device_status 结构相同的结果列表，顺序与 devices 一致；
+            响应中缺失或不合格的设备会单独调用 analyze_device_status 重试，
+            重试仍失败的设备 analysis 为 None，error 为错误信息
+        """
+        device_ids = [str(device.get("device_id", "")) for device in devices]
+        if not all(device_ids) or len(set(device_ids)) != len(device_ids):
+            raise ValueError("批量分析要求每台设备都有唯一的 device_id")
+
+        instructions = """请分析以下多台设备的运行状态，每行是一台设备的JSON数据：
+
+{records}
+
+只输出一个JSON数组，不要输出其他内容。数组中每台设备一个对象，包含以下字段：
+- device_id: 设备ID（与输入一致）
+- status: 设备状态（normal/warning/abnormal/fault）
+- health_score: 健康度评分（0-100）
+- key_findings: 关键发现列表（不超过3条）
+- risks: 潜在风险列表
+- anomalies: 异常项列表（如有）
+- summary: 一句话总结
+"""
+        overhead = estimate_tokens(self.system_prompt) + estimate_tokens(instructions)
+        batch_size = max(1, min(max_batch_size, max_output_tokens // output_tokens_per_device))
+        batches = pack_batches(devices, token_budget, batch_size, overhead_tokens=overhead)
+
+        def run_batch(indices: List[int]):
+            batch_ids = [device_ids[i] for i in indices]
+            records = "\n".join(compact_device(devices[i]) for i in indices)
+            messages = [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": instructions.format(records=records)}
+            ]
+            try:
+                text = self._call_llm(messages, temperature=0.3,
+                                      max_tokens=min(max_output_tokens, output_tokens_per_device * len(indices)))
+            except Exception:
+                return {}, batch_ids
+            return parse_batch_response(text, batch_ids)
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            outcomes = list(executor.map(run_batch, batches))
+
+            timestamp = datetime.now().isoformat()
+            results: List[Optional[Dict[str, Any]]] = [None] * len(devices)
+            retry_indices = []
+            for batch_index, (indices, (parsed, missing)) in enumerate(zip(batches, outcomes)):
+                missing = set(missing)
+                for i in indices:
+                    if device_ids[i] in missing:
+                        retry_indices.append(i)
+                        continue
+                    results[i] = {
+                        "device_id": device_ids[i],
+                        "timestamp": timestamp,
+                        "analysis": json.dumps(parsed[device_ids[i]], ensure_ascii=False, indent=2),
+                        "raw_data": devices[i],
+                        "batch": {"index": batch_index, "size": len(indices)}
+                    }
+
+            def retry_device(i: int) -> Dict[str, Any]:
+                try:
+                    return self.analyze_device_status(devices[i])
+                except Exception as e:
+                    return {
+                        "device_id": device_ids[i],
+                        "timestamp": datetime.now().isoformat(),
+                        "analysis": None,
+                        "raw_data": devices[i],
+                        "error": str(e)
+                    }
+
+            # 缺失或不合格的设备单独重试，单台失败不影响其他设备的结果
+            for i, result in zip(retry_indices, executor.map(retry_device, retry_indices)):
+                results[i] = result
+
+        self.last_batch_stats = {
+            "devices": len(devices),
+            "batches": len(batches),
+            "avg_batch_size": round(len(devices) / len(batches), 1) if batches else 0,
+            "retried": len(retry_indices),
+            "failed": sum(1 for result in results if result.get("error")),
+            "requests": len(batches) + len(retry_indices),
+        }
+        return results
 
     def analyze_logs(self, logs: List[str], context: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -196,23 +413,51 @@ class DeviceMonitorAgent:
         }
 
     def analyze_maintenance_history(self,
-                                    maintenance_records: List[Dict[str, Any]]) -> Dict[str, Any]:
+                                    maintenance_records: Optional[List[Dict[str, Any]]] = None,
+                                    device_id: Optional[str] = None,
+                                    start: Optional[str] = None,
+                                    end: Optional[str] = None,
+                                    recent_records: int = 3) -> Dict[str, Any]:
         """
         分析维修历史记录
 
+        维修次数、成本、MTBF、部件更换频次等统计量在本地预先计算，只把统计结果
+        和最近几条记录发送给模型，不再发送完整的记录列表。
+
         Args:
-            maintenance_records: 维修记录列表
+            maintenance_records: 维修记录列表，未提供时使用 self.maintenance_store
+            device_id: 只分析该设备，默认分析记录中的所有设备
+            start: 起始日期（含），YYYY-MM-DD
+            end: 结束日期（含），YYYY-MM-DD
+            recent_records: 每台设备附带的最近记录数
 
         Returns:
             维修历史分析结果
         """
-        records_text = json.dumps(maintenance_records, ensure_ascii=False, indent=2)
-
-        prompt = f"""请分析以下设备的维修历史记录：
+        if maintenance_records is not None:
+            store = MaintenanceStore(maintenance_records)
+        elif self.maintenance_store is not None:
+            store = self.maintenance_store
+        else:
+            raise ValueError("请提供 maintenance_records 或在初始化时设置 maintenance_store")
+
+        device_ids = [device_id] if device_id else store.device_ids
+        devices = []
+        records_analyzed = 0
+        for current_id in device_ids:
+            aggregates = store.aggregates(current_id, start=start, end=end)
+            records_analyzed += aggregates["repairs"]
+            recent = store.query(device_id=current_id, start=start, end=end)[-recent_records:][::-1] \
+                if recent_records > 0 else []
+            devices.append({
+                "statistics": aggregates,
+                "recent_records": [compact_record(r) for r in recent]
+            })
+
+        prompt = f"""请分析以下设备的维修历史。统计数据已根据全部维修记录预先计算（MTBF 为平均故障间隔天数，MTTR 为平均故障修复小时数），请直接使用，不要重新统计：
 
-维修记录：
 ```json
-{records_text}
+{json.dumps(devices, ensure_ascii=False, separators=(",", ":"))}
 ```
 
 请进行以下分析：
@@ -241,7 +486,8 @@ class DeviceMonitorAgent:
 
         return {
             "timestamp": datetime.now().isoformat(),
-            "records_analyzed": len(maintenance_records),
+            "records_analyzed": records_analyzed,
+            "aggregates": [device["statistics"] for device in devices],
             "analysis": response
         }
 
@@ -394,6 +640,21 @@ class DeviceMonitorAgent:
             {"role": "user", "content": prompt}
         ]
 
+        if self.router is not None:
+            triage_messages = [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": prompt + """
+
+请简洁地回答，只输出一个JSON对象，不要输出其他内容：
+{"answer": "你的回答", "confidence": 0到1之间的置信度}
+问题涉及故障诊断、需要详细分析或你没有把握时，请给出较低的置信度。"""}
+            ]
+            answer, _ = self.router.route(
+                self, "query", triage_messages, messages, temperature=0.7,
+                answer_field="answer", require_status=False
+            )
+            return answer
+
         return self._call_llm(messages, temperature=0.7)
 
     def export_report(self, report_data: Dict[str, Any],
@@ -436,19 +697,44 @@ class DeviceMonitorAgent:
 
 
 # 便捷函数
+def get_agent(api_key: Optional[str] = None, model: str = "qwen3-32b",
+              base_url: str = DEFAULT_BASE_URL) -> DeviceMonitorAgent:
+    """
+    获取进程内共享的 Agent，相同配置只创建一次
+
+    Args:
+        api_key: API Key，如未提供则从环境变量读取
+        model: 使用的模型名称
+        base_url: API 基础 URL
+
+    Returns:
+        DeviceMonitorAgent 实例
+    """
+    key = (api_key or os.getenv("XPULINK_API_KEY"), model, base_url)
+    with _registry_lock:
+        agent = _agents.get(key)
+    if agent is None:
+        agent = DeviceMonitorAgent(api_key=key[0], model=model, base_url=base_url)
+        with _registry_lock:
+            agent = _agents.setdefault(key, agent)
+    return agent
+
+
 def quick_diagnosis(device_data: Dict[str, Any],
-                   api_key: Optional[str] = None) -> str:
+                   api_key: Optional[str] = None,
+                   base_url: str = DEFAULT_BASE_URL) -> str:
     """
     快速诊断：一键分析设备状态
 
     Args:
         device_data: 设备数据
         api_key: API Key
+        base_url: API 基础 URL
 
     Returns:
         诊断结果文本
     """
-    agent = DeviceMonitorAgent(api_key=api_key)
+    agent = get_agent(api_key=api_key, base_url=base_url)
     result = agent.analyze_device_status(device_data)
     return result["analysis"]
 
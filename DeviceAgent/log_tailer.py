@@ -0,0 +1,357 @@
+"""
+实时日志跟踪与增量分析
+
+持续跟踪不断增长的日志文件，只在出现异常时调用 DeviceMonitorAgent.analyze_logs：
+- 轮询文件大小读取新增内容，识别日志轮转和截断；读取位置写入检查点文件，
+  重启后从上次的位置继续
+- 每台设备维护按时间分桶的计数（总数、ERROR、WARNING）和最近若干行日志，
+  内存占用有上限
+- 触发条件：当前时间桶的 ERROR 比例相对前几个桶明显升高，或出现从未见过的
+  ERROR/WARNING 消息模板（数字等变量替换为 <*>）
+- 去抖：一台设备触发分析后，在 debounce_seconds 内的后续异常只计数不再分析，
+  一次错误风暴只产生一次分析
+
+使用示例:
+    agent = DeviceMonitorAgent()
+    tailer = LogTailer(agent, ["/var/log/pump.log"], checkpoint_path="data/tail_checkpoint.json")
+    tailer.run(interval=2.0)
+"""
+
+import json
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+# 2025-11-10 14:23:15 [WARNING] PUMP-001: Temperature threshold exceeded - ...
+LOG_LINE = re.compile(
+    r"^(?P<timestamp>\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2})\S*\s+\[(?P<level>\w+)\]\s+"
+    r"(?P<device_id>[^:\s]+):\s*(?P<message>.*)$"
+)
+_VARIABLES = re.compile(r"0x[0-9a-fA-F]+|\d+(?:\.\d+)?")
+
+ERROR_LEVELS = ("ERROR", "CRITICAL", "FATAL")
+TEMPLATE_LEVELS = ("WARNING", "ERROR", "CRITICAL", "FATAL")
+
+
+def parse_line(line: str) -> Dict[str, Any]:
+    """
+    解析一行日志，无法解析时设备记为 unknown、级别记为 INFO
+
+    Returns:
+        {timestamp(秒), level, device_id, message, template, line}
+    """
+    match = LOG_LINE.match(line)
+    if match:
+        try:
+            timestamp = datetime.strptime(match.group("timestamp")[:19].replace("T", " "),
+                                          "%Y-%m-%d %H:%M:%S").timestamp()
+        except ValueError:
+            timestamp = time.time()
+        level = match.group("level").upper()
+        device_id = match.group("device_id")
+        message = match.group("message")
+    else:
+        timestamp, level, device_id, message = time.time(), "INFO", "unknown", line
+    return {
+        "timestamp": timestamp,
+        "level": "WARNING" if level == "WARN" else level,
+        "device_id": device_id,
+        "message": message,
+        "template": _VARIABLES.sub("<*>", message),
+        "line": line,
+    }
+
+
+class DeviceWindow:
+    """单台设备的滚动窗口：按时间分桶的计数、最近日志和已见过的消息模板"""
+
+    def __init__(self, bucket_seconds: int, window_buckets: int, max_lines: int, max_templates: int):
+        self.bucket_seconds = bucket_seconds
+        # 每个桶: [桶起始时间, 总数, ERROR 数, WARNING 数]
+        self.buckets: Deque[List[float]] = deque(maxlen=window_buckets)
+        self.lines: Deque[str] = deque(maxlen=max_lines)
+        self.templates: "OrderedDict[str, int]" = OrderedDict()
+        self.max_templates = max_templates
+        self.total = 0
+        self.new_templates: List[str] = []
+        self.last_analysis = None
+        self.suppressed = 0
+
+    def add(self, entry: Dict[str, Any], template_levels: Sequence[str]) -> None:
+        start = entry["timestamp"] - entry["timestamp"] % self.bucket_seconds
+        if not self.buckets or start > self.buckets[-1][0]:
+            self.buckets.append([start, 0, 0, 0])
+        bucket = self.buckets[-1]  # 迟到的日志计入当前桶
+        bucket[1] += 1
+        if entry["level"] in ERROR_LEVELS:
+            bucket[2] += 1
+        elif entry["level"] == "WARNING":
+            bucket[3] += 1
+
+        self.total += 1
+        self.lines.append(entry["line"])
+
+        key = f"{entry['level']} {entry['template']}"
+        if key in self.templates:
+            self.templates.move_to_end(key)
+            self.templates[key] += 1
+        else:
+            if entry["level"] in template_levels:
+                self.new_templates.append(key)
+            self.templates[key] = 1
+            if len(self.templates) > self.max_templates:
+                self.templates.popitem(last=False)
+
+    def error_rates(self) -> Dict[str, float]:
+        """当前桶和之前各桶的 ERROR 比例"""
+        current = self.buckets[-1]
+        previous = list(self.buckets)[:-1]
+        baseline_total = sum(b[1] for b in previous)
+        return {
+            "current_errors": current[2],
+            "current_rate": current[2] / current[1] if current[1] else 0.0,
+            "baseline_rate": sum(b[2] for b in previous) / baseline_total if baseline_total else 0.0,
+            "baseline_lines": baseline_total,
+        }
+
+
+class LogTailer:
+    """跟踪日志文件，异常时触发 Agent 分析"""
+
+    def __init__(
+        self,
+        agent: Any,
+        paths: Sequence[str],
+        checkpoint_path: Optional[str] = None,
+        from_start: bool = False,
+        bucket_seconds: int = 60,
+        window_buckets: int = 30,
+        max_lines: int = 200,
+        max_templates: int = 1000,
+        spike_ratio: float = 3.0,
+        min_errors: int = 3,
+        warmup_lines: int = 50,
+        template_levels: Sequence[str] = TEMPLATE_LEVELS,
+        debounce_seconds: float = 300.0,
+        context_lines: int = 50,
+        max_read_bytes: int = 4 * 1024 * 1024,
+        on_analysis: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        """
+        初始化日志跟踪器
+
+        Args:
+            agent: DeviceMonitorAgent，异常时调用其 analyze_logs
+            paths: 要跟踪的日志文件
+            checkpoint_path: 读取位置检查点文件，None 表示不保存
+            from_start: 没有检查点时是否从文件开头读取（默认只读新增内容）
+            bucket_seconds: 计数时间桶的长度（秒，按日志时间戳）
+            window_buckets: 每台设备保留的时间桶数
+            max_lines: 每台设备保留的最近日志行数
+            max_templates: 每台设备记住的消息模板数
+            spike_ratio: 当前 ERROR 比例超过基线的多少倍视为突增
+            min_errors: 当前时间桶至少有多少条 ERROR 才可能触发
+            warmup_lines: 设备累计多少行日志后才检测新模板
+            template_levels: 出现新模板时会触发分析的日志级别
+            debounce_seconds: 同一设备两次分析的最短间隔（秒）
+            context_lines: 触发分析时发送的最近日志行数
+            max_read_bytes: 每个文件每次轮询最多读取的字节数，超过该长度的单行日志被跳过
+            on_analysis: 每次分析完成后的回调，参数为分析记录
+        """
+        self.agent = agent
+        self.paths = list(paths)
+        self.checkpoint_path = checkpoint_path
+        self.from_start = from_start
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = window_buckets
+        self.max_lines = max_lines
+        self.max_templates = max_templates
+        self.spike_ratio = spike_ratio
+        self.min_errors = min_errors
+        self.warmup_lines = warmup_lines
+        self.template_levels = tuple(template_levels)
+        self.debounce_seconds = debounce_seconds
+        self.context_lines = context_lines
+        self.max_read_bytes = max_read_bytes
+        self.on_analysis = on_analysis
+
+        self.windows: Dict[str, DeviceWindow] = {}
+        self.analyses: Deque[Dict[str, Any]] = deque(maxlen=100)
+        self.stats = {"lines": 0, "bytes": 0, "rotations": 0, "long_lines": 0,
+                      "triggers": 0, "analyses": 0, "suppressed": 0}
+        self._offsets: Dict[str, Dict[str, int]] = self._load_checkpoint()
+
+    def _load_checkpoint(self) -> Dict[str, Dict[str, int]]:
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _save_checkpoint(self) -> None:
+        if not self.checkpoint_path:
+            return
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._offsets, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _read_new_lines(self, path: str) -> List[str]:
+        """读取文件新增的完整行，处理轮转（inode 变化）和截断"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return []
+
+        state = self._offsets.get(path)
+        if state is None:
+            state = {"inode": stat.st_ino, "offset": 0 if self.from_start else stat.st_size}
+        elif state["inode"] != stat.st_ino or stat.st_size < state["offset"]:
+            # 日志被轮转或截断，从新文件开头读取
+            self.stats["rotations"] += 1
+            state = {"inode": stat.st_ino, "offset": 0}
+        self._offsets[path] = state
+
+        if stat.st_size <= state["offset"]:
+            return []
+        with open(path, "rb") as f:
+            f.seek(state["offset"])
+            data = f.read(min(stat.st_size - state["offset"], self.max_read_bytes))
+
+        if state.get("skip_line"):
+            # 正在跳过一条超长行的剩余部分
+            start = data.find(b"\n")
+            if start < 0:
+                state["offset"] += len(data)
+                self.stats["bytes"] += len(data)
+                return []
+            state["offset"] += start + 1
+            self.stats["bytes"] += start + 1
+            state["skip_line"] = False
+            data = data[start + 1:]
+
+        # 末尾不完整的行留到下次读取
+        end = data.rfind(b"\n")
+        if end < 0:
+            if len(data) >= self.max_read_bytes:
+                # 单行超过 max_read_bytes：丢弃已读部分并跳过该行剩余内容，否则读取位置永远停在这里
+                state["offset"] += len(data)
+                self.stats["bytes"] += len(data)
+                self.stats["long_lines"] += 1
+                state["skip_line"] = True
+            return []
+        data = data[:end + 1]
+        state["offset"] += len(data)
+        self.stats["bytes"] += len(data)
+        return data.decode("utf-8", errors="replace").splitlines()
+
+    def _window(self, device_id: str) -> DeviceWindow:
+        window = self.windows.get(device_id)
+        if window is None:
+            window = DeviceWindow(self.bucket_seconds, self.window_buckets, self.max_lines, self.max_templates)
+            self.windows[device_id] = window
+        return window
+
+    def _check(self, device_id: str, window: DeviceWindow) -> List[str]:
+        """返回触发原因列表，没有异常时为空"""
+        reasons = []
+        rates = window.error_rates()
+        if (rates["current_errors"] >= self.min_errors
+                and rates["current_rate"] > self.spike_ratio * rates["baseline_rate"]):
+            reasons.append(f"ERROR 比例 {rates['current_rate']:.0%} (基线 {rates['baseline_rate']:.0%})")
+        if window.new_templates and window.total - len(window.new_templates) >= self.warmup_lines:
+            reasons.extend(f"新消息模板: {template}" for template in window.new_templates[:3])
+        window.new_templates = []
+        return reasons
+
+    def _analyze(self, device_id: str, window: DeviceWindow, reasons: List[str]) -> Dict[str, Any]:
+        lines = list(window.lines)[-self.context_lines:]
+        context = f"设备 {device_id} 的实时日志触发告警: " + "; ".join(reasons)
+        if window.suppressed:
+            context += f"。上次分析后又有 {window.suppressed} 次异常因去抖未单独分析"
+        record = {"device_id": device_id, "reasons": reasons, "timestamp": datetime.now().isoformat(),
+                  "analysis": None, "error": None}
+        try:
+            record["analysis"] = self.agent.analyze_logs(lines, context=context)["analysis"]
+        except Exception as e:
+            record["error"] = str(e)
+        window.suppressed = 0
+        self.stats["analyses"] += 1
+        self.analyses.append(record)
+        if self.on_analysis is not None:
+            self.on_analysis(record)
+        return record
+
+    def poll_once(self) -> List[Dict[str, Any]]:
+        """
+        读取所有文件的新增内容，更新窗口，必要时触发分析
+
+        Returns:
+            本次触发的分析记录
+        """
+        touched = set()
+        for path in self.paths:
+            for line in self._read_new_lines(path):
+                if not line.strip():
+                    continue
+                entry = parse_line(line)
+                self._window(entry["device_id"]).add(entry, self.template_levels)
+                touched.add(entry["device_id"])
+                self.stats["lines"] += 1
+        self._save_checkpoint()
+
+        results = []
+        now = time.monotonic()
+        for device_id in sorted(touched):
+            window = self.windows[device_id]
+            reasons = self._check(device_id, window)
+            if not reasons:
+                continue
+            self.stats["triggers"] += 1
+            if window.last_analysis is not None and now - window.last_analysis < self.debounce_seconds:
+                window.suppressed += 1
+                self.stats["suppressed"] += 1
+                continue
+            window.last_analysis = now
+            results.append(self._analyze(device_id, window, reasons))
+        return results
+
+    def run(self, interval: float = 1.0, max_polls: Optional[int] = None) -> None:
+        """
+        持续轮询，Ctrl+C 停止
+
+        Args:
+            interval: 轮询间隔（秒）
+            max_polls: 最多轮询次数，None 表示一直运行
+        """
+        print(f"👀 开始跟踪 {len(self.paths)} 个日志文件 (轮询间隔 {interval} 秒)")
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                for record in self.poll_once():
+                    status = "❌ 分析失败" if record["error"] else "✅ 已分析"
+                    print(f"🚨 {record['device_id']}: {'; '.join(record['reasons'])} -> {status}")
+                polls += 1
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("\n⏹️  停止跟踪")
+        finally:
+            self._save_checkpoint()
+        print_tailer_stats(self)
+
+
+def print_tailer_stats(tailer: LogTailer):
+    """打印跟踪统计"""
+    stats = tailer.stats
+    print("=" * 60)
+    print("📜 日志跟踪统计")
+    print("=" * 60)
+    print(f"  读取: {stats['lines']} 行, {stats['bytes'] / 1024:.1f} KB, 轮转/截断 {stats['rotations']} 次, "
+          f"跳过超长行 {stats['long_lines']} 行")
+    print(f"  触发: {stats['triggers']} 次, 分析: {stats['analyses']} 次, 去抖跳过: {stats['suppressed']} 次")
+    for device_id, window in sorted(tailer.windows.items()):
+        print(f"  - {device_id}: {window.total} 行, 模板 {len(window.templates)} 个")
+    print("=" * 60)
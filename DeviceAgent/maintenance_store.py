@@ -0,0 +1,272 @@
+"""
+维修记录本地存储
+
+加载 maintenance_records.json 格式的维修记录，建立索引并预计算统计量，
+避免每次分析都把完整记录交给大模型去数次数、算成本：
+- 按 device_id、日期、part_number 建立索引，日期范围查询用二分查找
+- 每台设备按日期维护成本、停机时长、故障次数的前缀和，范围内的合计 O(log n)
+- 预计算维修次数、成本合计、MTBF（平均故障间隔）、MTTR（平均修复时长）和
+  部件更换频次，全量结果缓存，新增记录后失效
+
+使用示例:
+    store = MaintenanceStore.from_json("data/examples/maintenance_records.json")
+    store.aggregates("PUMP-001")
+    store.query(device_id="PUMP-001", start="2025-01-01", part_number="SEAL-3000-A")
+    store.recent("PUMP-001", limit=3)
+"""
+
+import json
+from bisect import bisect_left, bisect_right
+from datetime import date
+from itertools import accumulate
+from typing import Any, Dict, Iterable, List, Optional
+
+# 视为故障维修的记录类型（用于 MTBF / MTTR）
+FAILURE_TYPES = ("corrective", "emergency", "breakdown")
+
+
+def _day_number(value: str) -> int:
+    """YYYY-MM-DD 日期转为天数序号，两个序号相减即间隔天数"""
+    return date.fromisoformat(value[:10]).toordinal()
+
+
+class MaintenanceStore:
+    """按设备、日期、部件索引的维修记录存储"""
+
+    def __init__(self, records: Optional[Iterable[Dict[str, Any]]] = None,
+                 failure_types: Iterable[str] = FAILURE_TYPES):
+        """
+        初始化存储
+
+        Args:
+            records: 维修记录，每条至少包含 device_id 和 date（YYYY-MM-DD）
+            failure_types: 视为故障维修的记录类型
+        """
+        self.failure_types = set(failure_types)
+        self.records: List[Dict[str, Any]] = []
+        self._by_device: Dict[str, List[int]] = {}
+        self._device_dates: Dict[str, List[str]] = {}
+        self._device_days: Dict[str, List[int]] = {}
+        self._by_part: Dict[str, List[int]] = {}
+        self._prefix: Dict[str, Dict[str, List[float]]] = {}
+        self._aggregates: Dict[str, Dict[str, Any]] = {}
+        if records:
+            self.add(records)
+
+    @classmethod
+    def from_json(cls, file_path: str, **kwargs: Any) -> "MaintenanceStore":
+        """从 JSON 文件（记录列表）加载"""
+        with open(file_path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def device_ids(self) -> List[str]:
+        return sorted(self._by_device)
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> None:
+        """添加记录并重建受影响设备的索引"""
+        touched = set()
+        for record in records:
+            if not record.get("device_id") or not record.get("date"):
+                raise ValueError(f"维修记录缺少 device_id 或 date: {record.get('record_id')}")
+            index = len(self.records)
+            self.records.append(record)
+            self._by_device.setdefault(record["device_id"], []).append(index)
+            for part in record.get("parts_replaced") or []:
+                if part.get("part_number"):
+                    self._by_part.setdefault(part["part_number"], []).append(index)
+            touched.add(record["device_id"])
+
+        for device_id in touched:
+            indices = sorted(self._by_device[device_id], key=lambda i: self.records[i]["date"])
+            self._by_device[device_id] = indices
+            self._device_dates[device_id] = [self.records[i]["date"][:10] for i in indices]
+            self._device_days[device_id] = [_day_number(d) for d in self._device_dates[device_id]]
+            records_sorted = [self.records[i] for i in indices]
+            # 前缀和首项为 0，区间 [lo, hi) 的合计为 prefix[hi] - prefix[lo]
+            self._prefix[device_id] = {
+                "cost": list(accumulate((r.get("total_cost") or 0.0 for r in records_sorted), initial=0.0)),
+                "downtime": list(accumulate((r.get("duration_hours") or 0.0 for r in records_sorted), initial=0.0)),
+                "failures": list(accumulate((r.get("type") in self.failure_types for r in records_sorted), initial=0)),
+            }
+            self._aggregates.pop(device_id, None)
+        for part_number, indices in self._by_part.items():
+            indices.sort(key=lambda i: self.records[i]["date"])
+
+    def _range(self, device_id: str, start: Optional[str], end: Optional[str]) -> range:
+        """设备在 [start, end] 日期范围内的记录位置"""
+        dates = self._device_dates.get(device_id, [])
+        lo = bisect_left(dates, start) if start else 0
+        hi = bisect_right(dates, end) if end else len(dates)
+        return range(lo, max(lo, hi))
+
+    def query(
+        self,
+        device_id: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        part_number: Optional[str] = None,
+        record_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按条件查询记录，按日期从早到晚排序
+
+        Args:
+            device_id: 设备 ID
+            start: 起始日期（含），YYYY-MM-DD
+            end: 结束日期（含），YYYY-MM-DD
+            part_number: 更换过该部件的记录
+            record_type: 记录类型（preventive/corrective 等）
+
+        Returns:
+            记录列表
+        """
+        if part_number is not None:
+            candidates = [self.records[i] for i in self._by_part.get(part_number, [])]
+            if device_id is not None:
+                candidates = [r for r in candidates if r["device_id"] == device_id]
+            candidates = [r for r in candidates
+                          if (not start or r["date"][:10] >= start) and (not end or r["date"][:10] <= end)]
+        elif device_id is not None:
+            indices = self._by_device.get(device_id, [])
+            candidates = [self.records[indices[p]] for p in self._range(device_id, start, end)]
+        else:
+            candidates = [self.records[indices[p]]
+                          for d, indices in self._by_device.items()
+                          for p in self._range(d, start, end)]
+            candidates.sort(key=lambda r: r["date"])
+
+        if record_type is not None:
+            candidates = [r for r in candidates if r.get("type") == record_type]
+        return candidates
+
+    def recent(self, device_id: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """设备最近的 limit 条记录，按日期从近到远"""
+        indices = self._by_device.get(device_id, [])
+        return [self.records[i] for i in reversed(indices[-limit:])] if limit > 0 else []
+
+    def totals(self, device_id: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+        """
+        日期范围内的维修次数、故障次数、成本和停机时长（前缀和，O(log n)）
+
+        Returns:
+            统计字典
+        """
+        span = self._range(device_id, start, end)
+        prefix = self._prefix.get(device_id)
+        if prefix is None or not span:
+            return {"repairs": 0, "failures": 0, "total_cost": 0.0, "downtime_hours": 0.0}
+        lo, hi = span.start, span.stop
+        return {
+            "repairs": hi - lo,
+            "failures": prefix["failures"][hi] - prefix["failures"][lo],
+            "total_cost": round(prefix["cost"][hi] - prefix["cost"][lo], 2),
+            "downtime_hours": round(prefix["downtime"][hi] - prefix["downtime"][lo], 2),
+        }
+
+    def aggregates(
+        self,
+        device_id: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        top_parts: int = 5
+    ) -> Dict[str, Any]:
+        """
+        设备的维修统计（不限日期时结果会缓存）
+
+        Args:
+            device_id: 设备 ID
+            start: 起始日期（含）
+            end: 结束日期（含）
+            top_parts: 返回更换次数最多的部件数
+
+        Returns:
+            统计字典，包含维修次数、成本、MTBF、MTTR、部件更换频次等
+        """
+        cache_key = device_id if start is None and end is None and top_parts == 5 else None
+        if cache_key is not None and cache_key in self._aggregates:
+            return self._aggregates[cache_key]
+
+        indices = self._by_device.get(device_id, [])
+        span = self._range(device_id, start, end)
+        records = [self.records[indices[p]] for p in span]
+        result: Dict[str, Any] = {"device_id": device_id, **self.totals(device_id, start, end)}
+        if not records:
+            return result
+
+        by_type: Dict[str, Dict[str, float]] = {}
+        parts: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            stats = by_type.setdefault(record.get("type") or "unknown", {"count": 0, "cost": 0.0})
+            stats["count"] += 1
+            stats["cost"] = round(stats["cost"] + (record.get("total_cost") or 0.0), 2)
+            for part in record.get("parts_replaced") or []:
+                key = part.get("part_number") or part.get("part_name")
+                if not key:
+                    continue
+                entry = parts.setdefault(key, {"part_number": key, "part_name": part.get("part_name"),
+                                               "replacements": 0, "quantity": 0, "cost": 0.0, "last_date": None})
+                entry["replacements"] += 1
+                entry["quantity"] += part.get("quantity") or 1
+                entry["cost"] = round(entry["cost"] + (part.get("cost") or 0.0), 2)
+                entry["last_date"] = record["date"][:10]
+
+        dates = [r["date"][:10] for r in records]
+        days = self._device_days[device_id][span.start:span.stop]
+        failure_days = [d for d, r in zip(days, records) if r.get("type") in self.failure_types]
+        failures = [r for r in records if r.get("type") in self.failure_types]
+        failure_dates = [r["date"][:10] for r in failures]
+        intervals = [b - a for a, b in zip(failure_days, failure_days[1:])]
+        all_intervals = [b - a for a, b in zip(days, days[1:])]
+        repair_hours = [r["duration_hours"] for r in failures if r.get("duration_hours") is not None]
+        ranked_parts = sorted(parts.values(), key=lambda p: (-p["replacements"], -p["cost"]))
+        next_dates = [r["next_maintenance"] for r in records if r.get("next_maintenance")]
+
+        result.update({
+            "period": {"first": dates[0], "last": dates[-1]},
+            "by_type": by_type,
+            "avg_cost_per_repair": round(result["total_cost"] / len(records), 2),
+            "mtbf_days": round(sum(intervals) / len(intervals), 1) if intervals else None,
+            "mttr_hours": round(sum(repair_hours) / len(repair_hours), 2) if repair_hours else None,
+            "avg_maintenance_interval_days": round(sum(all_intervals) / len(all_intervals), 1) if all_intervals else None,
+            "last_failure": failure_dates[-1] if failure_dates else None,
+            "top_parts": ranked_parts[:top_parts],
+            "recurring_parts": [p["part_number"] for p in ranked_parts if p["replacements"] > 1],
+            "next_maintenance": max(next_dates) if next_dates else None,
+        })
+        if cache_key is not None:
+            self._aggregates[cache_key] = result
+        return result
+
+    def part_frequencies(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        所有设备的部件更换频次，按更换次数从多到少
+
+        Returns:
+            [{part_number, replacements, devices}]
+        """
+        result = []
+        for part_number, indices in self._by_part.items():
+            records = [self.records[i] for i in indices
+                       if (not start or self.records[i]["date"][:10] >= start)
+                       and (not end or self.records[i]["date"][:10] <= end)]
+            if records:
+                result.append({
+                    "part_number": part_number,
+                    "replacements": len(records),
+                    "devices": sorted({r["device_id"] for r in records}),
+                })
+        return sorted(result, key=lambda p: -p["replacements"])
+
+
+def compact_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """保留发送给模型的关键字段，去掉工作步骤等冗长内容"""
+    keys = ("record_id", "date", "type", "description", "duration_hours", "total_cost", "findings", "recommendations")
+    compact = {k: record[k] for k in keys if record.get(k) is not None}
+    parts = [p.get("part_number") or p.get("part_name") for p in record.get("parts_replaced") or []]
+    if parts:
+        compact["parts_replaced"] = parts
+    return compact
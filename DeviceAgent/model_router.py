@@ -0,0 +1,278 @@
+"""
+分级模型路由
+
+先用小模型（或同一模型配合较小的 max_tokens）做一次快速初筛，只有初筛结果
+不是 normal 或置信度不足时才升级到完整的 qwen3-32b 分析：
+- 初筛要求模型输出 JSON，包含 status 和 confidence
+- 初筛失败、输出无法解析、状态异常或置信度低于阈值时升级
+- 每次调用记录路由决策、耗时、token 用量和费用
+- summary() 用升级调用的平均耗时和用量估算未升级调用节省的时间和费用
+
+使用示例:
+    router = ModelRouter(triage_model="qwen3-14b", confidence_threshold=0.8)
+    agent = DeviceMonitorAgent(router=router)
+    agent.analyze_device_status(device_data)
+    print_routing_summary(router)
+"""
+
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# 视为正常、不需要升级的初筛状态
+NORMAL_STATUSES = ("normal",)
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def parse_triage(text: str) -> Optional[Dict[str, Any]]:
+    """
+    从初筛回答中解析 JSON 对象（允许被 ```json 代码块或其他文字包裹）
+
+    Returns:
+        解析出的字典，无法解析时返回 None
+    """
+    match = _JSON_OBJECT.search(text or "")
+    if not match:
+        return None
+    try:
+        parsed = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+class ModelRouter:
+    """初筛 + 按需升级的模型路由"""
+
+    def __init__(
+        self,
+        triage_model: Optional[str] = None,
+        triage_max_tokens: int = 400,
+        confidence_threshold: float = 0.8,
+        normal_statuses: Sequence[str] = NORMAL_STATUSES,
+        prices: Optional[Dict[str, Tuple[float, float]]] = None
+    ):
+        """
+        初始化模型路由
+
+        Args:
+            triage_model: 初筛使用的模型，None 表示与 Agent 相同的模型（只收紧 max_tokens）
+            triage_max_tokens: 初筛的最大生成 token 数
+            confidence_threshold: 置信度低于该值时升级
+            normal_statuses: 不需要升级的状态
+            prices: 模型名 -> (每百万输入 token 价格, 每百万输出 token 价格)，用于计算费用
+        """
+        self.triage_model = triage_model
+        self.triage_max_tokens = triage_max_tokens
+        self.confidence_threshold = confidence_threshold
+        self.normal_statuses = {s.lower() for s in normal_statuses}
+        self.prices = prices or {}
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _cost(self, model: str, usage: Dict[str, int]) -> Optional[float]:
+        if model not in self.prices:
+            return None
+        input_price, output_price = self.prices[model]
+        return (usage.get("prompt_tokens", 0) * input_price
+                + usage.get("completion_tokens", 0) * output_price) / 1e6
+
+    def _decide(self, parsed: Optional[Dict[str, Any]], require_status: bool) -> Tuple[bool, str]:
+        """返回 (是否升级, 原因)"""
+        if parsed is None:
+            return True, "unparseable"
+        status = str(parsed.get("status", "" if require_status else "normal")).lower()
+        if status not in self.normal_statuses:
+            return True, f"status={status or 'missing'}"
+        try:
+            confidence = float(parsed.get("confidence"))
+        except (TypeError, ValueError):
+            return True, "no_confidence"
+        if confidence < self.confidence_threshold:
+            return True, f"low_confidence={confidence:.2f}"
+        return False, "normal_confident"
+
+    def route(
+        self,
+        agent: Any,
+        task: str,
+        triage_messages: List[Dict[str, str]],
+        full_messages: List[Dict[str, str]],
+        temperature: float = 0.3,
+        max_tokens: int = 2000,
+        answer_field: Optional[str] = None,
+        require_status: bool = True
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        先初筛，按需升级
+
+        Args:
+            agent: DeviceMonitorAgent，使用其 _chat_completion 发送请求
+            task: 任务名（如 device_status、query），用于分组统计
+            triage_messages: 初筛消息，应要求模型输出包含 status、confidence 的 JSON
+            full_messages: 升级时发送给完整模型的消息
+            temperature: 完整模型的温度参数
+            max_tokens: 完整模型的最大生成 token 数
+            answer_field: 不升级时从初筛 JSON 中取作回答的字段，None 表示直接返回初筛原文
+            require_status: 初筛 JSON 必须包含 status 字段，否则升级
+
+        Returns:
+            (回答文本, 路由记录)
+        """
+        triage_model = self.triage_model or agent.model
+        record = {
+            "task": task,
+            "triage_model": triage_model,
+            "full_model": agent.model,
+            "escalated": False,
+            "reason": None,
+            "status": None,
+            "confidence": None,
+            "triage_latency_s": None,
+            "triage_usage": {},
+            "triage_cost": None,
+            "full_latency_s": None,
+            "full_usage": {},
+            "full_cost": None,
+            "error": None,
+        }
+
+        text = None
+        parsed = None
+        start = time.perf_counter()
+        try:
+            result = agent._chat_completion(triage_messages, temperature=0.0,
+                                            max_tokens=self.triage_max_tokens, model=triage_model)
+            text = result["choices"][0]["message"]["content"]
+            record["triage_usage"] = result.get("usage") or {}
+            record["triage_cost"] = self._cost(triage_model, record["triage_usage"])
+            parsed = parse_triage(text)
+        except Exception as e:
+            record["error"] = str(e)
+        record["triage_latency_s"] = round(time.perf_counter() - start, 3)
+
+        if record["error"]:
+            escalate, reason = True, "triage_error"
+        else:
+            escalate, reason = self._decide(parsed, require_status)
+        if parsed is not None:
+            record["status"] = parsed.get("status")
+            record["confidence"] = parsed.get("confidence")
+        if not escalate and answer_field is not None:
+            if not parsed.get(answer_field):
+                escalate, reason = True, f"missing_{answer_field}"
+            else:
+                text = str(parsed[answer_field])
+        record["escalated"] = escalate
+        record["reason"] = reason
+
+        if escalate:
+            start = time.perf_counter()
+            result = agent._chat_completion(full_messages, temperature=temperature, max_tokens=max_tokens)
+            record["full_latency_s"] = round(time.perf_counter() - start, 3)
+            record["full_usage"] = result.get("usage") or {}
+            record["full_cost"] = self._cost(agent.model, record["full_usage"])
+            text = result["choices"][0]["message"]["content"]
+
+        with self._lock:
+            self.records.append(record)
+        return text, record
+
+    def summary(self, task: Optional[str] = None) -> Dict[str, Any]:
+        """
+        汇总路由决策和节省量
+
+        未升级的调用按同一任务升级调用中完整模型的平均耗时、用量和费用估算
+        "如果直接用完整模型"的开销；升级调用的初筛开销计为额外成本。还没有
+        升级调用（没有基准）的任务不计算节省量。
+
+        Args:
+            task: 只统计某个任务，None 表示全部
+
+        Returns:
+            统计字典
+        """
+        with self._lock:
+            records = [r for r in self.records if task is None or r["task"] == task]
+
+        by_task: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            by_task.setdefault(record["task"], []).append(record)
+
+        def mean(values):
+            values = [v for v in values if v is not None]
+            return sum(values) / len(values) if values else None
+
+        saved_seconds = 0.0
+        saved_tokens = 0.0
+        saved_cost = 0.0
+        has_baseline = False
+        tasks = {}
+        for name, task_records in by_task.items():
+            escalated = [r for r in task_records if r["escalated"]]
+            resolved = [r for r in task_records if not r["escalated"]]
+            full_latency = mean(r["full_latency_s"] for r in escalated)
+            full_tokens = mean(r["full_usage"].get("total_tokens") for r in escalated)
+            full_cost = mean(r["full_cost"] for r in escalated)
+            reasons: Dict[str, int] = {}
+            for r in escalated:
+                key = r["reason"].split("=")[0]
+                reasons[key] = reasons.get(key, 0) + 1
+            tasks[name] = {
+                "calls": len(task_records),
+                "escalated": len(escalated),
+                "escalation_reasons": reasons,
+                "avg_triage_latency_s": mean(r["triage_latency_s"] for r in task_records),
+                "avg_full_latency_s": full_latency,
+            }
+
+            triage_seconds = sum(r["triage_latency_s"] or 0 for r in task_records)
+            triage_tokens = sum(r["triage_usage"].get("total_tokens", 0) for r in task_records)
+            triage_cost = sum(r["triage_cost"] or 0 for r in task_records)
+            if full_latency is not None:
+                has_baseline = True
+                saved_seconds += len(resolved) * full_latency - triage_seconds
+            if full_tokens is not None:
+                saved_tokens += len(resolved) * full_tokens - triage_tokens
+            if full_cost is not None:
+                saved_cost += len(resolved) * full_cost - triage_cost
+
+        escalated_count = sum(1 for r in records if r["escalated"])
+        return {
+            "calls": len(records),
+            "resolved_by_triage": len(records) - escalated_count,
+            "escalated": escalated_count,
+            "escalation_rate": round(escalated_count / len(records), 4) if records else None,
+            "saved_seconds": round(saved_seconds, 2) if has_baseline else None,
+            "saved_tokens": round(saved_tokens) if has_baseline else None,
+            "saved_cost": round(saved_cost, 6) if self.prices and has_baseline else None,
+            "tasks": tasks,
+        }
+
+
+def print_routing_summary(router: ModelRouter, task: Optional[str] = None):
+    """打印路由统计"""
+    summary = router.summary(task)
+    print("=" * 60)
+    print("🔀 模型路由统计")
+    print("=" * 60)
+    if not summary["calls"]:
+        print("  暂无调用")
+        print("=" * 60)
+        return
+    print(f"  调用次数: {summary['calls']}, 初筛解决: {summary['resolved_by_triage']}, "
+          f"升级: {summary['escalated']} ({summary['escalation_rate']:.0%})")
+    for name, stats in summary["tasks"].items():
+        reasons = ", ".join(f"{k} {v}" for k, v in stats["escalation_reasons"].items()) or "-"
+        full = f"{stats['avg_full_latency_s']:.2f}s" if stats["avg_full_latency_s"] is not None else "-"
+        print(f"  - {name}: {stats['calls']} 次, 升级 {stats['escalated']} 次 ({reasons}); "
+              f"平均耗时 初筛 {stats['avg_triage_latency_s']:.2f}s / 完整 {full}")
+    if summary["saved_seconds"] is None:
+        print("  💡 还没有升级调用作为基准，暂不估算节省量")
+    else:
+        print(f"  💰 估算节省: {summary['saved_seconds']:.1f} 秒, {summary['saved_tokens']} tokens", end="")
+        print(f", 费用 {summary['saved_cost']}" if summary["saved_cost"] is not None else "")
+    print("=" * 60)
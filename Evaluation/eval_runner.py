@@ -0,0 +1,416 @@
+"""
+自定义任务的并发离线评估
+
+在 README 中 evaluate_custom_task 示例的基础上:
+- 并发:asyncio + aiohttp,同时在途的请求数不超过 max_concurrency
+- 断点续跑:每完成一题立即追加写入 JSONL 检查点,重新运行时跳过已完成的题目
+- 响应缓存:按 (模型, 消息, 生成参数) 的哈希缓存响应,更换评分方式时用 rescore()
+  或重新运行都不会再次请求模型
+- 指标:每题记录延迟和 token 用量,汇总准确率、延迟分位数和 token 总量
+- 同一题集可以同时评估基础模型和微调模型
+
+使用示例:
+    questions = [{"question": "什么是机器学习?", "expected_answer": "..."}]
+    results = evaluate_models(["qwen3-32b", "ft:qwen3-32b:my-model"], questions,
+                              checkpoint_dir="eval_results")
+    print_model_comparison(results)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_SYSTEM_PROMPT = "你是一个专业的 AI 助手。"
+
+# 可重试的 HTTP 状态码
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def exact_match(answer: str, expected: Optional[str]) -> Optional[bool]:
+    """去掉首尾空白后完全一致;没有参考答案时返回 None"""
+    if expected is None:
+        return None
+    return answer.strip() == expected.strip()
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[\s\W_]+", "", text).lower()
+
+
+def contains_match(answer: str, expected: Optional[str]) -> Optional[bool]:
+    """忽略空白和标点后,回答中包含参考答案;没有参考答案时返回 None"""
+    if expected is None:
+        return None
+    return _normalize(expected) in _normalize(answer)
+
+
+def _item_id(item: Dict[str, Any], index: int) -> str:
+    if "id" in item:
+        return str(item["id"])
+    return hashlib.sha1(f"{index}\n{item['question']}".encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    确定性的响应缓存
+
+    键为请求参数(模型、消息、max_tokens、temperature)的哈希,值为模型响应,
+    以 JSONL 追加保存,进程重启后仍然有效。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry["response"]
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(key)
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        self._entries[key] = response
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "response": response}, ensure_ascii=False) + "\n")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class EvalRunner:
+    """单个模型的并发评估器"""
+
+    def __init__(
+        self,
+        model: str = "qwen3-32b",
+        api_key: Optional[str] = None,
+        base_url: str = "https://www.xpulink.ai/v1",
+        system_prompt: Optional[str] = DEFAULT_SYSTEM_PROMPT,
+        max_concurrency: int = 8,
+        max_tokens: int = 512,
+        temperature: float = 0.0,
+        checkpoint_path: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        scorer: Callable[[str, Optional[str]], Optional[bool]] = exact_match,
+        max_retries: int = 3,
+        timeout: float = 120
+    ):
+        """
+        初始化评估器
+
+        Args:
+            model: 模型名称(基础模型或微调模型)
+            api_key: API 密钥(默认从环境变量 XPU_API_KEY 获取)
+            base_url: API 基础地址
+            system_prompt: 系统提示词,为 None 时不加
+            max_concurrency: 同时在途的最大请求数
+            max_tokens: 最大生成 token 数
+            temperature: 采样温度
+            checkpoint_path: JSONL 检查点路径,为 None 时不保存进度
+            cache: 响应缓存,为 None 时不缓存
+            scorer: 评分函数 (模型回答, 参考答案) -> 是否正确
+            max_retries: 单个请求的最大重试次数
+            timeout: 单个请求的超时时间(秒)
+        """
+        self.model = model
+        self.api_key = api_key or os.getenv("XPU_API_KEY")
+        if not self.api_key:
+            raise ValueError("未找到 API Key,请设置 XPU_API_KEY 环境变量或传入 api_key 参数")
+        self.base_url = base_url.rstrip('/')
+        self.system_prompt = system_prompt
+        self.max_concurrency = max_concurrency
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.checkpoint_path = checkpoint_path
+        self.cache = cache
+        self.scorer = scorer
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+    def _payload(self, question: str) -> Dict[str, Any]:
+        messages = []
+        if self.system_prompt:
+            messages.append({"role": "system", "content": self.system_prompt})
+        messages.append({"role": "user", "content": question})
+        return {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+        }
+
+    def load_checkpoint(self) -> Dict[str, Dict[str, Any]]:
+        """读取检查点中已成功完成的题目"""
+        done = {}
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 崩溃时写了一半的最后一行
+                        continue
+                    if record.get("model") == self.model and not record.get("error"):
+                        done[record["id"]] = record
+        return done
+
+    async def _request(self, session: aiohttp.ClientSession, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """发送一个请求,按需重试"""
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with session.post(f"{self.base_url}/chat/completions", json=payload) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    text = await response.text()
+                    last_error = f"API 请求失败: {response.status}, {text[:200]}"
+                    if response.status not in RETRY_STATUS_CODES:
+                        break
+                    retry_after = response.headers.get("Retry-After")
+                    delay = float(retry_after) if retry_after and retry_after.isdigit() else None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = f"API 请求失败: {type(e).__name__} {e}"
+                delay = None
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay if delay is not None else 0.5 * (2 ** attempt) * (0.5 + random.random()))
+        raise RuntimeError(last_error)
+
+    async def _evaluate_item(
+        self,
+        session: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        item_id: str,
+        item: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        payload = self._payload(item["question"])
+        key = ResponseCache.make_key(payload)
+        record = {
+            "id": item_id,
+            "model": self.model,
+            "question": item["question"],
+            "expected_answer": item.get("expected_answer"),
+            "model_answer": None,
+            "correct": None,
+            "latency_ms": None,
+            "prompt_tokens": None,
+            "completion_tokens": None,
+            "cached": False,
+            "error": None,
+        }
+
+        response = self.cache.get(key) if self.cache is not None else None
+        if response is not None:
+            record["cached"] = True
+        else:
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await self._request(session, payload)
+                except Exception as e:
+                    record["error"] = str(e)
+                    return record
+                record["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            if self.cache is not None:
+                self.cache.put(key, response)
+
+        usage = response.get("usage") or {}
+        record["model_answer"] = response["choices"][0]["message"]["content"]
+        record["prompt_tokens"] = usage.get("prompt_tokens")
+        record["completion_tokens"] = usage.get("completion_tokens")
+        record["correct"] = self.scorer(record["model_answer"], record["expected_answer"])
+        return record
+
+    async def arun(self, items: Iterable[Dict[str, Any]], show_progress: bool = True) -> List[Dict[str, Any]]:
+        """
+        评估一组题目
+
+        Args:
+            items: 题目列表,每项包含 question,可选 expected_answer 和 id
+            show_progress: 是否打印进度
+
+        Returns:
+            按题目顺序排列的结果列表(包括检查点中已完成的题目)
+        """
+        items = list(items)
+        ids = [_item_id(item, i) for i, item in enumerate(items)]
+        done = self.load_checkpoint()
+        pending = [(item_id, item) for item_id, item in zip(ids, items) if item_id not in done]
+        if show_progress:
+            print(f"📝 {self.model}: 共 {len(items)} 题, 检查点中已完成 {len(items) - len(pending)} 题")
+
+        if self.checkpoint_path:
+            directory = os.path.dirname(self.checkpoint_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        results = dict(done)
+        start = time.time()
+        last_report = start
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+            tasks = [self._evaluate_item(session, semaphore, item_id, item) for item_id, item in pending]
+            checkpoint = open(self.checkpoint_path, "a", encoding="utf-8") if self.checkpoint_path else None
+            try:
+                for completed, future in enumerate(asyncio.as_completed(tasks), 1):
+                    record = await future
+                    results[record["id"]] = record
+                    if checkpoint is not None:
+                        checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        checkpoint.flush()
+                    now = time.time()
+                    if show_progress and (now - last_report >= 5 or completed == len(tasks)):
+                        last_report = now
+                        print(f"   进度: {completed}/{len(tasks)}, {completed / max(now - start, 1e-9):.1f} 题/秒")
+            finally:
+                if checkpoint is not None:
+                    checkpoint.close()
+
+        return [results[item_id] for item_id in ids if item_id in results]
+
+    def run(self, items: Iterable[Dict[str, Any]], show_progress: bool = True) -> List[Dict[str, Any]]:
+        """同步接口(在已有事件循环中请使用 await arun())"""
+        return asyncio.run(self.arun(items, show_progress))
+
+
+def rescore(results: List[Dict[str, Any]], scorer: Callable[[str, Optional[str]], Optional[bool]]) -> List[Dict[str, Any]]:
+    """用新的评分函数重新评分,不请求模型"""
+    rescored = []
+    for record in results:
+        record = dict(record)
+        if record["model_answer"] is not None:
+            record["correct"] = scorer(record["model_answer"], record["expected_answer"])
+        rescored.append(record)
+    return rescored
+
+
+def load_results(checkpoint_path: str) -> List[Dict[str, Any]]:
+    """读取检查点文件中的全部结果(同一题目以最后一条为准)"""
+    results = {}
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[(record["model"], record["id"])] = record
+    return list(results.values())
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    汇总一个模型的评估结果
+
+    Returns:
+        dict: 题数、准确率、错误数、缓存命中数、延迟分位数和 token 总量
+    """
+    scored = [r for r in results if r["correct"] is not None]
+    latencies = [r["latency_ms"] for r in results if r["latency_ms"] is not None]
+    return {
+        "model": results[0]["model"] if results else None,
+        "items": len(results),
+        "scored": len(scored),
+        "accuracy": sum(1 for r in scored if r["correct"]) / len(scored) if scored else None,
+        "errors": sum(1 for r in results if r["error"]),
+        "cached": sum(1 for r in results if r["cached"]),
+        "latency_p50_ms": _percentile(latencies, 50),
+        "latency_p95_ms": _percentile(latencies, 95),
+        "latency_mean_ms": round(sum(latencies) / len(latencies), 1) if latencies else None,
+        "prompt_tokens": sum(r["prompt_tokens"] or 0 for r in results),
+        "completion_tokens": sum(r["completion_tokens"] or 0 for r in results),
+    }
+
+
+def _checkpoint_name(model: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", model) + ".jsonl"
+
+
+def evaluate_models(
+    models: List[str],
+    items: Iterable[Dict[str, Any]],
+    checkpoint_dir: Optional[str] = "eval_results",
+    use_cache: bool = True,
+    **runner_kwargs: Any
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    用同一题集同时评估多个模型(例如基础模型和微调模型)
+
+    Args:
+        models: 模型名称列表
+        items: 题目列表
+        checkpoint_dir: 检查点和缓存目录,每个模型一个检查点文件;为 None 时不保存
+        use_cache: 是否使用响应缓存
+        **runner_kwargs: 传给 EvalRunner 的其他参数
+
+    Returns:
+        模型名称 -> 结果列表
+    """
+    items = list(items)
+    cache = None
+    if use_cache and checkpoint_dir:
+        cache = ResponseCache(os.path.join(checkpoint_dir, "response_cache.jsonl"))
+
+    async def run_all():
+        runners = [
+            EvalRunner(
+                model=model,
+                checkpoint_path=os.path.join(checkpoint_dir, _checkpoint_name(model)) if checkpoint_dir else None,
+                cache=cache,
+                **runner_kwargs
+            )
+            for model in models
+        ]
+        outputs = await asyncio.gather(*(runner.arun(items) for runner in runners))
+        return dict(zip(models, outputs))
+
+    return asyncio.run(run_all())
+
+
+def print_model_comparison(results: Dict[str, List[Dict[str, Any]]]):
+    """打印各模型的准确率、延迟和 token 用量"""
+    print("=" * 80)
+    print("📊 评估结果对比")
+    print("=" * 80)
+    print(f"{'模型':<32} {'准确率':>8} {'错误':>6} {'缓存':>6} {'P50(ms)':>9} {'P95(ms)':>9} {'输出token':>10}")
+    print("-" * 80)
+    for model, model_results in results.items():
+        summary = summarize(model_results)
+        accuracy = f"{summary['accuracy']:.1%}" if summary["accuracy"] is not None else "-"
+        p50 = f"{summary['latency_p50_ms']:.0f}" if summary["latency_p50_ms"] is not None else "-"
+        p95 = f"{summary['latency_p95_ms']:.0f}" if summary["latency_p95_ms"] is not None else "-"
+        print(f"{model:<32} {accuracy:>8} {summary['errors']:>6} {summary['cached']:>6} "
+              f"{p50:>9} {p95:>9} {summary['completion_tokens']:>10,}")
+    print("=" * 80)
@@ -0,0 +1,341 @@
+"""
+异步微调任务监控
+
+在一个事件循环中同时监控多个微调任务:
+- 优先订阅任务事件流(GET /fine_tuning/jobs/{id}/events?stream=true, SSE),
+  状态变化即时送达;服务端不支持时自动改为轮询
+- 轮询间隔自适应:状态不变时按指数增长,状态变化时重置,
+  服务端返回 estimated_finish 时在预计完成时间附近加密轮询
+- 每个任务对应一个 asyncio.Future,也可以注册完成回调
+- 记录任务完成(服务端 finished_at)到本地收到通知之间的延迟
+
+使用示例:
+    async with JobWatcher() as watcher:
+        for job_id in job_ids:
+            watcher.watch(job_id, callback=lambda job: print(job["status"]))
+        results = await watcher.wait()
+    print_watch_summary(watcher)
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+
+from lora_finetune import load_env
+
+# 任务的终止状态
+TERMINAL_STATUSES = {"succeeded", "failed", "cancelled", "canceled"}
+
+
+class JobWatcher:
+    """多任务异步监控器"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = "https://www.xpulink.ai/v1",
+        min_interval: float = 2.0,
+        max_interval: float = 60.0,
+        backoff_factor: float = 1.5,
+        use_events: bool = True,
+        max_concurrent_requests: int = 8,
+        request_timeout: float = 30.0
+    ):
+        """
+        初始化任务监控器
+
+        Args:
+            api_key: XPULink API Key (如果不提供,会从环境变量 XPULINK_API_KEY 读取)
+            base_url: API 基础 URL
+            min_interval: 最短轮询间隔(秒)
+            max_interval: 最长轮询间隔(秒)
+            backoff_factor: 状态不变时轮询间隔的增长倍数
+            use_events: 是否优先使用事件流
+            max_concurrent_requests: 同时在途的最大请求数
+            request_timeout: 查询任务详情的超时(秒);事件流是长连接,不受此限制
+        """
+        if api_key is None:
+            load_env()
+        self.api_key = api_key or os.getenv("XPULINK_API_KEY")
+        if not self.api_key:
+            raise ValueError("未找到 API Key,请设置 XPULINK_API_KEY 环境变量或传入 api_key 参数")
+
+        self.base_url = base_url.rstrip('/')
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.use_events = use_events
+        self.max_concurrent_requests = max_concurrent_requests
+        self.request_timeout = request_timeout
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # 服务端是否支持事件流,第一次失败后不再尝试
+        self._events_supported: Optional[bool] = None
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._callbacks: Dict[str, List[Callable]] = {}
+        # 每个任务的监控记录:轮询次数、事件数、状态变化、通知延迟
+        self.records: Dict[str, Dict[str, Any]] = {}
+
+    async def __aenter__(self) -> "JobWatcher":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        """创建 HTTP 会话(在事件循环中调用)"""
+        if self.session is None:
+            # 会话默认不限制读超时,供事件流长连接使用;普通请求单独设置超时
+            self.session = aiohttp.ClientSession(
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=None)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+    async def close(self) -> None:
+        """取消未完成的监控并关闭会话"""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def watch(self, job_id: str, callback: Optional[Callable[[Dict], Any]] = None) -> asyncio.Future:
+        """
+        开始监控一个任务
+
+        Args:
+            job_id: 微调任务 ID
+            callback: 任务结束时的回调,参数为最终任务信息,可以是协程函数
+
+        Returns:
+            任务结束时完成的 Future,结果为最终任务信息
+        """
+        if self.session is None:
+            raise RuntimeError("请在 async with JobWatcher() 中使用,或先调用 await watcher.start()")
+
+        if callback is not None:
+            self._callbacks.setdefault(job_id, []).append(callback)
+        if job_id in self._futures:
+            return self._futures[job_id]
+
+        loop = asyncio.get_running_loop()
+        self._futures[job_id] = loop.create_future()
+        self.records[job_id] = {
+            "job_id": job_id,
+            "mode": None,
+            "polls": 0,
+            "events": 0,
+            "status_history": [],
+            "watch_started_at": time.time(),
+            "finished_at": None,
+            "notified_at": None,
+            "notification_latency_seconds": None,
+        }
+        self._tasks[job_id] = loop.create_task(self._run(job_id))
+        return self._futures[job_id]
+
+    async def wait(self, job_ids: Optional[Iterable[str]] = None, timeout: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        等待任务结束
+
+        Args:
+            job_ids: 要等待的任务(默认等待所有已监控的任务)
+            timeout: 超时时间(秒)
+
+        Returns:
+            任务 ID -> 最终任务信息
+        """
+        job_ids = list(job_ids) if job_ids is not None else list(self._futures)
+        futures = [self.watch(job_id) for job_id in job_ids]
+        results = await asyncio.wait_for(asyncio.gather(*futures), timeout)
+        return dict(zip(job_ids, results))
+
+    async def _get_job(self, job_id: str) -> Dict:
+        async with self._semaphore:
+            async with self.session.get(
+                f"{self.base_url}/fine_tuning/jobs/{job_id}",
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            ) as response:
+                if response.status == 404:
+                    raise LookupError(f"任务不存在: {job_id}")
+                if response.status != 200:
+                    raise aiohttp.ClientResponseError(
+                        response.request_info, response.history,
+                        status=response.status, message=await response.text()
+                    )
+                return await response.json()
+
+    def _record_status(self, job_id: str, status: Optional[str]) -> None:
+        history = self.records[job_id]["status_history"]
+        if status and (not history or history[-1][0] != status):
+            history.append((status, time.time()))
+
+    async def _stream_events(self, job_id: str) -> Optional[Dict]:
+        """
+        通过事件流等待任务结束
+
+        Returns:
+            任务结束时返回最终任务信息;服务端不支持事件流或连接中断时返回 None
+        """
+        record = self.records[job_id]
+        url = f"{self.base_url}/fine_tuning/jobs/{job_id}/events?stream=true"
+        try:
+            async with self.session.get(url, headers={"Accept": "text/event-stream"}) as response:
+                content_type = response.headers.get("Content-Type", "")
+                if response.status != 200 or "text/event-stream" not in content_type:
+                    self._events_supported = False
+                    return None
+                self._events_supported = True
+                record["mode"] = "events"
+
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    record["events"] += 1
+                    event = json.loads(data)
+                    status = (event.get("data") or {}).get("status")
+                    self._record_status(job_id, status)
+                    if status in TERMINAL_STATUSES:
+                        break
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError):
+            return None
+
+        # 以任务详情为准(事件中不包含 fine_tuned_model 等字段);查询失败时交给轮询
+        try:
+            job = await self._get_job(job_id)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+        return job if job.get("status") in TERMINAL_STATUSES else None
+
+    def _next_interval(self, interval: float, status_changed: bool, job: Dict) -> float:
+        if status_changed:
+            interval = self.min_interval
+        else:
+            interval = min(self.max_interval, interval * self.backoff_factor)
+        estimated_finish = job.get("estimated_finish")
+        if estimated_finish:
+            # 不要睡过预计完成时间;已过预计时间时任务多半只是比预计慢,继续正常退避
+            remaining = estimated_finish - time.time()
+            if remaining > 0:
+                interval = max(self.min_interval, min(interval, remaining))
+        return interval
+
+    async def _poll(self, job_id: str) -> Dict:
+        """自适应轮询直到任务结束"""
+        record = self.records[job_id]
+        record["mode"] = record["mode"] or "polling"
+        interval = self.min_interval
+        last_status = None
+
+        while True:
+            try:
+                job = await self._get_job(job_id)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # 网络抖动:按当前间隔退避后重试
+                interval = min(self.max_interval, interval * self.backoff_factor)
+                await asyncio.sleep(interval)
+                continue
+            record["polls"] += 1
+
+            status = job.get("status")
+            self._record_status(job_id, status)
+            if status in TERMINAL_STATUSES:
+                return job
+
+            interval = self._next_interval(interval, status != last_status, job)
+            last_status = status
+            await asyncio.sleep(interval)
+
+    async def _run(self, job_id: str) -> None:
+        future = self._futures[job_id]
+        try:
+            job = None
+            if self.use_events and self._events_supported is not False:
+                job = await self._stream_events(job_id)
+            if job is None:
+                job = await self._poll(job_id)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            return
+
+        record = self.records[job_id]
+        record["notified_at"] = time.time()
+        record["finished_at"] = job.get("finished_at")
+        if record["finished_at"]:
+            record["notification_latency_seconds"] = round(record["notified_at"] - record["finished_at"], 3)
+
+        future.set_result(job)
+        for callback in self._callbacks.get(job_id, []):
+            result = callback(job)
+            if asyncio.iscoroutine(result):
+                await result
+
+    def summary(self) -> Dict[str, Any]:
+        """汇总所有任务的请求数和通知延迟"""
+        latencies = [r["notification_latency_seconds"] for r in self.records.values()
+                     if r["notification_latency_seconds"] is not None]
+        return {
+            "jobs": len(self.records),
+            "polls": sum(r["polls"] for r in self.records.values()),
+            "events": sum(r["events"] for r in self.records.values()),
+            "mean_latency_seconds": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "max_latency_seconds": round(max(latencies), 3) if latencies else None,
+        }
+
+
+def watch_jobs(job_ids: Iterable[str], callback: Optional[Callable[[Dict], Any]] = None, **kwargs) -> Dict[str, Dict]:
+    """
+    同步接口:监控一组任务直到全部结束(在已有事件循环中请使用 JobWatcher)
+
+    Args:
+        job_ids: 微调任务 ID 列表
+        callback: 每个任务结束时的回调
+        **kwargs: 传给 JobWatcher 的参数
+
+    Returns:
+        任务 ID -> 最终任务信息
+    """
+    async def run():
+        async with JobWatcher(**kwargs) as watcher:
+            for job_id in job_ids:
+                watcher.watch(job_id, callback=callback)
+            results = await watcher.wait()
+            print_watch_summary(watcher)
+            return results
+
+    return asyncio.run(run())
+
+
+def print_watch_summary(watcher: JobWatcher):
+    """打印每个任务的监控方式、请求数和通知延迟"""
+    print("=" * 60)
+    print("📡 任务监控统计")
+    print("=" * 60)
+    for record in watcher.records.values():
+        status = record["status_history"][-1][0] if record["status_history"] else "未知"
+        latency = record["notification_latency_seconds"]
+        latency_text = f"{latency:.2f} 秒" if latency is not None else "-"
+        print(f"  - {record['job_id']}: {status}, 方式 {record['mode']}, "
+              f"轮询 {record['polls']} 次, 事件 {record['events']} 个, 通知延迟 {latency_text}")
+    summary = watcher.summary()
+    if summary["mean_latency_seconds"] is not None:
+        print(f"\n  平均通知延迟: {summary['mean_latency_seconds']:.2f} 秒, "
+              f"最大: {summary['max_latency_seconds']:.2f} 秒")
+    print("=" * 60)
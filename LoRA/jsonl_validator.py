@@ -0,0 +1,392 @@
+"""
+训练数据流式校验与去重
+
+validate_jsonl 逐行扫描 JSONL 训练文件,一次遍历完成:
+- 格式校验:收集所有错误及行号,而不是遇到第一个错误就停止;strict=True 时
+  额外检查 system 消息位置、空 content 和是否有 assistant 回复
+- 去重:按对话内容(各消息的 role 和 content)计算哈希,标记重复的对话
+- 统计:消息数、各角色消息数和字符数、对话长度分布
+
+大文件按字节范围切分,由进程池并行处理。每个分片只保留计数、固定大小的
+直方图和前 max_errors 条错误信息;另外每条有效记录保存 8 字节的内容哈希和
+8 字节的行号、每条问题行保存 8 字节的行号,因此内存占用随记录数线性增长:
+加上合并和排序时的临时数组,峰值约为每条记录 70 字节(100 万条记录约 70 MB)。
+check_duplicates=False 时不保存哈希,只剩问题行的行号。
+
+使用示例:
+    report = validate_jsonl("data/training_data.jsonl", num_workers=8)
+    print_validation_report(report)
+    if report["duplicates"] or report["invalid"]:
+        write_clean_file("data/training_data.jsonl", "data/training_data.clean.jsonl", report)
+"""
+
+import hashlib
+import json
+import math
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _JSON_ERRORS: Tuple[type, ...] = (orjson.JSONDecodeError, json.JSONDecodeError, UnicodeDecodeError)
+except ImportError:
+    _loads = json.loads
+    _JSON_ERRORS = (json.JSONDecodeError, UnicodeDecodeError)
+
+# 允许的消息角色
+VALID_ROLES = ("system", "user", "assistant")
+
+# 对话字符数直方图的分桶上界(最后一个桶为无穷大)
+LENGTH_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+# 单个分片的最小和最大字节数
+MIN_SHARD_SIZE = 1024 * 1024
+MAX_SHARD_SIZE = 64 * 1024 * 1024
+
+
+def validate_record(data: Any, strict: bool = False) -> List[Tuple[str, str]]:
+    """
+    校验一条训练样本
+
+    Args:
+        data: 解析后的 JSON 对象
+        strict: 是否启用严格检查(system 只能在开头、content 不能为空、至少一条 assistant 消息)
+
+    Returns:
+        错误列表,每项为 (错误类型, 错误说明);为空表示通过
+    """
+    if not isinstance(data, dict):
+        return [("not_object", "每行必须是一个 JSON 对象")]
+    if "messages" not in data:
+        return [("missing_messages", "缺少 'messages' 字段")]
+
+    messages = data["messages"]
+    if not isinstance(messages, list) or len(messages) < 2:
+        return [("messages_type", "'messages' 必须是包含至少2条消息的列表")]
+
+    errors = []
+    has_assistant = False
+    for j, msg in enumerate(messages, 1):
+        if not isinstance(msg, dict):
+            errors.append(("message_type", f"第 {j} 条消息必须是对象"))
+            continue
+        if "role" not in msg or "content" not in msg:
+            errors.append(("missing_field", f"第 {j} 条消息缺少 'role' 或 'content' 字段"))
+            continue
+
+        role, content = msg["role"], msg["content"]
+        if role not in VALID_ROLES:
+            errors.append(("invalid_role", f"第 {j} 条消息的 role 无效: {role}"))
+        elif strict and role == "system" and j != 1:
+            errors.append(("system_position", f"第 {j} 条消息: system 消息只能出现在开头"))
+        has_assistant = has_assistant or role == "assistant"
+
+        if not isinstance(content, str):
+            errors.append(("content_type", f"第 {j} 条消息的 content 必须是字符串"))
+        elif strict and not content.strip():
+            errors.append(("empty_content", f"第 {j} 条消息的 content 为空"))
+
+    if strict and not errors and not has_assistant:
+        errors.append(("no_assistant", "至少需要一条 assistant 消息"))
+    return errors
+
+
+def conversation_hash(messages: List[Dict[str, str]]) -> int:
+    """
+    计算对话的内容哈希
+
+    只使用各消息的 role 和去掉首尾空白的 content,忽略键顺序、JSON 格式和其他字段。
+
+    Returns:
+        64 位无符号整数
+    """
+    h = hashlib.blake2b(digest_size=8)
+    for msg in messages:
+        h.update(msg["role"].encode("utf-8"))
+        h.update(b"\x1f")
+        h.update(msg["content"].strip().encode("utf-8"))
+        h.update(b"\x1e")
+    return int.from_bytes(h.digest(), "little")
+
+
+def _new_stats() -> Dict[str, Any]:
+    return {
+        "messages_total": 0,
+        "messages_min": None,
+        "messages_max": 0,
+        "chars_total": 0,
+        "chars_min": None,
+        "chars_max": 0,
+        "roles": {role: 0 for role in VALID_ROLES},
+        "role_chars": {role: 0 for role in VALID_ROLES},
+        "role_chars_max": {role: 0 for role in VALID_ROLES},
+        "histogram": [0] * (len(LENGTH_BUCKETS) + 1),
+    }
+
+
+def _update_stats(stats: Dict[str, Any], messages: List[Dict[str, str]]) -> None:
+    n = len(messages)
+    chars = 0
+    for msg in messages:
+        role, length = msg["role"], len(msg["content"])
+        chars += length
+        stats["roles"][role] += 1
+        stats["role_chars"][role] += length
+        if length > stats["role_chars_max"][role]:
+            stats["role_chars_max"][role] = length
+
+    stats["messages_total"] += n
+    stats["messages_min"] = n if stats["messages_min"] is None else min(stats["messages_min"], n)
+    stats["messages_max"] = max(stats["messages_max"], n)
+    stats["chars_total"] += chars
+    stats["chars_min"] = chars if stats["chars_min"] is None else min(stats["chars_min"], chars)
+    stats["chars_max"] = max(stats["chars_max"], chars)
+
+    bucket = 0
+    while bucket < len(LENGTH_BUCKETS) and chars > LENGTH_BUCKETS[bucket]:
+        bucket += 1
+    stats["histogram"][bucket] += 1
+
+
+def _merge_stats(total: Dict[str, Any], part: Dict[str, Any]) -> None:
+    for key in ("messages_total", "chars_total"):
+        total[key] += part[key]
+    for key in ("messages_max", "chars_max"):
+        total[key] = max(total[key], part[key])
+    for key in ("messages_min", "chars_min"):
+        if part[key] is not None:
+            total[key] = part[key] if total[key] is None else min(total[key], part[key])
+    for role in VALID_ROLES:
+        total["roles"][role] += part["roles"][role]
+        total["role_chars"][role] += part["role_chars"][role]
+        total["role_chars_max"][role] = max(total["role_chars_max"][role], part["role_chars_max"][role])
+    total["histogram"] = [a + b for a, b in zip(total["histogram"], part["histogram"])]
+
+
+def _validate_range(args: Tuple[str, int, int, int, bool]) -> Dict[str, Any]:
+    """
+    校验文件中 [start, end) 字节范围内开始的所有行
+
+    行号是分片内的局部行号(从 0 开始),由调用方换算成全局行号。
+    """
+    file_path, start, end, max_errors, check_duplicates, strict = args
+    result = {
+        "lines": 0,
+        "valid": 0,
+        "invalid": 0,
+        "errors": [],
+        "error_counts": {},
+        "error_lines": array("Q"),
+        "hashes": array("Q"),
+        "hash_lines": array("Q"),
+        "stats": _new_stats(),
+    }
+
+    with open(file_path, "rb") as f:
+        if start > 0:
+            # 跳过上一个分片负责的半行;若 start 恰好是行首,只会读到前一行的换行符
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            local_line = result["lines"]
+            result["lines"] += 1
+
+            if not line.strip():
+                errors = [("empty_line", "空行")]
+            else:
+                try:
+                    data = _loads(line)
+                except _JSON_ERRORS as e:
+                    errors = [("json", f"JSON 解析错误: {e}")]
+                else:
+                    errors = validate_record(data, strict)
+
+            if errors:
+                result["invalid"] += 1
+                result["error_lines"].append(local_line)
+                for code, message in errors:
+                    result["error_counts"][code] = result["error_counts"].get(code, 0) + 1
+                    if len(result["errors"]) < max_errors:
+                        result["errors"].append((local_line, code, message))
+                continue
+
+            result["valid"] += 1
+            messages = data["messages"]
+            _update_stats(result["stats"], messages)
+            if check_duplicates:
+                result["hashes"].append(conversation_hash(messages))
+                result["hash_lines"].append(local_line)
+
+    return result
+
+
+def _shard_ranges(file_size: int, num_workers: int, shard_size: Optional[int]) -> List[Tuple[int, int]]:
+    if shard_size is None:
+        # 每个进程大约分到 4 个分片,便于负载均衡
+        shard_size = file_size // max(1, num_workers * 4)
+        shard_size = min(MAX_SHARD_SIZE, max(MIN_SHARD_SIZE, shard_size))
+    num_shards = max(1, math.ceil(file_size / shard_size))
+    return [(i * shard_size, min(file_size, (i + 1) * shard_size)) for i in range(num_shards)]
+
+
+def validate_jsonl(
+    file_path: str,
+    num_workers: Optional[int] = None,
+    shard_size: Optional[int] = None,
+    max_errors: int = 100,
+    check_duplicates: bool = True,
+    strict: bool = False
+) -> Dict[str, Any]:
+    """
+    流式校验 JSONL 训练文件,同时去重和统计
+
+    Args:
+        file_path: 训练数据文件路径
+        num_workers: 并行进程数(默认 CPU 核数,1 表示在当前进程中执行)
+        shard_size: 每个分片的字节数(默认按文件大小和进程数自动选择)
+        max_errors: 报告中保留的错误信息条数(错误总数和分类计数始终准确)
+        check_duplicates: 是否检查重复对话(每条有效记录需要约 16 字节内存)
+        strict: 是否启用严格检查(见 validate_record)
+
+    Returns:
+        dict: 校验报告,行号从 1 开始
+    """
+    start_time = time.time()
+    file_size = os.path.getsize(file_path)
+    num_workers = num_workers or os.cpu_count() or 1
+    ranges = _shard_ranges(file_size, num_workers, shard_size)
+    tasks = [(file_path, start, end, max_errors, check_duplicates, strict) for start, end in ranges]
+
+    if num_workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(tasks))) as executor:
+            parts = list(executor.map(_validate_range, tasks))
+    else:
+        parts = [_validate_range(task) for task in tasks]
+
+    report = {
+        "file": file_path,
+        "bytes": file_size,
+        "shards": len(parts),
+        "lines": 0,
+        "valid": 0,
+        "invalid": 0,
+        "errors": [],
+        "error_counts": {},
+        "stats": _new_stats(),
+    }
+    error_lines, hashes, hash_lines = [], [], []
+    line_offset = 0
+    for part in parts:
+        # 局部行号 -> 全局行号(从 1 开始)
+        offset = line_offset + 1
+        report["lines"] += part["lines"]
+        report["valid"] += part["valid"]
+        report["invalid"] += part["invalid"]
+        for code, count in part["error_counts"].items():
+            report["error_counts"][code] = report["error_counts"].get(code, 0) + count
+        for local_line, code, message in part["errors"]:
+            if len(report["errors"]) < max_errors:
+                report["errors"].append({"line": local_line + offset, "type": code, "message": message})
+        _merge_stats(report["stats"], part["stats"])
+
+        error_lines.append(np.frombuffer(part["error_lines"], dtype=np.uint64) + np.uint64(offset))
+        hashes.append(np.frombuffer(part["hashes"], dtype=np.uint64))
+        hash_lines.append(np.frombuffer(part["hash_lines"], dtype=np.uint64) + np.uint64(offset))
+        line_offset += part["lines"]
+
+    report["error_lines"] = np.concatenate(error_lines)
+    hashes = np.concatenate(hashes)
+    hash_lines = np.concatenate(hash_lines)
+    if check_duplicates and len(hashes):
+        # 分片按文件顺序拼接,return_index 给出的正是每个哈希第一次出现的位置
+        _, first = np.unique(hashes, return_index=True)
+        keep = np.zeros(len(hashes), dtype=bool)
+        keep[first] = True
+        report["duplicate_lines"] = hash_lines[~keep]
+    else:
+        report["duplicate_lines"] = np.zeros(0, dtype=np.uint64)
+    report["duplicates"] = int(len(report["duplicate_lines"]))
+    report["unique"] = report["valid"] - report["duplicates"]
+
+    elapsed = time.time() - start_time
+    report["elapsed_seconds"] = round(elapsed, 3)
+    report["mb_per_second"] = round(file_size / 1024 / 1024 / max(elapsed, 1e-9), 1)
+    return report
+
+
+def write_clean_file(file_path: str, output_file: str, report: Dict[str, Any]) -> int:
+    """
+    按校验报告写出去掉无效行和重复对话后的文件
+
+    Args:
+        file_path: 原始训练数据文件
+        output_file: 输出文件路径
+        report: validate_jsonl 对该文件的校验报告
+
+    Returns:
+        写出的行数
+    """
+    drop = np.union1d(report["error_lines"], report["duplicate_lines"])
+    written = 0
+    cursor = 0
+    with open(file_path, "rb") as src, open(output_file, "wb") as dst:
+        for line_number, line in enumerate(src, 1):
+            if cursor < len(drop) and drop[cursor] == line_number:
+                cursor += 1
+                continue
+            dst.write(line if line.endswith(b"\n") else line + b"\n")
+            written += 1
+
+    print(f"✅ 已写出 {written} 条有效且不重复的对话到: {output_file}")
+    return written
+
+
+def print_validation_report(report: Dict[str, Any]):
+    """打印校验报告"""
+    stats = report["stats"]
+    print("=" * 60)
+    print(f"🔍 训练数据校验: {report['file']}")
+    print("=" * 60)
+    print(f"  - 总行数: {report['lines']:,} ({report['bytes'] / 1024 / 1024:.1f} MB, "
+          f"{report['shards']} 个分片, {report['elapsed_seconds']:.2f} 秒, {report['mb_per_second']} MB/s)")
+    print(f"  - 有效: {report['valid']:,}, 无效: {report['invalid']:,}, "
+          f"重复: {report['duplicates']:,}, 可用: {report['unique']:,}")
+
+    if report["error_counts"]:
+        print("\n❌ 错误分类:")
+        for code, count in sorted(report["error_counts"].items(), key=lambda item: -item[1]):
+            print(f"  - {code}: {count:,}")
+        print(f"\n❌ 错误明细(前 {len(report['errors'])} 条):")
+        for error in report["errors"]:
+            print(f"  - 第 {error['line']} 行: {error['message']}")
+
+    if report["valid"]:
+        print("\n📊 数据统计:")
+        print(f"  - 每个对话的消息数: 最少 {stats['messages_min']}, 最多 {stats['messages_max']}, "
+              f"平均 {stats['messages_total'] / report['valid']:.1f}")
+        print(f"  - 每个对话的字符数: 最少 {stats['chars_min']:,}, 最多 {stats['chars_max']:,}, "
+              f"平均 {stats['chars_total'] / report['valid']:,.0f}")
+        for role in VALID_ROLES:
+            count = stats["roles"][role]
+            if count:
+                print(f"  - {role}: {count:,} 条消息, 平均 {stats['role_chars'][role] / count:,.0f} 字符, "
+                      f"最长 {stats['role_chars_max'][role]:,} 字符")
+        print("\n📏 对话长度分布(字符):")
+        lower = 0
+        for upper, count in zip(LENGTH_BUCKETS + (None,), stats["histogram"]):
+            label = f"{lower}-{upper}" if upper else f">{lower}"
+            print(f"  - {label:>12}: {count:,}")
+            lower = upper
+    print("=" * 60)
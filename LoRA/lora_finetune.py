@@ -9,14 +9,143 @@ LoRA 是一种参数高效的微调方法,可以用较少的计算资源对大
 """
 
 import os
+import sys
 import json
-import requests
+import hashlib
+import threading
 import time
-from typing import List, Dict, Optional
-from dotenv import load_dotenv
+from typing import Iterable, List, Dict, Optional
 
-# 加载环境变量
-load_dotenv()
+# 共享模块(客户端流控、按需导入)位于仓库根目录
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+from lazy_imports import LazyModule
+from xpulink_concurrency import get_controller
+
+# requests 在第一次发请求时才导入,只做数据准备或估算时不需要付出导入开销
+requests = LazyModule("requests")
+
+_env_loaded = False
+
+
+def load_env():
+    """从 .env 文件加载环境变量(只加载一次;未安装 python-dotenv 时跳过)"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    _env_loaded = True
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+# 超过该大小的文件使用分片上传,分片大小同此值
+DEFAULT_PART_SIZE = 64 * 1024 * 1024
+
+# 从磁盘读取文件时每次读取的字节数
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+# 单个分片的最大重试次数
+PART_MAX_RETRIES = 3
+
+# 微调任务的默认超参数
+DEFAULT_HYPERPARAMETERS = {
+    "n_epochs": 3,              # 训练轮数
+    "batch_size": 4,            # 批次大小
+    "learning_rate": 5e-5,      # 学习率
+    "lora_r": 8,                # LoRA 秩
+    "lora_alpha": 16,           # LoRA alpha 参数
+    "lora_dropout": 0.05        # LoRA dropout
+}
+
+
+class MultipartFileStream:
+    """
+    把文件(或文件中的一段)包装为 multipart/form-data 请求体
+
+    请求体按需从磁盘读取,内存占用与文件大小无关。提供 read() 和 __len__,
+    requests 会据此设置 Content-Length 并分块发送。
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        field_name: str,
+        filename: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        fields: Optional[Dict[str, str]] = None,
+        content_type: str = "application/octet-stream",
+        on_read=None,
+        digest=None
+    ):
+        """
+        Args:
+            file_path: 文件路径
+            field_name: 文件字段名
+            filename: multipart 中的文件名
+            offset: 起始偏移
+            length: 读取长度(默认读到文件末尾)
+            fields: 额外的普通表单字段
+            content_type: 文件部分的 MIME 类型
+            on_read: 每读取一块文件内容后的回调,参数为字节数
+            digest: hashlib 对象(如 hashlib.md5()),读取文件内容时同步更新
+        """
+        boundary = os.urandom(16).hex()
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+
+        preamble = b""
+        for name, value in (fields or {}).items():
+            preamble += (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n"
+                         f"{value}\r\n").encode("utf-8")
+        preamble += (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field_name}\"; "
+                     f"filename=\"{filename}\"\r\nContent-Type: {content_type}\r\n\r\n").encode("utf-8")
+        self._preamble = preamble
+        self._epilogue = f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+        self._file = open(file_path, "rb")
+        self._file.seek(offset)
+        self._file_remaining = (os.path.getsize(file_path) - offset) if length is None else length
+        self._length = len(self._preamble) + self._file_remaining + len(self._epilogue)
+        self._on_read = on_read
+        self._digest = digest
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = UPLOAD_BLOCK_SIZE
+        if self._preamble:
+            chunk, self._preamble = self._preamble[:size], self._preamble[size:]
+            return chunk
+        if self._file_remaining > 0:
+            chunk = self._file.read(min(size, self._file_remaining))
+            self._file_remaining -= len(chunk)
+            if not chunk:
+                raise IOError("文件在上传过程中被截断")
+            if self._digest is not None:
+                self._digest.update(chunk)
+            if self._on_read:
+                self._on_read(len(chunk))
+            return chunk
+        chunk, self._epilogue = self._epilogue[:size], self._epilogue[size:]
+        return chunk
+
+    def close(self):
+        self._file.close()
+
+
+def file_md5(file_path: str) -> str:
+    """流式计算文件的 MD5"""
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(UPLOAD_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
 
 class XPULinkLoRAFineTuner:
@@ -30,6 +159,8 @@ class XPULinkLoRAFineTuner:
             api_key: XPULink API Key (如果不提供,会从环境变量 XPULINK_API_KEY 读取)
             base_url: API 基础 URL
         """
+        if api_key is None:
+            load_env()
         self.api_key = api_key or os.getenv("XPULINK_API_KEY")
         if not self.api_key:
             raise ValueError("未找到 API Key,请设置 XPULINK_API_KEY 环境变量或传入 api_key 参数")
@@ -39,13 +170,20 @@ class XPULinkLoRAFineTuner:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-
-    def prepare_training_data(self, conversations: List[Dict[str, str]], output_file: str):
+        # 最近一次上传的统计信息(字节数、耗时、吞吐量、分片数等)
+        self.last_upload_stats: Dict = {}
+        # 并发控制与熔断,与同进程的其他客户端共享:
+        # 文件/分片上传、任务管理接口、对话接口各用一个
+        self.upload_controller = get_controller("xpulink-files")
+        self.api_controller = get_controller("xpulink-api")
+        self.chat_controller = get_controller("xpulink-chat")
+
+    def prepare_training_data(self, conversations: Iterable[Dict[str, str]], output_file: str):
         """
         准备训练数据,转换为 JSONL 格式
 
         Args:
-            conversations: 对话列表,每个对话包含多轮交互
+            conversations: 对话列表或生成器,每个对话包含多轮交互(逐条写出)
             output_file: 输出文件路径
 
         示例对话格式:
@@ -59,47 +197,320 @@ class XPULinkLoRAFineTuner:
             }
         ]
         """
+        count = 0
         with open(output_file, 'w', encoding='utf-8') as f:
             for conversation in conversations:
                 f.write(json.dumps(conversation, ensure_ascii=False) + '\n')
+                count += 1
 
         print(f"✅ 训练数据已保存到: {output_file}")
-        print(f"📊 总对话数: {len(conversations)}")
+        print(f"📊 总对话数: {count}")
         return output_file
 
-    def upload_training_file(self, file_path: str) -> str:
+    def upload_training_file(
+        self,
+        file_path: str,
+        part_size: int = DEFAULT_PART_SIZE,
+        max_workers: int = 4,
+        resume: bool = True
+    ) -> str:
         """
         上传训练文件到 XPULink
 
+        文件按需从磁盘流式读取,不会整体载入内存。不超过 part_size 的文件
+        通过 /files 单请求上传;更大的文件通过 /uploads 分片并行上传,进度
+        记录在 "<文件名>.upload.json" 中,中断后再次调用会跳过已上传的分片。
+
         Args:
             file_path: 训练数据文件路径
+            part_size: 分片大小(字节)
+            max_workers: 并行上传的分片数
+            resume: 是否从上次中断处继续
 
         Returns:
             file_id: 上传后的文件 ID
         """
-        url = f"{self.base_url}/files"
+        file_size = os.path.getsize(file_path)
+        start = time.perf_counter()
+
+        if file_size <= part_size:
+            file_id, verified = self._upload_single(file_path, file_size)
+            parts, bytes_sent = 1, file_size
+        else:
+            file_id, parts, bytes_sent, verified = self._upload_multipart(
+                file_path, file_size, part_size, max_workers, resume
+            )
+
+        elapsed = time.perf_counter() - start
+        # 吞吐量按本次实际发送的字节数计算(断点续传时不含之前已上传的分片)
+        self.last_upload_stats = {
+            "file_id": file_id,
+            "bytes": file_size,
+            "bytes_sent": bytes_sent,
+            "parts": parts,
+            "verified": verified,
+            "elapsed_seconds": round(elapsed, 2),
+            "mb_per_second": round(bytes_sent / 1024 / 1024 / elapsed, 2) if elapsed else 0.0,
+        }
+
+        print(f"✅ 文件上传成功!")
+        print(f"📄 文件 ID: {file_id}")
+        print(f"📊 {file_size / 1024 / 1024:.2f} MB, {parts} 个分片, 本次发送 {bytes_sent / 1024 / 1024:.2f} MB, "
+              f"耗时 {elapsed:.1f} 秒, {self.last_upload_stats['mb_per_second']:.2f} MB/s")
+        if verified == "size":
+            print("⚠️  服务端未返回校验和,只校验了文件大小")
+
+        return file_id
+
+    @staticmethod
+    def _verify_uploaded(file_object: Dict, file_size: int, md5: str) -> str:
+        """
+        比对服务端返回的文件大小和 md5
 
-        with open(file_path, 'rb') as f:
-            files = {
-                'file': (os.path.basename(file_path), f, 'application/json'),
-                'purpose': (None, 'fine-tune')
+        Returns:
+            "md5"(服务端返回了 md5 且一致)或 "size"(服务端没有返回 md5,只比对了大小)
+        """
+        if file_object.get('bytes') is not None and file_object['bytes'] != file_size:
+            raise Exception(f"文件校验失败: 本地 {file_size} 字节, 服务端 {file_object['bytes']} 字节")
+        server_md5 = file_object.get('md5')
+        if server_md5 is None:
+            return "size"
+        if server_md5 != md5:
+            raise Exception(f"文件校验失败: 本地 md5 {md5}, 服务端 md5 {server_md5}")
+        return "md5"
+
+    def _upload_single(self, file_path: str, file_size: int):
+        """
+        通过 /files 单请求流式上传,上传时同步计算 md5
+
+        Returns:
+            (文件 ID, 校验方式 "md5" 或 "size")
+        """
+        url = f"{self.base_url}/files"
+        digest = hashlib.md5()
+        body = MultipartFileStream(
+            file_path,
+            field_name='file',
+            filename=os.path.basename(file_path),
+            fields={'purpose': 'fine-tune'},
+            content_type='application/json',
+            digest=digest
+        )
+        try:
+            headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": body.content_type
             }
+            # 连接超时 10 秒,读超时随文件大小放宽
+            response = self.upload_controller.call(requests.post, url, headers=headers, data=body, timeout=(10, 300))
+        finally:
+            body.close()
 
-            # 移除 Content-Type header,让 requests 自动处理 multipart/form-data
-            headers = {"Authorization": f"Bearer {self.api_key}"}
+        if response.status_code != 200:
+            raise Exception(f"文件上传失败: {response.text}")
 
-            response = requests.post(url, headers=headers, files=files, timeout=60)
+        result = response.json()
+        verified = self._verify_uploaded(result, file_size, digest.hexdigest())
+        return result.get('id'), verified
+
+    def _upload_part(self, upload_id: str, file_path: str, offset: int, length: int, progress) -> str:
+        """上传一个分片,失败时按指数退避重试,返回分片 ID"""
+        url = f"{self.base_url}/uploads/{upload_id}/parts"
+        last_error = None
+
+        for attempt in range(PART_MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(0.5 * 2 ** (attempt - 1))
+            sent = []
+            body = MultipartFileStream(
+                file_path, field_name='data', filename='part', offset=offset, length=length,
+                on_read=lambda n: (sent.append(n), progress(n))
+            )
+            try:
+                headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": body.content_type}
+                response = self.upload_controller.call(
+                    requests.post, url, headers=headers, data=body, timeout=(10, 300)
+                )
+            except requests.exceptions.RequestException as e:
+                progress(-sum(sent))
+                last_error = str(e)
+                continue
+            finally:
+                body.close()
+
+            if response.status_code == 200:
+                return response.json()['id']
+            progress(-sum(sent))
+            if response.status_code == 404:
+                raise LookupError(f"上传会话不存在或已过期: {upload_id}")
+            last_error = f"{response.status_code}, {response.text}"
+            if response.status_code < 500 and response.status_code != 429:
+                break
+
+        raise Exception(f"分片上传失败 (偏移 {offset}): {last_error}")
+
+    def _upload_multipart(
+        self,
+        file_path: str,
+        file_size: int,
+        part_size: int,
+        max_workers: int,
+        resume: bool
+    ):
+        """
+        通过 /uploads 分片并行上传,支持断点续传
 
+        Returns:
+            (文件 ID, 分片数, 本次发送的字节数, 校验方式 "md5" 或 "size")
+        """
+        state_path = file_path + ".upload.json"
+        stat = os.stat(file_path)
+        state = None
+
+        if resume and os.path.exists(state_path):
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if (state.get('bytes'), state.get('mtime'), state.get('part_size')) != \
+                    (file_size, stat.st_mtime, part_size):
+                print("⚠️  文件已变化,重新开始上传")
+                state = None
+
+        if state is None:
+            print("🔐 计算文件校验和...")
+            md5 = file_md5(file_path)
+            response = self.api_controller.call(
+                requests.post,
+                f"{self.base_url}/uploads",
+                headers=self.headers,
+                json={
+                    "filename": os.path.basename(file_path),
+                    "purpose": "fine-tune",
+                    "bytes": file_size,
+                    "mime_type": "application/jsonl"
+                },
+                timeout=30
+            )
             if response.status_code != 200:
-                raise Exception(f"文件上传失败: {response.text}")
+                raise Exception(f"创建上传会话失败: {response.text}")
+            state = {
+                "upload_id": response.json()['id'],
+                "bytes": file_size,
+                "mtime": stat.st_mtime,
+                "part_size": part_size,
+                "md5": md5,
+                "parts": {}
+            }
+        else:
+            print(f"🔁 继续上传: 已完成 {len(state['parts'])} 个分片")
+
+        lock = threading.Lock()
+
+        def save_state():
+            tmp_path = state_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, state_path)
+
+        save_state()
+
+        num_parts = (file_size + part_size - 1) // part_size
+        pending = [i for i in range(num_parts) if str(i) not in state['parts']]
+        resumed_bytes = sum(min(part_size, file_size - int(i) * part_size) for i in state['parts'])
+        uploaded = [resumed_bytes]
+        start = time.perf_counter()
+        last_report = [start]
+
+        def progress(n: int):
+            with lock:
+                uploaded[0] += n
+                now = time.perf_counter()
+                if now - last_report[0] >= 1.0:
+                    last_report[0] = now
+                    print(f"📤 已上传 {uploaded[0] / 1024 / 1024:.1f}/{file_size / 1024 / 1024:.1f} MB")
+
+        try:
+            from concurrent.futures import ThreadPoolExecutor, as_completed
+
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {
+                    pool.submit(
+                        self._upload_part, state['upload_id'], file_path,
+                        i * part_size, min(part_size, file_size - i * part_size), progress
+                    ): i
+                    for i in pending
+                }
+                for future in as_completed(futures):
+                    part_id = future.result()
+                    with lock:
+                        state['parts'][str(futures[future])] = part_id
+                        save_state()
+        except LookupError:
+            # 会话过期时丢弃进度,从头开始
+            os.remove(state_path)
+            if not resume:
+                raise
+            print("⚠️  上传会话已过期,重新开始上传")
+            return self._upload_multipart(file_path, file_size, part_size, max_workers, resume=False)
+
+        response = self.api_controller.call(
+            requests.post,
+            f"{self.base_url}/uploads/{state['upload_id']}/complete",
+            headers=self.headers,
+            json={"part_ids": [state['parts'][str(i)] for i in range(num_parts)], "md5": state['md5']},
+            timeout=300
+        )
+        if response.status_code != 200:
+            raise Exception(f"合并分片失败: {response.text}")
 
-            result = response.json()
-            file_id = result.get('id')
+        result = response.json()
+        file_object = result.get('file') or {}
+        verified = self._verify_uploaded(file_object, file_size, state['md5'])
 
-            print(f"✅ 文件上传成功!")
-            print(f"📄 文件 ID: {file_id}")
+        os.remove(state_path)
+        elapsed = time.perf_counter() - start
+        print(f"📦 本次上传 {len(pending)}/{num_parts} 个分片, 耗时 {elapsed:.1f} 秒")
+        return file_object.get('id'), num_parts, file_size - resumed_bytes, verified
 
-            return file_id
+    def estimate_training(
+        self,
+        file_path: str,
+        hyperparameters: Optional[Dict] = None,
+        max_seq_len: int = 4096,
+        price_per_million_tokens: Optional[float] = None,
+        tokenizer_name: Optional[str] = "Qwen/Qwen3-32B",
+        local_files_only: bool = False
+    ) -> Dict:
+        """
+        提交任务前估算训练量和费用
+
+        按 hyperparameters 中的 batch_size 和 n_epochs 统计 token 长度分布、
+        超长对话和 padding 开销,详见 token_analysis.py。
+
+        Args:
+            file_path: 训练数据文件路径
+            hyperparameters: 将要使用的超参数(未提供的使用默认值)
+            max_seq_len: 训练序列长度上限
+            price_per_million_tokens: 每百万训练 token 的价格
+            tokenizer_name: 本地分词使用的 tokenizer
+            local_files_only: 只使用本地已缓存的 tokenizer,未缓存时按字符估算
+
+        Returns:
+            token_analysis.analyze_token_lengths 的结果
+        """
+        from token_analysis import TokenCounter, analyze_token_lengths, print_token_report
+
+        params = dict(DEFAULT_HYPERPARAMETERS)
+        params.update(hyperparameters or {})
+        report = analyze_token_lengths(
+            file_path,
+            TokenCounter(tokenizer_name, local_files_only=local_files_only),
+            max_seq_len=max_seq_len,
+            batch_size=params["batch_size"],
+            n_epochs=params["n_epochs"],
+            price_per_million_tokens=price_per_million_tokens
+        )
+        print_token_report(report)
+        return report
 
     def create_finetune_job(
         self,
@@ -123,14 +534,7 @@ class XPULinkLoRAFineTuner:
         url = f"{self.base_url}/fine_tuning/jobs"
 
         # 默认超参数
-        default_hyperparams = {
-            "n_epochs": 3,              # 训练轮数
-            "batch_size": 4,            # 批次大小
-            "learning_rate": 5e-5,      # 学习率
-            "lora_r": 8,                # LoRA 秩
-            "lora_alpha": 16,           # LoRA alpha 参数
-            "lora_dropout": 0.05        # LoRA dropout
-        }
+        default_hyperparams = dict(DEFAULT_HYPERPARAMETERS)
 
         if hyperparameters:
             default_hyperparams.update(hyperparameters)
@@ -144,7 +548,7 @@ class XPULinkLoRAFineTuner:
         if suffix:
             payload["suffix"] = suffix
 
-        response = requests.post(url, headers=self.headers, json=payload, timeout=30)
+        response = self.api_controller.call(requests.post, url, headers=self.headers, json=payload, timeout=30)
 
         if response.status_code not in [200, 201]:
             raise Exception(f"创建微调任务失败: {response.text}")
@@ -172,31 +576,42 @@ class XPULinkLoRAFineTuner:
         """
         url = f"{self.base_url}/fine_tuning/jobs/{job_id}"
 
-        response = requests.get(url, headers=self.headers, timeout=30)
+        response = self.api_controller.call(requests.get, url, headers=self.headers, timeout=30)
 
         if response.status_code != 200:
             raise Exception(f"获取任务状态失败: {response.text}")
 
         return response.json()
 
-    def wait_for_completion(self, job_id: str, check_interval: int = 30) -> Dict:
+    def wait_for_completion(self, job_id: str, check_interval: int = 30, min_interval: float = 5) -> Dict:
         """
         等待微调任务完成
 
+        检查间隔自适应:状态变化后从 min_interval 开始,状态不变时每次乘以 1.5,
+        最长不超过 check_interval。同时监控多个任务请使用 job_watcher.JobWatcher。
+
         Args:
             job_id: 微调任务 ID
-            check_interval: 检查间隔(秒)
+            check_interval: 最长检查间隔(秒)
+            min_interval: 最短检查间隔(秒)
 
         Returns:
             最终任务状态
         """
         print(f"⏳ 等待微调任务完成... (任务 ID: {job_id})")
 
+        interval = min(min_interval, check_interval)
+        last_status = None
         while True:
             status = self.check_job_status(job_id)
             current_status = status.get('status')
 
-            print(f"📊 当前状态: {current_status}")
+            if current_status != last_status:
+                print(f"📊 当前状态: {current_status}")
+                interval = min(min_interval, check_interval)
+            else:
+                interval = min(check_interval, interval * 1.5)
+            last_status = current_status
 
             if current_status == 'succeeded':
                 print(f"✅ 微调任务完成!")
@@ -211,7 +626,7 @@ class XPULinkLoRAFineTuner:
                 raise Exception(f"❌ 微调任务已取消")
 
             # 仍在进行中
-            time.sleep(check_interval)
+            time.sleep(interval)
 
     def list_finetune_jobs(self, limit: int = 10) -> List[Dict]:
         """
@@ -225,14 +640,21 @@ class XPULinkLoRAFineTuner:
         """
         url = f"{self.base_url}/fine_tuning/jobs?limit={limit}"
 
-        response = requests.get(url, headers=self.headers, timeout=30)
+        response = self.api_controller.call(requests.get, url, headers=self.headers, timeout=30)
 
         if response.status_code != 200:
             raise Exception(f"获取任务列表失败: {response.text}")
 
         return response.json().get('data', [])
 
-    def test_finetuned_model(self, model_name: str, test_prompt: str, max_tokens: int = 200):
+    def test_finetuned_model(
+        self,
+        model_name: str,
+        test_prompt: str,
+        max_tokens: int = 200,
+        temperature: float = 0.7,
+        verbose: bool = True
+    ):
         """
         测试微调后的模型
 
@@ -240,6 +662,8 @@ class XPULinkLoRAFineTuner:
             model_name: 微调模型名称
             test_prompt: 测试提示词
             max_tokens: 最大生成 token 数
+            temperature: 采样温度(批量评估时建议设为 0)
+            verbose: 是否打印模型回答
         """
         url = f"{self.base_url}/chat/completions"
 
@@ -249,10 +673,10 @@ class XPULinkLoRAFineTuner:
                 {"role": "user", "content": test_prompt}
             ],
             "max_tokens": max_tokens,
-            "temperature": 0.7
+            "temperature": temperature
         }
 
-        response = requests.post(url, headers=self.headers, json=payload, timeout=60)
+        response = self.chat_controller.call(requests.post, url, headers=self.headers, json=payload, timeout=60)
 
         if response.status_code != 200:
             raise Exception(f"模型调用失败: {response.text}")
@@ -260,7 +684,8 @@ class XPULinkLoRAFineTuner:
         result = response.json()
         content = result["choices"][0]["message"]["content"]
 
-        print(f"🤖 模型回答:\n{content}")
+        if verbose:
+            print(f"🤖 模型回答:\n{content}")
         return content
 
 
@@ -298,29 +723,34 @@ def example_basic_usage():
         "LoRA/data/training_data.jsonl"
     )
 
-    # 3. 上传训练文件
+    hyperparameters = {
+        "n_epochs": 3,
+        "batch_size": 2,
+        "learning_rate": 1e-4,
+        "lora_r": 8
+    }
+
+    # 3. 估算训练量(示例不下载 tokenizer,本地没有缓存时按字符估算)
+    finetuner.estimate_training(data_file, hyperparameters, local_files_only=True)
+
+    # 4. 上传训练文件
     print("\n📤 上传训练文件...")
     file_id = finetuner.upload_training_file(data_file)
 
-    # 4. 创建微调任务
+    # 5. 创建微调任务
     print("\n🚀 创建微调任务...")
     job_id = finetuner.create_finetune_job(
         training_file_id=file_id,
         model="qwen3-32b",
         suffix="python-assistant",
-        hyperparameters={
-            "n_epochs": 3,
-            "batch_size": 2,
-            "learning_rate": 1e-4,
-            "lora_r": 8
-        }
+        hyperparameters=hyperparameters
     )
 
-    # 5. 等待微调完成
+    # 6. 等待微调完成
     print("\n⏳ 开始微调...")
     final_status = finetuner.wait_for_completion(job_id)
 
-    # 6. 测试微调模型
+    # 7. 测试微调模型
     finetuned_model = final_status.get('fine_tuned_model')
     if finetuned_model:
         print(f"\n🧪 测试微调模型: {finetuned_model}")
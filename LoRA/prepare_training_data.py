@@ -9,7 +9,9 @@
 
 import json
 import os
-from typing import List, Dict
+from typing import Dict, Iterable, List
+
+from jsonl_validator import validate_jsonl, print_validation_report
 
 
 def create_conversation(system_prompt: str, user_message: str, assistant_message: str) -> Dict:
@@ -53,70 +55,58 @@ def create_multi_turn_conversation(system_prompt: str, turns: List[Dict[str, str
     return {"messages": messages}
 
 
-def save_training_data(conversations: List[Dict], output_file: str):
+def save_training_data(conversations: Iterable[Dict], output_file: str):
     """
     保存训练数据为 JSONL 格式
 
     Args:
-        conversations: 对话列表
+        conversations: 对话列表或生成器(逐条写出,不要求全部载入内存)
         output_file: 输出文件路径
     """
     os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else '.', exist_ok=True)
 
+    count = 0
     with open(output_file, 'w', encoding='utf-8') as f:
         for conversation in conversations:
             f.write(json.dumps(conversation, ensure_ascii=False) + '\n')
+            count += 1
 
     print(f"✅ 训练数据已保存到: {output_file}")
-    print(f"📊 总对话数: {len(conversations)}")
+    print(f"📊 总对话数: {count}")
 
 
-def validate_training_data(file_path: str) -> bool:
+def validate_training_data(file_path: str, num_workers: int = 1, max_errors: int = 20,
+                           strict: bool = False) -> bool:
     """
     验证训练数据格式是否正确
 
+    逐行流式校验,报告所有错误及行号,同时统计重复对话和长度分布。
+    大文件可以增大 num_workers 并行校验,详见 jsonl_validator.py。
+
     Args:
         file_path: 训练数据文件路径
+        num_workers: 并行进程数
+        max_errors: 最多打印的错误条数
+        strict: 是否额外检查 system 消息位置、空 content 和 assistant 回复
 
     Returns:
         是否验证通过
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for i, line in enumerate(f, 1):
-                data = json.loads(line)
-
-                # 检查必需字段
-                if "messages" not in data:
-                    print(f"❌ 第 {i} 行缺少 'messages' 字段")
-                    return False
-
-                messages = data["messages"]
-
-                if not isinstance(messages, list) or len(messages) < 2:
-                    print(f"❌ 第 {i} 行 'messages' 必须是包含至少2条消息的列表")
-                    return False
-
-                # 检查每条消息
-                for j, msg in enumerate(messages):
-                    if "role" not in msg or "content" not in msg:
-                        print(f"❌ 第 {i} 行第 {j+1} 条消息缺少 'role' 或 'content' 字段")
-                        return False
-
-                    if msg["role"] not in ["system", "user", "assistant"]:
-                        print(f"❌ 第 {i} 行第 {j+1} 条消息的 role 无效: {msg['role']}")
-                        return False
-
-        print(f"✅ 数据格式验证通过!")
-        return True
-
-    except json.JSONDecodeError as e:
-        print(f"❌ JSON 解析错误: {e}")
-        return False
+        report = validate_jsonl(file_path, num_workers=num_workers, max_errors=max_errors, strict=strict)
     except Exception as e:
         print(f"❌ 验证失败: {e}")
         return False
 
+    print_validation_report(report)
+    if report["invalid"]:
+        print(f"❌ 数据格式验证未通过: {report['invalid']} 行存在错误")
+        return False
+    if report["duplicates"]:
+        print(f"⚠️  发现 {report['duplicates']} 条重复对话,可用 write_clean_file() 去除")
+    print(f"✅ 数据格式验证通过!")
+    return True
+
 
 # ============================================================================
 # 示例 1: Python 编程助手训练数据
@@ -0,0 +1,295 @@
+"""
+LoRA 超参数搜索
+
+在 XPULinkLoRAFineTuner 之上批量尝试不同的 lora_r、lora_alpha、learning_rate 等超参数:
+- 训练文件只上传一次,所有任务复用同一个 file_id
+- 网格搜索或随机搜索,同时运行的任务数不超过 max_concurrent_jobs
+- 用 JobWatcher 在一个事件循环中同时监控所有任务
+- 每个任务完成后立即用 test_finetuned_model 在留出的题集上并行评估
+- 返回按得分排序的结果表(可选包含基础模型作为基线)
+
+使用示例:
+    configs = grid_search({"lora_r": [8, 16], "learning_rate": [5e-5, 1e-4]})
+    sweep = SweepRunner(XPULinkLoRAFineTuner(), max_concurrent_jobs=2)
+    results = sweep.run("data/training_data.jsonl", configs, eval_items)
+    print_sweep_results(results)
+"""
+
+import asyncio
+import itertools
+import math
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from job_watcher import JobWatcher
+from lora_finetune import XPULinkLoRAFineTuner
+
+
+def grid_search(space: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    """
+    生成网格搜索的全部组合
+
+    Args:
+        space: 超参数名 -> 候选值列表
+
+    Returns:
+        超参数字典列表
+    """
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[key] for key in keys))]
+
+
+def random_search(
+    space: Dict[str, Union[Sequence[Any], Tuple[float, float]]],
+    n_trials: int,
+    seed: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    生成随机搜索的组合
+
+    Args:
+        space: 超参数名 -> 候选值列表(均匀选取),或 (下限, 上限) 元组:
+            两端都是整数时均匀取整数,否则在对数尺度上均匀取值(适合学习率)
+        n_trials: 组合数
+        seed: 随机种子
+
+    Returns:
+        超参数字典列表
+    """
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(n_trials):
+        config = {}
+        for key, values in space.items():
+            if isinstance(values, tuple) and len(values) == 2:
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    config[key] = rng.randint(low, high)
+                else:
+                    config[key] = float(f"{math.exp(rng.uniform(math.log(low), math.log(high))):.3g}")
+            else:
+                config[key] = rng.choice(list(values))
+        configs.append(config)
+    return configs
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[\s\W_]+", "", text).lower()
+
+
+def contains_expected(answer: str, expected: Optional[str]) -> Optional[float]:
+    """回答中包含参考答案(忽略空白和标点)记 1 分,否则 0 分;没有参考答案时返回 None"""
+    if expected is None:
+        return None
+    return 1.0 if _normalize(expected) in _normalize(answer) else 0.0
+
+
+class SweepRunner:
+    """并发的超参数搜索"""
+
+    def __init__(
+        self,
+        finetuner: Optional[XPULinkLoRAFineTuner] = None,
+        model: str = "qwen3-32b",
+        suffix_prefix: str = "sweep",
+        max_concurrent_jobs: int = 2,
+        eval_concurrency: int = 8,
+        scorer: Callable[[str, Optional[str]], Optional[float]] = contains_expected,
+        watcher_kwargs: Optional[Dict[str, Any]] = None
+    ):
+        """
+        初始化超参数搜索
+
+        Args:
+            finetuner: 微调器(默认 XPULinkLoRAFineTuner())
+            model: 基础模型名称
+            suffix_prefix: 微调模型后缀的前缀,第 i 组超参数的后缀为 "{suffix_prefix}-{i}"
+            max_concurrent_jobs: 同时运行的最大微调任务数
+            eval_concurrency: 评估时同时在途的最大请求数
+            scorer: 评分函数 (模型回答, 参考答案) -> 得分
+            watcher_kwargs: 传给 JobWatcher 的参数(如 min_interval、max_interval)
+        """
+        self.finetuner = finetuner if finetuner is not None else XPULinkLoRAFineTuner()
+        self.model = model
+        self.suffix_prefix = suffix_prefix
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.eval_concurrency = eval_concurrency
+        self.scorer = scorer
+        self.watcher_kwargs = watcher_kwargs or {}
+
+    async def _evaluate(
+        self,
+        executor: ThreadPoolExecutor,
+        model_name: str,
+        eval_items: List[Dict[str, Any]],
+        max_tokens: int
+    ) -> Dict[str, Any]:
+        """在题集上并行评估一个模型"""
+        loop = asyncio.get_running_loop()
+
+        async def ask(item):
+            start = time.perf_counter()
+            try:
+                answer = await loop.run_in_executor(
+                    executor,
+                    lambda: self.finetuner.test_finetuned_model(
+                        model_name, item["question"], max_tokens, temperature=0.0, verbose=False
+                    )
+                )
+            except Exception as e:
+                return {"question": item["question"], "answer": None, "score": None, "error": str(e), "latency_ms": None}
+            return {
+                "question": item["question"],
+                "answer": answer,
+                "score": self.scorer(answer, item.get("expected_answer")),
+                "error": None,
+                "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            }
+
+        answers = await asyncio.gather(*(ask(item) for item in eval_items))
+        scores = [a["score"] for a in answers if a["score"] is not None]
+        latencies = [a["latency_ms"] for a in answers if a["latency_ms"] is not None]
+        return {
+            "score": round(sum(scores) / len(scores), 4) if scores else None,
+            "eval_errors": sum(1 for a in answers if a["error"]),
+            "latency_ms": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "answers": answers,
+        }
+
+    async def _run_trial(
+        self,
+        index: int,
+        config: Dict[str, Any],
+        file_id: str,
+        watcher: JobWatcher,
+        job_slots: asyncio.Semaphore,
+        executor: ThreadPoolExecutor,
+        eval_items: List[Dict[str, Any]],
+        max_tokens: int
+    ) -> Dict[str, Any]:
+        result = {"trial": index, "hyperparameters": config, "job_id": None, "status": None,
+                  "fine_tuned_model": None, "job_seconds": None, "score": None, "error": None}
+
+        # 占用一个任务名额直到任务结束,评估不占名额
+        async with job_slots:
+            try:
+                job_id = await asyncio.get_running_loop().run_in_executor(
+                    None,
+                    lambda: self.finetuner.create_finetune_job(
+                        training_file_id=file_id,
+                        model=self.model,
+                        suffix=f"{self.suffix_prefix}-{index}",
+                        hyperparameters=config
+                    )
+                )
+                result["job_id"] = job_id
+                job = await watcher.watch(job_id)
+            except Exception as e:
+                result["status"] = "error"
+                result["error"] = str(e)
+                return result
+
+        result["status"] = job.get("status")
+        result["fine_tuned_model"] = job.get("fine_tuned_model")
+        if job.get("finished_at") and job.get("created_at"):
+            result["job_seconds"] = round(job["finished_at"] - job["created_at"], 1)
+        if result["status"] != "succeeded" or not result["fine_tuned_model"]:
+            result["error"] = (job.get("error") or {}).get("message")
+            return result
+
+        print(f"🧪 评估 {result['fine_tuned_model']} (第 {index} 组超参数)")
+        result.update(await self._evaluate(executor, result["fine_tuned_model"], eval_items, max_tokens))
+        return result
+
+    async def arun(
+        self,
+        training_file: Optional[str],
+        configs: List[Dict[str, Any]],
+        eval_items: List[Dict[str, Any]],
+        file_id: Optional[str] = None,
+        include_base: bool = True,
+        max_tokens: int = 200
+    ) -> List[Dict[str, Any]]:
+        """
+        运行超参数搜索(异步接口)
+
+        Args:
+            training_file: 训练数据文件路径(提供 file_id 时可以为 None)
+            configs: 超参数组合列表,见 grid_search / random_search
+            eval_items: 留出的评估题集,每项包含 question,可选 expected_answer
+            file_id: 已上传的训练文件 ID,提供时不再上传
+            include_base: 是否同时评估基础模型作为基线
+            max_tokens: 评估时的最大生成 token 数
+
+        Returns:
+            按得分从高到低排序的结果列表
+        """
+        if file_id is None:
+            file_id = await asyncio.get_running_loop().run_in_executor(
+                None, self.finetuner.upload_training_file, training_file
+            )
+        print(f"🔬 开始超参数搜索: {len(configs)} 组超参数, 最多同时运行 {self.max_concurrent_jobs} 个任务")
+
+        start = time.time()
+        job_slots = asyncio.Semaphore(self.max_concurrent_jobs)
+        executor = ThreadPoolExecutor(max_workers=self.eval_concurrency)
+        try:
+            async with JobWatcher(api_key=self.finetuner.api_key, base_url=self.finetuner.base_url,
+                                  **self.watcher_kwargs) as watcher:
+                tasks = [
+                    self._run_trial(i, config, file_id, watcher, job_slots, executor, eval_items, max_tokens)
+                    for i, config in enumerate(configs)
+                ]
+                if include_base:
+                    tasks.append(self._evaluate_base(executor, eval_items, max_tokens))
+                results = await asyncio.gather(*tasks)
+        finally:
+            executor.shutdown(wait=False)
+
+        print(f"✅ 超参数搜索完成, 耗时 {time.time() - start:.1f} 秒")
+        return rank_results(results)
+
+    async def _evaluate_base(self, executor, eval_items, max_tokens) -> Dict[str, Any]:
+        result = {"trial": "base", "hyperparameters": {}, "job_id": None, "status": "base",
+                  "fine_tuned_model": self.model, "job_seconds": None, "score": None, "error": None}
+        result.update(await self._evaluate(executor, self.model, eval_items, max_tokens))
+        return result
+
+    def run(self, training_file: Optional[str], configs: List[Dict[str, Any]], eval_items: List[Dict[str, Any]],
+            **kwargs: Any) -> List[Dict[str, Any]]:
+        """同步接口,参数同 arun(在已有事件循环中请使用 await arun())"""
+        return asyncio.run(self.arun(training_file, configs, eval_items, **kwargs))
+
+
+def rank_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """按得分从高到低排序(没有得分的排在最后,同分时延迟低的在前),并写入 rank"""
+    def sort_key(result):
+        has_score = result.get("score") is not None
+        return (not has_score, -(result.get("score") or 0), result.get("latency_ms") or float("inf"))
+
+    ranked = sorted(results, key=sort_key)
+    for rank, result in enumerate(ranked, 1):
+        result["rank"] = rank
+    return ranked
+
+
+def print_sweep_results(results: List[Dict[str, Any]]):
+    """打印排序后的结果表"""
+    keys = sorted({key for result in results for key in result["hyperparameters"]})
+    print("=" * 100)
+    print("🏆 超参数搜索结果")
+    print("=" * 100)
+    header = f"{'#':>3} {'组':>5} " + " ".join(f"{key:>14}" for key in keys)
+    print(header + f" {'状态':>10} {'得分':>7} {'延迟(ms)':>9} {'训练(秒)':>9}  模型")
+    print("-" * 100)
+    for result in results:
+        values = " ".join(f"{str(result['hyperparameters'].get(key, '-')):>14}" for key in keys)
+        score = f"{result['score']:.3f}" if result.get("score") is not None else "-"
+        latency = f"{result['latency_ms']:.0f}" if result.get("latency_ms") is not None else "-"
+        seconds = f"{result['job_seconds']:.0f}" if result.get("job_seconds") is not None else "-"
+        print(f"{result['rank']:>3} {str(result['trial']):>5} {values} {str(result['status']):>10} "
+              f"{score:>7} {latency:>9} {seconds:>9}  {result.get('fine_tuned_model') or result.get('error') or '-'}")
+    print("=" * 100)
@@ -0,0 +1,424 @@
+"""
+训练数据 Token 长度分析
+
+在提交微调任务前了解数据的序列长度分布:
+- 本地分词统计每个对话的 token 数(优先使用基础模型的 tokenizer,未安装
+  transformers 或无法下载时按字符估算)
+- 长度直方图和分位数,标记超过上下文上限的对话
+- 超长的多轮对话按轮次拆分成多个样本
+- 比较随机分批、按长度分桶、打包三种方式的 padding 开销,并可按长度分桶
+  重排训练文件
+- 估算训练 token 总数和费用
+
+使用示例:
+    counter = TokenCounter()
+    report = analyze_token_lengths("data/training_data.jsonl", counter, max_seq_len=4096,
+                                   batch_size=4, n_epochs=3, price_per_million_tokens=10)
+    print_token_report(report)
+    prepare_length_aware_file("data/training_data.jsonl", "data/training_data.prepared.jsonl",
+                              counter, max_seq_len=4096, over_limit="split", bucket_batch_size=4)
+"""
+
+import bisect
+import json
+import math
+import os
+import random
+import re
+import tempfile
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 默认的训练序列长度上限(token)
+DEFAULT_MAX_SEQ_LEN = 4096
+
+# 对话模板为每条消息增加的 token 数(Qwen: <|im_start|>role\n ... <|im_end|>\n)
+MESSAGE_OVERHEAD_TOKENS = 5
+
+# 按字符估算时,每个 token 对应的中日韩字符数和其他字符数
+CJK_CHARS_PER_TOKEN = 1.5
+OTHER_CHARS_PER_TOKEN = 4.0
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+BATCH_STRATEGIES = ("random", "bucket", "pack")
+
+
+class TokenCounter:
+    """对话 token 计数器"""
+
+    def __init__(
+        self,
+        tokenizer_name: Optional[str] = "Qwen/Qwen3-32B",
+        message_overhead: int = MESSAGE_OVERHEAD_TOKENS,
+        local_files_only: bool = False
+    ):
+        """
+        初始化 token 计数器
+
+        Args:
+            tokenizer_name: HuggingFace tokenizer 名称或本地路径;为 None 或加载失败时按字符估算
+            message_overhead: 对话模板为每条消息增加的 token 数
+            local_files_only: 只使用本地已缓存的 tokenizer,不从 HuggingFace 下载
+        """
+        self.message_overhead = message_overhead
+        self.tokenizer = None
+        self.backend = "heuristic"
+
+        if tokenizer_name:
+            try:
+                from transformers import AutoTokenizer
+                self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name, local_files_only=local_files_only)
+                self.backend = tokenizer_name
+            except Exception as e:
+                print(f"⚠️  无法加载 tokenizer {tokenizer_name} ({type(e).__name__}),改为按字符估算 token 数")
+
+    def count_text(self, text: str) -> int:
+        """统计一段文本的 token 数"""
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+        cjk = len(_CJK_PATTERN.findall(text))
+        return math.ceil(cjk / CJK_CHARS_PER_TOKEN + (len(text) - cjk) / OTHER_CHARS_PER_TOKEN)
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """统计一个对话(套用对话模板后)的 token 数"""
+        return sum(self.count_text(msg["content"]) + self.message_overhead for msg in messages)
+
+
+def split_conversation(
+    messages: List[Dict[str, str]],
+    counter: TokenCounter,
+    max_tokens: int
+) -> Tuple[List[List[Dict[str, str]]], int]:
+    """
+    把超长的多轮对话按轮次拆分成多个不超过 max_tokens 的对话
+
+    每个拆分结果都保留开头的 system 消息,并以 assistant 消息结尾。
+    单轮本身就超过上限的部分无法拆分,会被丢弃。
+
+    Args:
+        messages: 对话消息列表
+        counter: token 计数器
+        max_tokens: 每个对话的 token 上限
+
+    Returns:
+        (拆分后的对话列表, 丢弃的轮次数)
+    """
+    system = [messages[0]] if messages and messages[0]["role"] == "system" else []
+    system_tokens = counter.count_messages(system)
+
+    # 每一轮从 user 消息开始,到 assistant 消息结束
+    turns, current = [], []
+    for msg in messages[len(system):]:
+        current.append(msg)
+        if msg["role"] == "assistant":
+            turns.append(current)
+            current = []
+
+    chunks, chunk, chunk_tokens, dropped = [], [], system_tokens, 0
+    for turn in turns:
+        turn_tokens = counter.count_messages(turn)
+        if system_tokens + turn_tokens > max_tokens:
+            dropped += 1
+            continue
+        if chunk and chunk_tokens + turn_tokens > max_tokens:
+            chunks.append(system + chunk)
+            chunk, chunk_tokens = [], system_tokens
+        chunk.extend(turn)
+        chunk_tokens += turn_tokens
+    if chunk:
+        chunks.append(system + chunk)
+    return chunks, dropped
+
+
+def _pack_sequences(lengths: np.ndarray, max_seq_len: int) -> np.ndarray:
+    """按 best-fit decreasing 把样本装进长度为 max_seq_len 的序列,返回每个序列的已用长度"""
+    remaining: List[int] = []  # 各序列的剩余容量,升序
+    for length in sorted(lengths.tolist(), reverse=True):
+        length = min(length, max_seq_len)
+        i = bisect.bisect_left(remaining, length)
+        if i < len(remaining):
+            capacity = remaining.pop(i) - length
+        else:
+            capacity = max_seq_len - length
+        bisect.insort(remaining, capacity)
+    return max_seq_len - np.array(remaining, dtype=np.int64)
+
+
+def plan_batches(
+    lengths: np.ndarray,
+    batch_size: int,
+    strategy: str = "random",
+    max_seq_len: int = DEFAULT_MAX_SEQ_LEN,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    估算一种分批方式的 padding 开销
+
+    Args:
+        lengths: 每个样本的 token 数
+        batch_size: 批次大小
+        strategy: "random"(随机分批)、"bucket"(按长度排序后分批)或 "pack"(打包成定长序列)
+        max_seq_len: 序列长度上限,超出部分截断
+        seed: 随机分批的随机种子
+
+    Returns:
+        dict: 序列数、批次数、有效 token 数、计算 token 数(含 padding)和有效率
+    """
+    if strategy not in BATCH_STRATEGIES:
+        raise ValueError(f"未知的分批方式: {strategy},可选 {BATCH_STRATEGIES}")
+
+    lengths = np.minimum(np.asarray(lengths, dtype=np.int64), max_seq_len)
+    if strategy == "random":
+        sequences = np.random.default_rng(seed).permutation(lengths)
+    elif strategy == "bucket":
+        sequences = np.sort(lengths)
+    else:
+        sequences = np.sort(_pack_sequences(lengths, max_seq_len))
+
+    num_batches = math.ceil(len(sequences) / batch_size)
+    # 补零到整批后每批取最长,最后一批按实际条数计
+    rows = np.zeros(num_batches * batch_size, dtype=np.int64)
+    rows[:len(sequences)] = sequences
+    sizes = np.full(num_batches, batch_size, dtype=np.int64)
+    sizes[-1] = len(sequences) - (num_batches - 1) * batch_size
+    padded = int((rows.reshape(num_batches, batch_size).max(axis=1) * sizes).sum())
+
+    real = int(lengths.sum())
+    return {
+        "strategy": strategy,
+        "sequences": len(sequences),
+        "batches": num_batches,
+        "real_tokens": real,
+        "padded_tokens": padded,
+        "efficiency": round(real / padded, 4) if padded else 1.0,
+    }
+
+
+def _histogram(lengths: np.ndarray, max_seq_len: int) -> List[Tuple[str, int]]:
+    edges = [0]
+    while edges[-1] * 2 < max_seq_len:
+        edges.append(max(128, edges[-1] * 2))
+    edges.append(max_seq_len)
+    # 区间为 (lo, hi],最后一个桶是超过上限的对话
+    counts = np.bincount(np.searchsorted(edges[1:], lengths, side="left"), minlength=len(edges))
+    labels = [f"{lo}-{hi}" for lo, hi in zip(edges[:-1], edges[1:])] + [f">{max_seq_len}"]
+    return list(zip(labels, counts.tolist()))
+
+
+def analyze_token_lengths(
+    file_path: str,
+    counter: Optional[TokenCounter] = None,
+    max_seq_len: int = DEFAULT_MAX_SEQ_LEN,
+    batch_size: int = 4,
+    n_epochs: int = 3,
+    price_per_million_tokens: Optional[float] = None,
+    max_flagged: int = 20,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    流式统计训练文件的 token 长度分布,估算训练量和费用
+
+    每个对话只保留一个 4 字节的长度,内存占用约为 4 字节 × 对话数。
+
+    Args:
+        file_path: JSONL 训练数据文件
+        counter: token 计数器(默认 TokenCounter())
+        max_seq_len: 训练序列长度上限
+        batch_size: 批次大小
+        n_epochs: 训练轮数
+        price_per_million_tokens: 每百万训练 token 的价格;不提供时不计算费用
+        max_flagged: 报告中列出的超长对话条数
+        seed: 随机分批的随机种子
+
+    Returns:
+        dict: 长度统计、超长对话、各分批方式的 padding 开销和训练量估算
+    """
+    counter = counter if counter is not None else TokenCounter()
+    lengths = array("I")
+    over_limit = 0
+    flagged = []
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            tokens = counter.count_messages(json.loads(line)["messages"])
+            lengths.append(tokens)
+            if tokens > max_seq_len:
+                over_limit += 1
+                if len(flagged) < max_flagged:
+                    flagged.append({"line": line_number, "tokens": tokens})
+
+    lengths = np.frombuffer(lengths, dtype=np.uint32).astype(np.int64)
+    if not len(lengths):
+        raise ValueError(f"训练文件为空: {file_path}")
+
+    # 超长部分训练时会被截断,按上限计
+    trained = np.minimum(lengths, max_seq_len)
+    tokens_per_epoch = int(trained.sum())
+    training_tokens = tokens_per_epoch * n_epochs
+
+    report = {
+        "file": file_path,
+        "tokenizer": counter.backend,
+        "conversations": len(lengths),
+        "max_seq_len": max_seq_len,
+        "batch_size": batch_size,
+        "n_epochs": n_epochs,
+        "total_tokens": int(lengths.sum()),
+        "mean": round(float(lengths.mean()), 1),
+        "percentiles": {f"p{q}": int(np.percentile(lengths, q)) for q in (50, 90, 95, 99)},
+        "max": int(lengths.max()),
+        "histogram": _histogram(lengths, max_seq_len),
+        "over_limit": over_limit,
+        "over_limit_tokens": int((lengths - trained).sum()),
+        "flagged": flagged,
+        "tokens_per_epoch": tokens_per_epoch,
+        "training_tokens": training_tokens,
+        "price_per_million_tokens": price_per_million_tokens,
+        "estimated_cost": (round(training_tokens / 1e6 * price_per_million_tokens, 2)
+                           if price_per_million_tokens is not None else None),
+        "batching": {strategy: plan_batches(lengths, batch_size, strategy, max_seq_len, seed)
+                     for strategy in BATCH_STRATEGIES},
+    }
+    # 最长的 1% 对话占用的 token 比例
+    top = np.sort(trained)[-max(1, len(trained) // 100):]
+    report["top1pct_token_share"] = round(float(top.sum()) / max(tokens_per_epoch, 1), 4)
+    return report
+
+
+def prepare_length_aware_file(
+    file_path: str,
+    output_file: str,
+    counter: Optional[TokenCounter] = None,
+    max_seq_len: int = DEFAULT_MAX_SEQ_LEN,
+    over_limit: str = "split",
+    bucket_batch_size: Optional[int] = None,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    处理超长对话,并可按长度分桶重排训练文件
+
+    分桶时把长度相近的对话排成连续的 bucket_batch_size 条一组,各组之间随机打乱,
+    这样顺序读取数据的训练端每个批次内的长度相近,padding 更少。
+
+    Args:
+        file_path: 原始 JSONL 训练数据
+        output_file: 输出文件路径
+        counter: token 计数器(默认 TokenCounter())
+        max_seq_len: 训练序列长度上限
+        over_limit: 超长对话的处理方式: "split"(按轮次拆分)、"drop"(丢弃)或 "keep"(保留,训练时截断)
+        bucket_batch_size: 分桶的批次大小;为 None 时保持原有顺序
+        seed: 随机种子
+
+    Returns:
+        dict: 输入、输出、拆分和丢弃的对话数,以及拆分多出的对话数(extra_chunks);
+        无法拆分出任何不超限片段的对话(如单轮就超长)计入丢弃
+    """
+    if over_limit not in ("split", "drop", "keep"):
+        raise ValueError(f"未知的超长处理方式: {over_limit}")
+    counter = counter if counter is not None else TokenCounter()
+    stats = {"input": 0, "output": 0, "split": 0, "extra_chunks": 0, "dropped": 0, "dropped_turns": 0}
+
+    # 分桶需要重排,先写到临时文件并记录每条的偏移和长度
+    target = output_file
+    if bucket_batch_size:
+        fd, target = tempfile.mkstemp(suffix=".jsonl", dir=os.path.dirname(os.path.abspath(output_file)))
+        os.close(fd)
+    offsets, lengths = array("Q"), array("I")
+
+    with open(file_path, "r", encoding="utf-8") as src, open(target, "wb") as dst:
+        for line in src:
+            if not line.strip():
+                continue
+            stats["input"] += 1
+            data = json.loads(line)
+            tokens = counter.count_messages(data["messages"])
+
+            if tokens <= max_seq_len or over_limit == "keep":
+                outputs = [(data, tokens)]
+            elif over_limit == "drop":
+                stats["dropped"] += 1
+                outputs = []
+            else:
+                chunks, dropped_turns = split_conversation(data["messages"], counter, max_seq_len)
+                stats["dropped_turns"] += dropped_turns
+                if chunks:
+                    stats["split"] += 1
+                    stats["extra_chunks"] += len(chunks) - 1
+                else:
+                    # 每一轮都超过上限,整条对话没有可保留的部分
+                    stats["dropped"] += 1
+                outputs = [({**data, "messages": chunk}, counter.count_messages(chunk)) for chunk in chunks]
+
+            for record, record_tokens in outputs:
+                offsets.append(dst.tell())
+                lengths.append(record_tokens)
+                dst.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                stats["output"] += 1
+
+    # 每条输入要么写出(拆分时写出多条),要么计入丢弃
+    if stats["input"] != stats["output"] - stats["extra_chunks"] + stats["dropped"]:
+        raise RuntimeError(f"对话计数不一致: {stats}")
+
+    if bucket_batch_size:
+        order = np.argsort(np.frombuffer(lengths, dtype=np.uint32), kind="stable")
+        groups = [order[i:i + bucket_batch_size] for i in range(0, len(order), bucket_batch_size)]
+        # 不满一组的放在最后,保证其余各组与批次边界对齐
+        tail = groups.pop() if groups and len(groups[-1]) < bucket_batch_size else None
+        random.Random(seed).shuffle(groups)
+        if tail is not None:
+            groups.append(tail)
+        with open(target, "rb") as src, open(output_file, "wb") as dst:
+            for group in groups:
+                for index in group:
+                    src.seek(offsets[index])
+                    dst.write(src.readline())
+        os.remove(target)
+
+    print(f"✅ 已写出 {stats['output']} 条对话到: {output_file}")
+    if stats["split"] or stats["dropped"]:
+        print(f"✂️  拆分 {stats['split']} 条超长对话, 丢弃 {stats['dropped']} 条对话和 {stats['dropped_turns']} 个超长轮次")
+    return stats
+
+
+def print_token_report(report: Dict[str, Any]):
+    """打印 token 长度分析结果"""
+    print("=" * 60)
+    print(f"📏 Token 长度分析: {report['file']}")
+    print("=" * 60)
+    print(f"  - 分词方式: {report['tokenizer']}")
+    print(f"  - 对话数: {report['conversations']:,}, 总 token 数: {report['total_tokens']:,}")
+    percentiles = ", ".join(f"{k} {v:,}" for k, v in report["percentiles"].items())
+    print(f"  - 平均 {report['mean']:,.0f}, {percentiles}, 最长 {report['max']:,}")
+    print(f"  - 最长的 1% 对话占训练 token 的 {report['top1pct_token_share']:.1%}")
+
+    print("\n📊 长度分布(token):")
+    peak = max(count for _, count in report["histogram"]) or 1
+    for label, count in report["histogram"]:
+        print(f"  {label:>12} | {'█' * math.ceil(30 * count / peak) if count else '':<30} {count:,}")
+
+    if report["over_limit"]:
+        print(f"\n⚠️  {report['over_limit']:,} 条对话超过上限 {report['max_seq_len']:,} token, "
+              f"训练时将截断 {report['over_limit_tokens']:,} token:")
+        for item in report["flagged"]:
+            print(f"  - 第 {item['line']} 行: {item['tokens']:,} token")
+        print("  可用 prepare_length_aware_file(..., over_limit='split') 按轮次拆分")
+
+    print(f"\n🧮 分批方式对比 (batch_size={report['batch_size']}):")
+    labels = {"random": "随机分批", "bucket": "按长度分桶", "pack": "打包成定长序列"}
+    for strategy, plan in report["batching"].items():
+        print(f"  - {labels[strategy]}: {plan['batches']:,} 个批次, 计算 {plan['padded_tokens']:,} token, "
+              f"有效率 {plan['efficiency']:.1%}")
+
+    print(f"\n💰 训练量估算 ({report['n_epochs']} 轮):")
+    print(f"  - 每轮 {report['tokens_per_epoch']:,} token, 共 {report['training_tokens']:,} token")
+    if report["estimated_cost"] is not None:
+        print(f"  - 预计费用: {report['estimated_cost']:,.2f} "
+              f"(按每百万 token {report['price_per_million_tokens']} 计)")
+    else:
+        print("  - 提供 price_per_million_tokens 即可估算费用")
+    print("=" * 60)
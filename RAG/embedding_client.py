@@ -0,0 +1,315 @@
+"""
+统一的 Embedding 客户端
+
+封装 OpenAI 兼容的 /embeddings 接口，供各 LlamaIndex 适配器共用：
+- 连接池：复用同一个 requests.Session，避免每批重新握手
+- 并发批处理：大批文本拆成多个请求并发发送，结果按原顺序拼接
+- 重试：连接错误、429 和 5xx 按指数退避重试，遵循 Retry-After
+- 缓存：可选的 LRU 缓存，重复文本不再请求
+- 流控：在途请求数由共享的 AdaptiveController 按 AIMD 调整，接口持续失败时熔断
+- 输出 float32 NumPy 数组，而不是嵌套的 Python 列表
+- 默认请求 encoding_format="base64"，用 np.frombuffer 直接解码到预分配的
+  数组中，省去 JSON 浮点数解析和列表分配；服务端不支持时回退到浮点数列表
+"""
+
+import base64
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+# 共享的客户端流控模块位于仓库根目录
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+from xpulink_concurrency import AdaptiveController, CircuitOpenError, get_controller
+
+# 可重试的 HTTP 状态码
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class EmbeddingAPIError(Exception):
+    """Embedding 接口返回错误或重试耗尽"""
+
+
+def decode_embeddings(data: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    把 /embeddings 响应中的 data 列表解码为 float32 数组
+
+    每个条目的 embedding 可以是 base64 编码的小端 float32 字节串，也可以是
+    浮点数列表；结果按条目的 index 写入预分配的数组。
+
+    Args:
+        data: 响应中的 data 字段
+
+    Returns:
+        (len(data), dim) 的 float32 数组
+    """
+    first = data[0]['embedding']
+    if isinstance(first, str):
+        dim = len(base64.b64decode(first)) // 4
+    else:
+        dim = len(first)
+
+    out = np.empty((len(data), dim), dtype=np.float32)
+    for position, item in enumerate(data):
+        row = item.get('index', position)
+        embedding = item['embedding']
+        if isinstance(embedding, str):
+            out[row] = np.frombuffer(base64.b64decode(embedding), dtype='<f4')
+        else:
+            out[row] = embedding
+    return out
+
+
+class EmbeddingClient:
+    """OpenAI 兼容 /embeddings 接口的客户端"""
+
+    def __init__(
+        self,
+        api_base: str = "https://xpulink.ai/v1",
+        api_key: Optional[str] = None,
+        model: str = "bge-m3",
+        batch_size: int = 10,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        timeout: float = 60,
+        cache_size: int = 0,
+        encoding_format: Optional[str] = "base64",
+        controller: Optional[AdaptiveController] = None
+    ):
+        """
+        初始化 Embedding 客户端
+
+        Args:
+            api_base: API 基础地址
+            api_key: API 密钥（默认从环境变量 XPU_API_KEY 获取）
+            model: 模型名称
+            batch_size: 每个请求包含的文本数
+            max_concurrency: 同时在途的最大请求数（也是连接池大小）
+            max_retries: 单个请求的最大重试次数
+            backoff_base: 指数退避的基础等待时间（秒）
+            timeout: 单个请求的超时时间（秒）
+            cache_size: LRU 缓存的最大文本数，0 表示不缓存
+            encoding_format: 请求的向量编码，"base64" 或 None（浮点数列表）
+            controller: 并发控制与熔断，默认与同进程其他客户端共享 "xpulink-embeddings"；
+                实际在途请求数不超过 max_concurrency 与其当前上限中的较小值
+        """
+        self.api_base = api_base.rstrip('/')
+        self.api_key = api_key or os.getenv("XPU_API_KEY")
+        self.model = model
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.encoding_format = encoding_format
+        self.controller = controller or get_controller("xpulink-embeddings")
+
+        if not self.api_key:
+            raise ValueError("需要提供 API Key")
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        })
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"texts": 0, "requests": 0, "retries": 0, "cache_hits": 0}
+
+    def close(self) -> None:
+        """关闭连接池和线程池"""
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+
+    def _request(self, texts: List[str]) -> np.ndarray:
+        """发送一个请求，按需重试，返回 (len(texts), dim) 的 float32 数组"""
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats["retries"] += 1 if attempt else 0
+
+            try:
+                payload = {"model": self.model, "input": texts}
+                if self.encoding_format:
+                    payload["encoding_format"] = self.encoding_format
+                response = self.controller.call(
+                    self.session.post,
+                    f"{self.api_base}/embeddings",
+                    json=payload,
+                    timeout=self.timeout
+                )
+            except CircuitOpenError as e:
+                # 熔断期间不再重试，直接失败
+                raise EmbeddingAPIError(str(e)) from e
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                last_error = f"API 请求失败: {str(e)}"
+                if attempt < self.max_retries:
+                    time.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES:
+                last_error = f"API 请求失败: {response.status_code}, {response.text[:200]}"
+                if attempt < self.max_retries:
+                    time.sleep(self._backoff(attempt, response))
+                continue
+            if response.status_code in (400, 422) and self.encoding_format:
+                # 服务端不认识 encoding_format 时改用浮点数列表，之后不再请求 base64
+                self.encoding_format = None
+                return self._request(texts)
+            if response.status_code != 200:
+                raise EmbeddingAPIError(f"API 请求失败: {response.status_code}, {response.text[:200]}")
+
+            result = response.json()
+            data = result.get('data')
+            if not data or len(data) != len(texts):
+                raise EmbeddingAPIError(f"API 返回格式错误: {str(result)[:200]}")
+            return decode_embeddings(data)
+
+        raise EmbeddingAPIError(f"重试 {self.max_retries} 次后仍失败: {last_error}")
+
+    def _cache_get(self, text: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+                self.stats["cache_hits"] += 1
+            return vector
+
+    def _cache_put(self, texts: Sequence[str], vectors: np.ndarray) -> None:
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                self._cache[text] = vector
+                self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        计算一组文本的向量
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            (len(texts), dim) 的 float32 数组
+        """
+        texts = list(texts)
+        self.stats["texts"] += len(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        vectors: Dict[int, np.ndarray] = {}
+        # 去重后只请求缓存中没有的文本
+        pending: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            cached = self._cache_get(text) if self.cache_size else None
+            if cached is not None:
+                vectors[i] = cached
+            else:
+                pending.setdefault(text, []).append(i)
+
+        unique = list(pending)
+        batches = [unique[i:i + self.batch_size] for i in range(0, len(unique), self.batch_size)]
+        if len(batches) == 1:
+            results = [self._request(batches[0])]
+        else:
+            results = list(self._executor.map(self._request, batches))
+
+        for batch, matrix in zip(batches, results):
+            if self.cache_size:
+                self._cache_put(batch, matrix)
+            for text, vector in zip(batch, matrix):
+                for i in pending[text]:
+                    vectors[i] = vector
+
+        return np.stack([vectors[i] for i in range(len(texts))])
+
+    def embed_one(self, text: str) -> np.ndarray:
+        """计算单个文本的向量，返回 (dim,) 的 float32 数组"""
+        return self.embed([text])[0]
+
+
+def _make_response_body(batch_size: int, dim: int, encoding_format: Optional[str], seed: int = 0) -> bytes:
+    """构造与 /embeddings 接口格式相同的响应体"""
+    vectors = np.random.default_rng(seed).standard_normal((batch_size, dim)).astype(np.float32)
+    if encoding_format == "base64":
+        data = [{"object": "embedding", "index": i,
+                 "embedding": base64.b64encode(vector.astype('<f4').tobytes()).decode("ascii")}
+                for i, vector in enumerate(vectors)]
+    else:
+        data = [{"object": "embedding", "index": i, "embedding": vector.tolist()}
+                for i, vector in enumerate(vectors)]
+    return json.dumps({"object": "list", "data": data}).encode("utf-8")
+
+
+def benchmark_decoding(batch_size: int = 64, dim: int = 1024, repeat: int = 20) -> Dict[str, Any]:
+    """
+    对比 JSON 浮点数列表与 base64 两种响应的解码耗时
+
+    测量从响应字节到 float32 数组的完整过程（json.loads + 解码），不含网络传输。
+
+    Args:
+        batch_size: 每个响应包含的向量数
+        dim: 向量维度
+        repeat: 重复次数
+
+    Returns:
+        dict: 两种格式的响应大小和每次解码耗时（毫秒）
+    """
+    result = {"batch_size": batch_size, "dim": dim, "repeat": repeat}
+    for name, encoding_format in [("float", None), ("base64", "base64")]:
+        body = _make_response_body(batch_size, dim, encoding_format)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            decode_embeddings(json.loads(body)["data"])
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        result[name] = {
+            "body_kb": round(len(body) / 1024, 1),
+            "median_ms": round(timings[len(timings) // 2], 3),
+            "min_ms": round(timings[0], 3),
+        }
+    result["speedup"] = round(result["float"]["median_ms"] / max(result["base64"]["median_ms"], 1e-9), 2)
+    return result
+
+
+def print_decoding_benchmark(result: Dict[str, Any]):
+    """打印解码对比结果"""
+    print("=" * 60)
+    print(f"🧪 Embedding 响应解码对比 ({result['batch_size']} × {result['dim']} 维, "
+          f"重复 {result['repeat']} 次)")
+    print("=" * 60)
+    for name, label in [("float", "JSON 浮点数列表"), ("base64", "base64 + np.frombuffer")]:
+        stats = result[name]
+        print(f"  - {label}: 中位数 {stats['median_ms']:.2f} ms, 最快 {stats['min_ms']:.2f} ms, "
+              f"响应体 {stats['body_kb']:,.1f} KB")
+    print(f"  - 加速比: {result['speedup']:.1f}x")
+    print("=" * 60)
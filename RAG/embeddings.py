@@ -0,0 +1,113 @@
+"""
+LlamaIndex Embedding 适配器
+
+BGEM3Embedding 和 OpenAICompatibleEmbedding 只负责把 LlamaIndex 的
+BaseEmbedding 接口转接到共用的 EmbeddingClient 上，请求、批处理、重试和
+缓存都由客户端完成。
+"""
+
+import asyncio
+from typing import Any, List, Optional
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+from embedding_client import EmbeddingClient
+
+
+class ClientEmbedding(BaseEmbedding):
+    """
+    基于 EmbeddingClient 的 LlamaIndex Embedding 模型
+
+    embed_batch_size 指单个请求的文本数；LlamaIndex 每次交给适配器
+    embed_batch_size × max_concurrency 个文本，由客户端拆成多个请求并发发送。
+    """
+
+    _client: EmbeddingClient = PrivateAttr()
+
+    def __init__(
+        self,
+        api_base: str = "https://xpulink.ai/v1",
+        api_key: Optional[str] = None,
+        model: str = "bge-m3",
+        embed_batch_size: int = 10,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        cache_size: int = 0,
+        encoding_format: Optional[str] = "base64",
+        client: Optional[EmbeddingClient] = None,
+        **kwargs: Any
+    ) -> None:
+        """
+        初始化 Embedding 模型
+
+        Args:
+            api_base: API 基础地址
+            api_key: API 密钥（默认从环境变量 XPU_API_KEY 获取）
+            model: 模型名称
+            embed_batch_size: 单个请求的文本数
+            max_concurrency: 最大并发请求数
+            max_retries: 单个请求的最大重试次数
+            cache_size: LRU 缓存的最大文本数，0 表示不缓存
+            encoding_format: 请求的向量编码，"base64" 或 None（浮点数列表）
+            client: 已有的客户端（提供时忽略上面的连接参数）
+        """
+        client = client or EmbeddingClient(
+            api_base=api_base,
+            api_key=api_key,
+            model=model,
+            batch_size=embed_batch_size,
+            max_concurrency=max_concurrency,
+            max_retries=max_retries,
+            cache_size=cache_size,
+            encoding_format=encoding_format,
+        )
+        super().__init__(
+            model_name=client.model,
+            embed_batch_size=client.batch_size * client.max_concurrency,
+            **kwargs
+        )
+        self._client = client
+
+    @property
+    def client(self) -> EmbeddingClient:
+        return self._client
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """直接返回 float32 NumPy 数组，供不经过 LlamaIndex 的调用方使用"""
+        return self._client.embed(texts)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._client.embed_one(query).tolist()
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._client.embed_one(text).tolist()
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._client.embed(texts).tolist()
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await asyncio.get_running_loop().run_in_executor(None, self._get_query_embedding, query)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.get_running_loop().run_in_executor(None, self._get_text_embeddings, texts)
+
+
+class BGEM3Embedding(ClientEmbedding):
+    """BGE-M3 Embedding 模型（XPULink，OpenAI 兼容 API）"""
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "BGEM3Embedding"
+
+
+class OpenAICompatibleEmbedding(ClientEmbedding):
+    """OpenAI 风格 API 的 Embedding 模型"""
+
+    def __init__(self, model: str = "text-embedding-ada-002", embed_batch_size: int = 50, **kwargs: Any) -> None:
+        super().__init__(model=model, embed_batch_size=embed_batch_size, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "OpenAICompatibleEmbedding"
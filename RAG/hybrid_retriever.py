@@ -0,0 +1,364 @@
+"""
+稠密 + 稀疏（BM25）混合检索
+
+在导入阶段同步构建本地 BM25 倒排索引（中日韩文本按字的一元 + 二元切分，
+安装了 jieba 时使用 jieba 分词），查询时与向量检索结果做倒数排名融合（RRF）。
+关键词特征明显的查询可直接由 BM25 返回结果，省去一次查询 Embedding 调用。
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import statistics
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+try:
+    import jieba
+except ImportError:
+    jieba = None
+
+# 中日韩字符（汉字、假名、谚文）
+_CJK_RANGES = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_PATTERN = re.compile(f"[{_CJK_RANGES}]+|[A-Za-z0-9_]+")
+_CJK_PATTERN = re.compile(f"[{_CJK_RANGES}]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    CJK 感知的分词
+
+    - 英文和数字：按单词切分并转小写
+    - 中日韩文本：安装了 jieba 时使用搜索引擎模式分词，否则切分为单字 + 相邻二元组
+
+    Args:
+        text: 输入文本
+
+    Returns:
+        词项列表
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        span = match.group()
+        if not _CJK_PATTERN.match(span):
+            tokens.append(span.lower())
+        elif jieba is not None:
+            tokens.extend(word for word in jieba.lcut_for_search(span) if word.strip())
+        else:
+            tokens.extend(span)
+            tokens.extend(span[i:i + 2] for i in range(len(span) - 1))
+    return tokens
+
+
+class BM25Index:
+    """
+    内存中的 BM25 倒排索引
+
+    以节点 ID 为文档键，支持增量添加和删除，可持久化为 JSON。
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        初始化 BM25 索引
+
+        Args:
+            k1: 词频饱和参数
+            b: 文档长度归一化参数
+        """
+        self.k1 = k1
+        self.b = b
+        # 倒排表：词项 -> {内部文档号: 词频}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_ids: List[Optional[str]] = []
+        self._doc_lengths: List[int] = []
+        self._doc_terms: List[Optional[List[str]]] = []
+        self._id_to_doc: Dict[str, int] = {}
+        self._total_length = 0
+
+    @property
+    def doc_count(self) -> int:
+        return len(self._id_to_doc)
+
+    def add(self, node_id: str, text: str) -> None:
+        """添加（或覆盖）一个文档"""
+        if node_id in self._id_to_doc:
+            self.remove(node_id)
+
+        counts = Counter(tokenize(text))
+        doc = len(self._doc_ids)
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[doc] = tf
+
+        length = sum(counts.values())
+        self._doc_ids.append(node_id)
+        self._doc_lengths.append(length)
+        self._doc_terms.append(list(counts))
+        self._id_to_doc[node_id] = doc
+        self._total_length += length
+
+    def add_nodes(self, nodes: Sequence[Any]) -> None:
+        """批量添加 LlamaIndex 节点"""
+        for node in nodes:
+            self.add(node.node_id, node.get_content(metadata_mode=MetadataMode.NONE))
+
+    def remove(self, node_id: str) -> None:
+        """删除一个文档"""
+        doc = self._id_to_doc.pop(node_id, None)
+        if doc is None:
+            return
+        for term in self._doc_terms[doc]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths[doc]
+        self._doc_ids[doc] = None
+        self._doc_terms[doc] = None
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        检索与查询最相关的文档
+
+        Args:
+            query: 查询文本
+            top_k: 返回数量
+
+        Returns:
+            [(节点 ID, BM25 分数)]，按分数降序
+        """
+        n_docs = self.doc_count
+        if n_docs == 0:
+            return []
+
+        avg_length = self._total_length / n_docs
+        scores: Dict[int, float] = {}
+
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc] / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(self._doc_ids[doc], score) for doc, score in best]
+
+    def persist(self, persist_path: str) -> None:
+        """保存为 JSON（会压缩掉已删除的文档）"""
+        docs = [
+            [node_id, self._doc_lengths[doc]]
+            for doc, node_id in enumerate(self._doc_ids) if node_id is not None
+        ]
+        remap = {self._id_to_doc[node_id]: new for new, (node_id, _) in enumerate(docs)}
+        postings = {
+            term: [[remap[doc], tf] for doc, tf in entries.items()]
+            for term, entries in self._postings.items()
+        }
+
+        dirpath = os.path.dirname(persist_path)
+        if dirpath:
+            os.makedirs(dirpath, exist_ok=True)
+        with open(persist_path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "docs": docs, "postings": postings}, f, ensure_ascii=False)
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str) -> "BM25Index":
+        """从 persist() 保存的 JSON 加载"""
+        with open(persist_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        index = cls(k1=data["k1"], b=data["b"])
+        doc_terms: List[List[str]] = [[] for _ in data["docs"]]
+        for term, entries in data["postings"].items():
+            index._postings[term] = {doc: tf for doc, tf in entries}
+            for doc, _ in entries:
+                doc_terms[doc].append(term)
+
+        for doc, (node_id, length) in enumerate(data["docs"]):
+            index._doc_ids.append(node_id)
+            index._doc_lengths.append(length)
+            index._doc_terms.append(doc_terms[doc])
+            index._id_to_doc[node_id] = doc
+            index._total_length += length
+        return index
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[Sequence[str]],
+    k: int = 60,
+    weights: Optional[Sequence[float]] = None
+) -> List[Tuple[str, float]]:
+    """
+    倒数排名融合（RRF）
+
+    score(d) = Σ weight_i / (k + rank_i(d))
+
+    Args:
+        ranked_lists: 多个按相关度排序的 ID 列表
+        k: 平滑常数（原论文取 60）
+        weights: 各列表的权重（默认均为 1）
+
+    Returns:
+        [(ID, 融合分数)]，按分数降序
+    """
+    weights = weights or [1.0] * len(ranked_lists)
+    fused: Dict[str, float] = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        for rank, item_id in enumerate(ranked, 1):
+            fused[item_id] = fused.get(item_id, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    稠密 + BM25 混合检索器
+
+    当 BM25 的第一名分数明显高于第二名时（关键词特征明显的查询），
+    直接返回 BM25 结果，不再调用 Embedding 接口。BM25 只命中一个片段时
+    没有可比较的第二名（往往只是碰巧命中了一个词），仍走混合检索。
+    """
+
+    def __init__(
+        self,
+        vector_retriever: BaseRetriever,
+        bm25_index: BM25Index,
+        docstore: Any,
+        similarity_top_k: int = 3,
+        candidate_top_k: int = 10,
+        rrf_k: int = 60,
+        dense_weight: float = 1.0,
+        sparse_weight: float = 1.0,
+        keyword_shortcut_ratio: Optional[float] = 2.0,
+        **kwargs: Any
+    ):
+        """
+        初始化混合检索器
+
+        Args:
+            vector_retriever: 向量检索器（其 similarity_top_k 应不小于 candidate_top_k）
+            bm25_index: BM25 索引
+            docstore: 用于按 ID 取回 BM25 命中节点的 docstore
+            similarity_top_k: 最终返回的节点数
+            candidate_top_k: 每一路参与融合的候选数
+            rrf_k: RRF 平滑常数
+            dense_weight: 稠密检索的融合权重
+            sparse_weight: BM25 的融合权重
+            keyword_shortcut_ratio: BM25 第一名与第二名分数之比超过该值时跳过向量检索，None 表示禁用
+        """
+        self.vector_retriever = vector_retriever
+        self.bm25_index = bm25_index
+        self.docstore = docstore
+        self.similarity_top_k = similarity_top_k
+        self.candidate_top_k = candidate_top_k
+        self.rrf_k = rrf_k
+        self.dense_weight = dense_weight
+        self.sparse_weight = sparse_weight
+        self.keyword_shortcut_ratio = keyword_shortcut_ratio
+        # 最近一次检索走的路径：sparse / hybrid
+        self.last_route: Optional[str] = None
+        super().__init__(**kwargs)
+
+    def _is_keyword_hit(self, sparse: List[Tuple[str, float]]) -> bool:
+        # 只有一个命中时无法判断第一名是否明显领先，不视为关键词查询
+        if self.keyword_shortcut_ratio is None or len(sparse) < 2:
+            return False
+        return sparse[0][1] >= self.keyword_shortcut_ratio * sparse[1][1]
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        sparse = self.bm25_index.search(query_bundle.query_str, top_k=self.candidate_top_k)
+
+        if self._is_keyword_hit(sparse):
+            self.last_route = "sparse"
+            return [
+                NodeWithScore(node=self.docstore.get_node(node_id), score=score)
+                for node_id, score in sparse[:self.similarity_top_k]
+            ]
+
+        self.last_route = "hybrid"
+        dense = self.vector_retriever.retrieve(query_bundle)[:self.candidate_top_k]
+        nodes = {result.node.node_id: result.node for result in dense}
+
+        fused = reciprocal_rank_fusion(
+            [[result.node.node_id for result in dense], [node_id for node_id, _ in sparse]],
+            k=self.rrf_k,
+            weights=[self.dense_weight, self.sparse_weight],
+        )
+
+        results = []
+        for node_id, score in fused[:self.similarity_top_k]:
+            node = nodes.get(node_id) or self.docstore.get_node(node_id)
+            results.append(NodeWithScore(node=node, score=score))
+        return results
+
+
+def benchmark_query_path(
+    queries: List[str],
+    dense_retriever: BaseRetriever,
+    hybrid_retriever: HybridRetriever,
+    repeat: int = 1
+) -> Dict[str, Any]:
+    """
+    对比纯向量检索与混合检索的查询路径耗时
+
+    Args:
+        queries: 查询列表
+        dense_retriever: 纯向量检索器
+        hybrid_retriever: 混合检索器
+        repeat: 每个查询重复次数
+
+    Returns:
+        两条路径的延迟统计（毫秒）和混合检索中跳过 Embedding 的比例
+    """
+    def summarize(latencies: List[float]) -> Dict[str, float]:
+        ordered = sorted(latencies)
+        return {
+            "mean_ms": round(statistics.mean(ordered), 2),
+            "p50_ms": round(ordered[len(ordered) // 2], 2),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        }
+
+    dense_latencies, hybrid_latencies = [], []
+    shortcut_count = 0
+
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            dense_retriever.retrieve(query)
+            dense_latencies.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            hybrid_retriever.retrieve(query)
+            hybrid_latencies.append((time.perf_counter() - start) * 1000)
+            if hybrid_retriever.last_route == "sparse":
+                shortcut_count += 1
+
+    total = len(queries) * repeat
+    return {
+        "queries": total,
+        "dense": {**summarize(dense_latencies), "embedding_calls": total},
+        "hybrid": {**summarize(hybrid_latencies), "embedding_calls": total - shortcut_count},
+        "keyword_shortcut_rate": round(shortcut_count / total, 3) if total else 0.0,
+    }
+
+
+def print_benchmark(result: Dict[str, Any]):
+    """打印格式化的查询路径对比结果"""
+    print("=" * 60)
+    print(f"⏱️  查询路径对比 ({result['queries']} 次查询)")
+    print("=" * 60)
+    print(f"{'路径':<10}{'平均(ms)':>12}{'P50(ms)':>12}{'P95(ms)':>12}{'Embedding调用':>16}")
+    for name in ("dense", "hybrid"):
+        row = result[name]
+        print(f"{name:<10}{row['mean_ms']:>12.2f}{row['p50_ms']:>12.2f}{row['p95_ms']:>12.2f}{row['embedding_calls']:>16}")
+    print(f"\n🔑 关键词直达比例: {result['keyword_shortcut_rate']:.1%}")
+    print("=" * 60)
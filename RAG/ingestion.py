@@ -0,0 +1,316 @@
+"""
+并行流式 PDF 导入流水线
+
+使用进程池并行解析 PDF 并在子进程内完成分块，分块结果通过有界队列流入
+Embedding 阶段，使解析与向量化重叠执行。在途文件数和队列长度都有上限，
+因此流水线自身的内存占用不随语料规模增长。Embedding 或写入索引出错时，
+生产者线程会停止提交新文件、取消尚未开始的解析任务，进程池随之关闭。
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from llama_index.core import Settings, SimpleDirectoryReader, StorageContext, VectorStoreIndex
+from llama_index.core.node_parser import SentenceSplitter
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+# 队列结束标记
+_SENTINEL = None
+
+
+def _peak_rss_mb(who: str = "self") -> float:
+    """
+    返回内存峰值（MB），不支持的平台返回 0
+
+    Args:
+        who: "self" 为当前进程，"children" 为已结束的子进程（解析进程）中的最大值
+    """
+    if resource is None:
+        return 0.0
+    target = resource.RUSAGE_CHILDREN if who == "children" else resource.RUSAGE_SELF
+    peak = resource.getrusage(target).ru_maxrss
+    # Linux 上单位为 KB，macOS 上单位为字节
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def parse_and_chunk_pdf(file_path: str, chunk_size: int = 1024, chunk_overlap: int = 20):
+    """
+    解析单个 PDF 并分块（在子进程中执行）
+
+    Args:
+        file_path: PDF 文件路径
+        chunk_size: 分块大小
+        chunk_overlap: 分块重叠
+
+    Returns:
+        (文件路径, 页数, 节点列表)
+    """
+    documents = SimpleDirectoryReader(input_files=[file_path], filename_as_id=True).load_data()
+    splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    nodes = splitter.get_nodes_from_documents(documents)
+    return file_path, len(documents), nodes
+
+
+def list_pdf_files(input_dir: str) -> List[str]:
+    """递归列出目录下的所有 PDF 文件"""
+    pdf_files = []
+    for root, _, files in os.walk(input_dir):
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                pdf_files.append(os.path.join(root, name))
+    return sorted(pdf_files)
+
+
+class StreamingIngestionPipeline:
+    """
+    并行流式导入流水线
+
+    流程：
+        文件列表 → 进程池解析 + 分块 → 有界队列 → 批量 Embedding → 写入索引
+    """
+
+    def __init__(
+        self,
+        embed_model: Optional[Any] = None,
+        vector_store: Optional[Any] = None,
+        num_workers: Optional[int] = None,
+        max_pending_files: Optional[int] = None,
+        queue_size: int = 8,
+        embed_batch_size: Optional[int] = None,
+        chunk_size: int = 1024,
+        chunk_overlap: int = 20,
+        sparse_index: Optional[Any] = None,
+        show_progress: bool = True
+    ):
+        """
+        初始化导入流水线
+
+        Args:
+            embed_model: Embedding 模型（默认使用 Settings.embed_model）
+            vector_store: 向量存储（默认使用 LlamaIndex 内置存储）
+            num_workers: 解析进程数（默认为 CPU 核数）
+            max_pending_files: 同时在途的最大文件数（默认为进程数的 2 倍）
+            queue_size: 解析结果队列的最大长度（单位：文件）
+            embed_batch_size: 每次 Embedding 请求的文本数（默认使用模型自身配置）
+            chunk_size: 分块大小
+            chunk_overlap: 分块重叠
+            sparse_index: 同步构建的稀疏索引（如 BM25Index，可选）
+            show_progress: 是否打印进度
+        """
+        self.embed_model = embed_model or Settings.embed_model
+        self.vector_store = vector_store
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.max_pending_files = max_pending_files or self.num_workers * 2
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size or getattr(self.embed_model, "embed_batch_size", 10)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.sparse_index = sparse_index
+        self.show_progress = show_progress
+
+    @staticmethod
+    def _put(out_queue: "queue.Queue", item: Any, stop: threading.Event) -> bool:
+        """队列满时阻塞（背压），消费者已停止时放弃，返回是否放入"""
+        while not stop.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, files: List[str], out_queue: "queue.Queue", stats: Dict[str, Any],
+                 stop: threading.Event):
+        """生产者线程：向进程池提交文件，把完成的结果放入有界队列；stop 被设置后尽快退出"""
+        try:
+            with ProcessPoolExecutor(max_workers=self.num_workers) as pool:
+                pending = {}
+                file_iter = iter(files)
+                exhausted = False
+
+                while (pending or not exhausted) and not stop.is_set():
+                    # 保持在途文件数不超过上限
+                    while not exhausted and len(pending) < self.max_pending_files:
+                        try:
+                            path = next(file_iter)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        future = pool.submit(
+                            parse_and_chunk_pdf, path, self.chunk_size, self.chunk_overlap
+                        )
+                        pending[future] = path
+
+                    if not pending:
+                        break
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path = pending.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            stats["errors"].append({"file": path, "error": str(e)})
+                            continue
+                        if not self._put(out_queue, result, stop):
+                            break
+
+                # 消费者已停止：取消尚未开始的解析任务，退出 with 时只等待正在解析的文件
+                for future in pending:
+                    future.cancel()
+        finally:
+            self._put(out_queue, _SENTINEL, stop)
+
+    def _embed_and_insert(self, index: VectorStoreIndex, nodes: List[Any]) -> None:
+        texts = [node.get_content(metadata_mode="embed") for node in nodes]
+        embeddings = self.embed_model.get_text_embedding_batch(texts)
+        for node, embedding in zip(nodes, embeddings):
+            node.embedding = embedding
+        index.insert_nodes(nodes)
+        if self.sparse_index is not None:
+            self.sparse_index.add_nodes(nodes)
+
+    def run(
+        self,
+        input_dir: Optional[str] = None,
+        input_files: Optional[List[str]] = None,
+        index: Optional[VectorStoreIndex] = None,
+        on_file_parsed: Optional[Callable[[str, int, List[Any]], None]] = None
+    ):
+        """
+        运行导入流水线
+
+        Args:
+            input_dir: PDF 目录
+            input_files: PDF 文件列表（与 input_dir 二选一）
+            index: 已有索引（不提供则新建）
+            on_file_parsed: 单个文件的文本块全部写入索引后的回调，参数为 (文件路径, 页数, 节点列表)；
+                Embedding 或写入失败时，尚未完全写入的文件不会触发回调
+
+        Returns:
+            (索引, 统计信息字典)
+        """
+        files = input_files if input_files is not None else list_pdf_files(input_dir)
+
+        if index is None:
+            storage_context = StorageContext.from_defaults(vector_store=self.vector_store)
+            index = VectorStoreIndex(
+                nodes=[], storage_context=storage_context, embed_model=self.embed_model
+            )
+
+        stats = {
+            "files": len(files),
+            "files_done": 0,
+            "pages": 0,
+            "chunks": 0,
+            "errors": [],
+        }
+        parsed_queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce, args=(files, parsed_queue, stats, stop), daemon=True
+        )
+
+        start = time.perf_counter()
+        embed_seconds = 0.0
+        queue_high_water = 0
+        buffer = []
+        # 等待写入索引的文件: (该文件最后一个文本块的累计序号, 文件路径, 页数, 节点列表)
+        pending_files = deque()
+        queued_chunks = 0
+
+        def notify_indexed():
+            while pending_files and pending_files[0][0] <= stats["chunks"]:
+                _, file_path, pages, nodes = pending_files.popleft()
+                if on_file_parsed is not None:
+                    on_file_parsed(file_path, pages, nodes)
+
+        producer.start()
+        try:
+            while True:
+                queue_high_water = max(queue_high_water, parsed_queue.qsize())
+                item = parsed_queue.get()
+                if item is _SENTINEL:
+                    break
+
+                file_path, pages, nodes = item
+                stats["files_done"] += 1
+                stats["pages"] += pages
+                buffer.extend(nodes)
+                queued_chunks += len(nodes)
+                pending_files.append((queued_chunks, file_path, pages, nodes))
+
+                while len(buffer) >= self.embed_batch_size:
+                    batch, buffer = buffer[:self.embed_batch_size], buffer[self.embed_batch_size:]
+                    embed_start = time.perf_counter()
+                    self._embed_and_insert(index, batch)
+                    embed_seconds += time.perf_counter() - embed_start
+                    stats["chunks"] += len(batch)
+                    notify_indexed()
+
+                if self.show_progress:
+                    elapsed = time.perf_counter() - start
+                    print(f"已处理 {stats['files_done']}/{len(files)} 个文件, "
+                          f"{stats['pages']} 页, {stats['pages'] / max(elapsed, 1e-9):.1f} 页/秒")
+
+            if buffer:
+                embed_start = time.perf_counter()
+                self._embed_and_insert(index, buffer)
+                embed_seconds += time.perf_counter() - embed_start
+                stats["chunks"] += len(buffer)
+            notify_indexed()
+        finally:
+            # 正常结束时生产者已退出；出错时通知生产者停止，并清空队列以免它阻塞在 put 上
+            stop.set()
+            while producer.is_alive():
+                try:
+                    while True:
+                        parsed_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                producer.join(0.1)
+
+        elapsed = time.perf_counter() - start
+
+        stats.update({
+            "elapsed_seconds": round(elapsed, 2),
+            "embed_seconds": round(embed_seconds, 2),
+            "pages_per_second": round(stats["pages"] / elapsed, 2) if elapsed else 0.0,
+            "chunks_per_second": round(stats["chunks"] / elapsed, 2) if elapsed else 0.0,
+            "queue_high_water": queue_high_water,
+            "peak_memory_mb": round(_peak_rss_mb(), 1),
+            "peak_worker_memory_mb": round(_peak_rss_mb("children"), 1),
+        })
+        return index, stats
+
+
+def print_ingestion_stats(stats: Dict[str, Any]):
+    """打印格式化的导入统计"""
+    print("=" * 60)
+    print("📥 导入统计")
+    print("=" * 60)
+    print(f"  - 文件数: {stats['files_done']}/{stats['files']}")
+    print(f"  - 页数: {stats['pages']:,}")
+    print(f"  - 文本块数: {stats['chunks']:,}")
+    print(f"  - 总耗时: {stats['elapsed_seconds']:.2f} 秒 (Embedding {stats['embed_seconds']:.2f} 秒)")
+    print(f"  - 吞吐量: {stats['pages_per_second']:.2f} 页/秒, {stats['chunks_per_second']:.2f} 块/秒")
+    print(f"  - 队列高水位: {stats['queue_high_water']}")
+    print(f"  - 内存峰值: 主进程 {stats['peak_memory_mb']:.1f} MB, "
+          f"单个解析进程 {stats['peak_worker_memory_mb']:.1f} MB")
+    if stats["errors"]:
+        print(f"\n⚠️  {len(stats['errors'])} 个文件解析失败:")
+        for error in stats["errors"]:
+            print(f"  - {error['file']}: {error['error']}")
+    print("=" * 60)
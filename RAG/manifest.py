@@ -0,0 +1,288 @@
+"""
+增量索引与文档清单
+
+通过清单文件（manifest）记录每个 PDF 的路径、修改时间、大小、内容哈希和
+对应的文本块 ID。sync() 只解析和向量化新增或修改过的文件，并删除已移除
+文件的向量，解析和 Embedding 的耗时与变更集大小成正比，而不是与语料规模成正比。
+
+持久化时只写有变化的部分：没有文件变化时只更新清单；有变化时写入索引
+（向量存储会先压缩掉已删除的行，文件大小只取决于当前语料，不随修改历史
+增长），开启 BM25 时再写入 BM25 索引。LlamaIndex 的 docstore 只能整体写出，
+这一步仍与当前语料规模成正比。
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from llama_index.core import StorageContext, VectorStoreIndex, load_index_from_storage
+
+from hybrid_retriever import BM25Index
+from ingestion import StreamingIngestionPipeline, list_pdf_files
+from vector_store import QuantizedVectorStore
+
+MANIFEST_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+VECTOR_STORE_FILENAME = "default__vector_store.json"
+BM25_FILENAME = "bm25_index.json"
+
+
+def file_sha256(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """流式计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DocumentManifest:
+    """
+    文档清单
+
+    以相对于数据目录的路径为键，记录：
+    - mtime / size: 用于快速判断文件是否可能被修改
+    - sha256: 内容哈希，mtime 变化但内容未变时避免重新索引
+    - chunk_ids / ref_doc_ids: 该文件在索引中对应的文本块和文档 ID
+    """
+
+    def __init__(self, path: str, files: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.path = path
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, path: str) -> "DocumentManifest":
+        """加载清单，文件不存在时返回空清单"""
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"不支持的清单版本: {data.get('version')}")
+        return cls(path, data.get("files", {}))
+
+    def save(self):
+        """原子地写入清单文件"""
+        dirpath = os.path.dirname(self.path)
+        if dirpath:
+            os.makedirs(dirpath, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class IncrementalIndexer:
+    """增量索引器：根据文档清单同步数据目录与向量索引"""
+
+    def __init__(
+        self,
+        index: VectorStoreIndex,
+        data_dir: str,
+        manifest_path: str,
+        pipeline: Optional[StreamingIngestionPipeline] = None,
+        persist_dir: Optional[str] = None
+    ):
+        """
+        初始化增量索引器
+
+        Args:
+            index: 向量索引
+            data_dir: PDF 数据目录
+            manifest_path: 清单文件路径
+            pipeline: 导入流水线（默认新建）
+            persist_dir: 同步后持久化索引的目录（可选）
+        """
+        self.index = index
+        self.data_dir = data_dir
+        self.manifest = DocumentManifest.load(manifest_path)
+        self.pipeline = pipeline or StreamingIngestionPipeline(show_progress=False)
+        self.persist_dir = persist_dir
+
+    @classmethod
+    def from_persist_dir(
+        cls,
+        data_dir: str,
+        persist_dir: str,
+        storage_dtype: str = "float32",
+        rescore: bool = False,
+        pipeline: Optional[StreamingIngestionPipeline] = None,
+        sparse: bool = False
+    ) -> "IncrementalIndexer":
+        """
+        从持久化目录加载索引和清单，目录不存在时新建空索引
+
+        Args:
+            data_dir: PDF 数据目录
+            persist_dir: 索引持久化目录
+            storage_dtype: 新建索引时的向量存储精度
+            rescore: 新建索引时是否开启全精度重打分
+            pipeline: 导入流水线
+            sparse: 是否同时维护 BM25 索引（保存在 persist_dir/bm25_index.json）
+        """
+        vector_store_path = os.path.join(persist_dir, VECTOR_STORE_FILENAME)
+        bm25_path = os.path.join(persist_dir, BM25_FILENAME)
+        pipeline = pipeline or StreamingIngestionPipeline(show_progress=False)
+
+        if sparse and pipeline.sparse_index is None:
+            if os.path.exists(bm25_path):
+                pipeline.sparse_index = BM25Index.from_persist_path(bm25_path)
+            else:
+                pipeline.sparse_index = BM25Index()
+
+        if os.path.exists(vector_store_path):
+            vector_store = QuantizedVectorStore.from_persist_path(vector_store_path)
+            storage_context = StorageContext.from_defaults(
+                persist_dir=persist_dir, vector_store=vector_store
+            )
+            index = load_index_from_storage(storage_context, embed_model=pipeline.embed_model)
+        else:
+            vector_store = QuantizedVectorStore(storage_dtype=storage_dtype, rescore=rescore)
+            storage_context = StorageContext.from_defaults(vector_store=vector_store)
+            index = VectorStoreIndex(
+                nodes=[], storage_context=storage_context, embed_model=pipeline.embed_model
+            )
+
+        return cls(
+            index,
+            data_dir,
+            os.path.join(persist_dir, MANIFEST_FILENAME),
+            pipeline=pipeline,
+            persist_dir=persist_dir,
+        )
+
+    def scan(self) -> Dict[str, Any]:
+        """
+        扫描数据目录，找出新增、修改、删除的文件
+
+        只有 mtime 或 size 变化的文件才会计算内容哈希。
+
+        Returns:
+            包含 added / modified / deleted / unchanged 文件列表和新哈希的字典
+        """
+        changes = {"added": [], "modified": [], "deleted": [], "unchanged": [], "hashes": {}}
+        seen = set()
+
+        for file_path in list_pdf_files(self.data_dir):
+            rel_path = os.path.relpath(file_path, self.data_dir)
+            seen.add(rel_path)
+            stat = os.stat(file_path)
+            entry = self.manifest.files.get(rel_path)
+
+            if entry is None:
+                changes["added"].append(rel_path)
+                changes["hashes"][rel_path] = file_sha256(file_path)
+                continue
+
+            if entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                changes["unchanged"].append(rel_path)
+                continue
+
+            sha256 = file_sha256(file_path)
+            if sha256 == entry["sha256"]:
+                # 只是被 touch 过，内容未变
+                entry["mtime"], entry["size"] = stat.st_mtime, stat.st_size
+                changes["unchanged"].append(rel_path)
+            else:
+                changes["modified"].append(rel_path)
+                changes["hashes"][rel_path] = sha256
+
+        changes["deleted"] = [path for path in self.manifest.files if path not in seen]
+        return changes
+
+    def _remove_file(self, rel_path: str) -> int:
+        """从索引中删除某个文件的全部文本块，返回删除的块数"""
+        entry = self.manifest.files.pop(rel_path)
+        chunk_ids = entry.get("chunk_ids", [])
+
+        self.index.delete_nodes(chunk_ids, delete_from_docstore=True)
+        nodes_dict = self.index.index_struct.nodes_dict
+        for chunk_id in chunk_ids:
+            nodes_dict.pop(chunk_id, None)
+        for ref_doc_id in entry.get("ref_doc_ids", []):
+            self.index.docstore.delete_ref_doc(ref_doc_id, raise_error=False)
+        if self.pipeline.sparse_index is not None:
+            for chunk_id in chunk_ids:
+                self.pipeline.sparse_index.remove(chunk_id)
+        self.index.storage_context.index_store.add_index_struct(self.index.index_struct)
+
+        return len(chunk_ids)
+
+    def sync(self) -> Dict[str, Any]:
+        """
+        同步数据目录与索引
+
+        Returns:
+            同步统计信息
+        """
+        start = time.perf_counter()
+        changes = self.scan()
+
+        removed_chunks = 0
+        for rel_path in changes["deleted"] + changes["modified"]:
+            removed_chunks += self._remove_file(rel_path)
+
+        to_index = changes["added"] + changes["modified"]
+        ingestion_stats = None
+
+        if to_index:
+            def record(file_path: str, pages: int, nodes: List[Any]):
+                rel_path = os.path.relpath(file_path, self.data_dir)
+                stat = os.stat(file_path)
+                self.manifest.files[rel_path] = {
+                    "path": rel_path,
+                    "mtime": stat.st_mtime,
+                    "size": stat.st_size,
+                    "sha256": changes["hashes"][rel_path],
+                    "pages": pages,
+                    "chunk_ids": [node.node_id for node in nodes],
+                    "ref_doc_ids": sorted({node.ref_doc_id for node in nodes if node.ref_doc_id}),
+                }
+
+            _, ingestion_stats = self.pipeline.run(
+                input_files=[os.path.join(self.data_dir, path) for path in to_index],
+                index=self.index,
+                on_file_parsed=record,
+            )
+
+        self.manifest.save()
+        if self.persist_dir:
+            # 没有文件增删改时索引内容不变，跳过整体写出
+            index_changed = bool(to_index or changes["deleted"])
+            if index_changed or not os.path.exists(os.path.join(self.persist_dir, VECTOR_STORE_FILENAME)):
+                self.index.storage_context.persist(persist_dir=self.persist_dir)
+            bm25_path = os.path.join(self.persist_dir, BM25_FILENAME)
+            if self.pipeline.sparse_index is not None and (index_changed or not os.path.exists(bm25_path)):
+                self.pipeline.sparse_index.persist(bm25_path)
+
+        return {
+            "added": len(changes["added"]),
+            "modified": len(changes["modified"]),
+            "deleted": len(changes["deleted"]),
+            "unchanged": len(changes["unchanged"]),
+            "removed_chunks": removed_chunks,
+            "indexed_chunks": ingestion_stats["chunks"] if ingestion_stats else 0,
+            "errors": ingestion_stats["errors"] if ingestion_stats else [],
+            "elapsed_seconds": round(time.perf_counter() - start, 2),
+        }
+
+
+def print_sync_stats(stats: Dict[str, Any]):
+    """打印格式化的同步统计"""
+    print("=" * 60)
+    print("🔄 增量同步结果")
+    print("=" * 60)
+    print(f"  - 新增文件: {stats['added']}")
+    print(f"  - 修改文件: {stats['modified']}")
+    print(f"  - 删除文件: {stats['deleted']}")
+    print(f"  - 未变文件: {stats['unchanged']}")
+    print(f"  - 删除文本块: {stats['removed_chunks']:,}")
+    print(f"  - 新增文本块: {stats['indexed_chunks']:,}")
+    print(f"  - 耗时: {stats['elapsed_seconds']:.2f} 秒")
+    if stats["errors"]:
+        print(f"\n⚠️  {len(stats['errors'])} 个文件解析失败（下次同步时会重试）:")
+        for error in stats["errors"]:
+            print(f"  - {error['file']}: {error['error']}")
+    print("=" * 60)
@@ -0,0 +1,351 @@
+"""
+向量数据库大小与导入吞吐量分析
+
+estimate_vector_db_size 按固定的字节数和分块长度粗略估算，对中文文本和
+自定义分块器误差较大。这里对语料做随机抽样，在样本上运行真实的分块器并
+调用配置的 Embedding 接口，实测：
+- 文本块数和 token 数
+- 文本、元数据和 docstore 序列化后的字节数
+- 分块（或 PDF 解析 + 分块）耗时与 Embedding 吞吐量
+
+再以每个单元的字符数（或文件字节数）为辅助变量，用比率估计外推到全量
+语料，并给出置信区间和预计导入耗时。
+"""
+
+import json
+import math
+import os
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from llama_index.core import Settings
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
+
+from ingestion import list_pdf_files, parse_and_chunk_pdf
+from vector_store import DTYPE_BYTES, INT8_SCALE_BYTES, ROW_OVERHEAD_BYTES
+
+# 逐单元实测并外推的指标
+_METRICS = ("chunks", "tokens", "text_bytes", "metadata_bytes", "docstore_bytes", "parse_seconds")
+
+
+def _measure_nodes(nodes: Sequence[Any], tokenizer: Callable[[str], List]) -> Dict[str, float]:
+    """统计一组文本块的 token 数和序列化字节数"""
+    result = {"chunks": len(nodes), "tokens": 0, "text_bytes": 0, "metadata_bytes": 0, "docstore_bytes": 0}
+    for node in nodes:
+        result["tokens"] += len(tokenizer(node.get_content(metadata_mode=MetadataMode.EMBED)))
+        result["text_bytes"] += len(node.get_content().encode("utf-8"))
+        result["metadata_bytes"] += len(json.dumps(node.metadata, ensure_ascii=False).encode("utf-8"))
+        result["docstore_bytes"] += len(node.to_json().encode("utf-8"))
+    return result
+
+
+def _ratio_estimate(samples: List[Dict[str, float]], metric: str, total_x: float,
+                    population: int, z: float) -> Dict[str, float]:
+    """
+    比率估计：total = (Σy / Σx) × X，方差按残差 y - r·x 计算并做有限总体校正
+    """
+    n = len(samples)
+    sum_x = sum(s["x"] for s in samples)
+    sum_y = sum(s[metric] for s in samples)
+    ratio = sum_y / sum_x if sum_x else 0.0
+    value = ratio * total_x
+
+    if n < 2 or n >= population:
+        return {"value": value, "low": value, "high": value}
+
+    residual_var = sum((s[metric] - ratio * s["x"]) ** 2 for s in samples) / (n - 1)
+    fpc = 1 - n / population
+    stderr = population * math.sqrt(fpc * residual_var / n)
+    return {"value": value, "low": max(0.0, value - z * stderr), "high": value + z * stderr}
+
+
+def _scale(estimate: Dict[str, float], factor: float) -> Dict[str, float]:
+    return {key: value * factor for key, value in estimate.items()}
+
+
+class CorpusProfiler:
+    """语料抽样分析器"""
+
+    def __init__(
+        self,
+        node_parser: Optional[Any] = None,
+        embed_model: Optional[Any] = None,
+        tokenizer: Optional[Callable[[str], List]] = None,
+        storage_dtype: str = "float32",
+        rescore: bool = False,
+        confidence: float = 0.95,
+        seed: int = 0
+    ):
+        """
+        初始化分析器
+
+        Args:
+            node_parser: 分块器（默认与 VectorStoreIndex 相同的 SentenceSplitter）
+            embed_model: Embedding 模型（默认使用 Settings.embed_model，None 且
+                measure_embedding=False 时不调用接口）
+            tokenizer: 分词器（默认使用 Settings.tokenizer）
+            storage_dtype: 向量存储精度（float32/float16/int8）
+            rescore: 是否在磁盘上保留全精度向量用于重打分
+            confidence: 置信水平
+            seed: 抽样随机种子
+        """
+        if storage_dtype not in DTYPE_BYTES:
+            raise ValueError(f"不支持的存储精度: {storage_dtype}，可选: {list(DTYPE_BYTES)}")
+        self.node_parser = node_parser or SentenceSplitter(chunk_size=1024, chunk_overlap=20)
+        self.embed_model = embed_model
+        self.tokenizer = tokenizer or Settings.tokenizer
+        self.storage_dtype = storage_dtype
+        self.rescore = rescore
+        self.confidence = confidence
+        self.seed = seed
+
+    def _z(self) -> float:
+        return statistics.NormalDist().inv_cdf(0.5 + self.confidence / 2)
+
+    def _measure_embedding(self, nodes: List[Any], max_chunks: int) -> Dict[str, Any]:
+        """对样本文本块实测 Embedding 吞吐量"""
+        embed_model = self.embed_model or Settings.embed_model
+        batch_size = getattr(embed_model, "embed_batch_size", 10)
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes[:max_chunks]]
+
+        seconds_per_chunk, dimension, tokens = [], None, 0
+        start = time.perf_counter()
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            batch_start = time.perf_counter()
+            embeddings = embed_model.get_text_embedding_batch(batch)
+            seconds_per_chunk.append((time.perf_counter() - batch_start) / len(batch))
+            dimension = len(embeddings[0])
+            tokens += sum(len(self.tokenizer(text)) for text in batch)
+        elapsed = time.perf_counter() - start
+
+        mean = statistics.fmean(seconds_per_chunk)
+        half_width = 0.0
+        if len(seconds_per_chunk) > 1:
+            half_width = self._z() * statistics.stdev(seconds_per_chunk) / math.sqrt(len(seconds_per_chunk))
+        return {
+            "dimension": dimension,
+            "chunks": len(texts),
+            "batches": len(seconds_per_chunk),
+            "chunks_per_second": len(texts) / elapsed if elapsed else 0.0,
+            "tokens_per_second": tokens / elapsed if elapsed else 0.0,
+            "seconds_per_chunk": {"value": mean, "low": max(0.0, mean - half_width), "high": mean + half_width},
+        }
+
+    def _summarize(
+        self,
+        samples: List[Dict[str, float]],
+        sampled_nodes: List[Any],
+        population: int,
+        total_x: float,
+        unit: str,
+        embedding_dim: int,
+        measure_embedding: bool,
+        embed_sample_chunks: int,
+        num_workers: int
+    ) -> Dict[str, Any]:
+        z = self._z()
+        mb = 1024 * 1024
+        estimates = {
+            metric: _ratio_estimate(samples, metric, total_x, population, z) for metric in _METRICS
+        }
+
+        embedding = None
+        if measure_embedding and sampled_nodes:
+            embedding = self._measure_embedding(sampled_nodes, embed_sample_chunks)
+            embedding_dim = embedding["dimension"]
+
+        per_vector = embedding_dim * DTYPE_BYTES[self.storage_dtype]
+        if self.storage_dtype == "int8":
+            per_vector += INT8_SCALE_BYTES
+        chunks = estimates["chunks"]
+        vector_mb = _scale(chunks, (per_vector + ROW_OVERHEAD_BYTES) / mb)
+        docstore_mb = _scale(estimates["docstore_bytes"], 1 / mb)
+        total_mb = {key: vector_mb[key] + docstore_mb[key] for key in vector_mb}
+
+        result = {
+            "unit": unit,
+            "sample_units": len(samples),
+            "total_units": population,
+            "confidence": self.confidence,
+            "storage_dtype": self.storage_dtype,
+            "embedding_dimension": embedding_dim,
+            "chunks": chunks,
+            "tokens": estimates["tokens"],
+            "text_mb": _scale(estimates["text_bytes"], 1 / mb),
+            "metadata_mb": _scale(estimates["metadata_bytes"], 1 / mb),
+            "docstore_mb": docstore_mb,
+            "vector_mb": vector_mb,
+            "total_mb": total_mb,
+            "rescore_disk_mb": _scale(chunks, embedding_dim * 4 / mb) if self.rescore else None,
+            "parse_seconds": estimates["parse_seconds"],
+            "embedding": embedding,
+        }
+
+        if embedding is not None:
+            spc = embedding["seconds_per_chunk"]
+            embed_seconds = {key: chunks[key] * spc[key] for key in chunks}
+            parse = estimates["parse_seconds"]
+            result["embed_seconds"] = embed_seconds
+            # 串行：解析后再 Embedding；流水线：多进程解析与 Embedding 重叠
+            result["ingestion_seconds"] = {key: parse[key] + embed_seconds[key] for key in parse}
+            result["pipelined_ingestion_seconds"] = {
+                key: max(parse[key] / num_workers, embed_seconds[key]) for key in parse
+            }
+            result["num_workers"] = num_workers
+        return result
+
+    def profile_documents(
+        self,
+        documents: Sequence[Any],
+        sample_size: int = 50,
+        embedding_dim: int = 1024,
+        measure_embedding: bool = True,
+        embed_sample_chunks: int = 64,
+        num_workers: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        分析已加载的文档（如 SimpleDirectoryReader 返回的逐页文档）
+
+        Args:
+            documents: 文档列表
+            sample_size: 抽样文档数
+            embedding_dim: 向量维度（实测 Embedding 时以实际维度为准）
+            measure_embedding: 是否实测 Embedding 吞吐量
+            embed_sample_chunks: 用于实测 Embedding 的文本块数
+            num_workers: 预计导入时的解析进程数（默认为 CPU 核数）
+
+        Returns:
+            dict: 各指标的 value / low / high
+        """
+        if not documents:
+            return {"error": "没有文档可供分析"}
+
+        rng = random.Random(self.seed)
+        sample = rng.sample(list(documents), min(sample_size, len(documents)))
+        samples, sampled_nodes = [], []
+        for document in sample:
+            start = time.perf_counter()
+            nodes = self.node_parser.get_nodes_from_documents([document])
+            row = _measure_nodes(nodes, self.tokenizer)
+            row["parse_seconds"] = time.perf_counter() - start
+            row["x"] = max(1, len(document.text))
+            samples.append(row)
+            sampled_nodes.extend(nodes)
+        rng.shuffle(sampled_nodes)
+
+        total_x = sum(max(1, len(document.text)) for document in documents)
+        return self._summarize(
+            samples, sampled_nodes, len(documents), total_x, "文档",
+            embedding_dim, measure_embedding, embed_sample_chunks, num_workers or os.cpu_count() or 1
+        )
+
+    def profile_pdf_files(
+        self,
+        input_dir: str,
+        sample_size: int = 20,
+        embedding_dim: int = 1024,
+        measure_embedding: bool = True,
+        embed_sample_chunks: int = 64,
+        num_workers: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        直接分析 PDF 目录，无需先加载全部文档
+
+        只解析抽中的文件，以文件字节数为辅助变量外推，解析耗时包含 PDF 读取。
+        分块参数取自 node_parser 的 chunk_size / chunk_overlap。
+
+        Args:
+            input_dir: PDF 目录
+            sample_size: 抽样文件数
+            其余参数同 profile_documents
+
+        Returns:
+            dict: 各指标的 value / low / high
+        """
+        files = list_pdf_files(input_dir)
+        if not files:
+            return {"error": f"未在 {input_dir} 目录中找到 PDF 文件"}
+
+        chunk_size = getattr(self.node_parser, "chunk_size", 1024)
+        chunk_overlap = getattr(self.node_parser, "chunk_overlap", 20)
+        rng = random.Random(self.seed)
+        sample = rng.sample(files, min(sample_size, len(files)))
+        samples, sampled_nodes = [], []
+        for file_path in sample:
+            start = time.perf_counter()
+            _, _, nodes = parse_and_chunk_pdf(file_path, chunk_size, chunk_overlap)
+            row = _measure_nodes(nodes, self.tokenizer)
+            row["parse_seconds"] = time.perf_counter() - start
+            row["x"] = max(1, os.path.getsize(file_path))
+            samples.append(row)
+            sampled_nodes.extend(nodes)
+        rng.shuffle(sampled_nodes)
+
+        total_x = sum(max(1, os.path.getsize(path)) for path in files)
+        return self._summarize(
+            samples, sampled_nodes, len(files), total_x, "文件",
+            embedding_dim, measure_embedding, embed_sample_chunks, num_workers or os.cpu_count() or 1
+        )
+
+
+def _format_range(estimate: Dict[str, float], fmt: str = "{:,.2f}") -> str:
+    value = fmt.format(estimate["value"])
+    if estimate["low"] == estimate["high"]:
+        return value
+    return f"{value} ({fmt.format(estimate['low'])} ~ {fmt.format(estimate['high'])})"
+
+
+def _format_duration(seconds: float) -> str:
+    if seconds < 120:
+        return f"{seconds:.0f} 秒"
+    if seconds < 7200:
+        return f"{seconds / 60:.1f} 分钟"
+    return f"{seconds / 3600:.1f} 小时"
+
+
+def print_profile(profile: Dict[str, Any]):
+    """打印格式化的分析结果"""
+    if "error" in profile:
+        print(f"❌ {profile['error']}")
+        return
+
+    print("=" * 60)
+    print("📊 向量数据库大小与导入耗时分析（实测 + 外推）")
+    print("=" * 60)
+    print(f"\n📄 抽样: {profile['sample_units']}/{profile['total_units']} 个{profile['unit']}, "
+          f"区间为 {profile['confidence']:.0%} 置信区间")
+    print(f"  - 文本块数: {_format_range(profile['chunks'], '{:,.0f}')}")
+    print(f"  - Token 数: {_format_range(profile['tokens'], '{:,.0f}')}")
+    print(f"  - 向量维度: {profile['embedding_dimension']}")
+
+    print(f"\n💾 存储空间 (存储精度: {profile['storage_dtype']}):")
+    print(f"  - 向量 + 索引开销: {_format_range(profile['vector_mb'])} MB")
+    print(f"  - 文本: {_format_range(profile['text_mb'])} MB")
+    print(f"  - 元数据: {_format_range(profile['metadata_mb'])} MB")
+    print(f"  - docstore（序列化后）: {_format_range(profile['docstore_mb'])} MB")
+    if profile["rescore_disk_mb"]:
+        print(f"  - 重打分向量 (磁盘): {_format_range(profile['rescore_disk_mb'])} MB")
+    print(f"  - 总计: {_format_range(profile['total_mb'])} MB")
+
+    embedding = profile["embedding"]
+    if embedding is not None:
+        print(f"\n⚡ Embedding 实测 ({embedding['chunks']} 个文本块, {embedding['batches']} 批):")
+        print(f"  - 吞吐量: {embedding['chunks_per_second']:.2f} 块/秒, "
+              f"{embedding['tokens_per_second']:,.0f} token/秒")
+
+        print(f"\n⏱️  预计导入耗时:")
+        for key, label in [("parse_seconds", "分块" if profile["unit"] == "文档" else "解析 + 分块"),
+                           ("embed_seconds", "Embedding"),
+                           ("ingestion_seconds", "串行总计")]:
+            estimate = profile[key]
+            print(f"  - {label}: {_format_duration(estimate['value'])} "
+                  f"({_format_duration(estimate['low'])} ~ {_format_duration(estimate['high'])})")
+        estimate = profile["pipelined_ingestion_seconds"]
+        print(f"  - 流水线 ({profile['num_workers']} 进程): {_format_duration(estimate['value'])} "
+              f"({_format_duration(estimate['low'])} ~ {_format_duration(estimate['high'])})")
+
+    print("=" * 60)
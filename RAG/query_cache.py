@@ -0,0 +1,227 @@
+"""
+语义查询缓存
+
+放在 RAG 查询引擎前面的两级缓存：
+1. 归一化后的查询文本完全匹配（不需要任何 API 调用）
+2. 查询向量的余弦相似度超过阈值（只需一次查询 Embedding，省去检索和 LLM 生成）
+
+缓存的回答连同来源片段一起返回；底层索引内容发生变化时整个缓存失效，
+缓存条目数量由 LRU 策略限制。
+"""
+
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from llama_index.core import Settings
+from llama_index.core.base.base_query_engine import BaseQueryEngine
+from llama_index.core.base.response.schema import Response
+from llama_index.core.schema import QueryBundle
+
+# 归一化时去掉的首尾标点
+_TRAILING_PUNCTUATION = "?？!！。.,，;；:：~～ "
+
+
+def normalize_query(query: str) -> str:
+    """
+    归一化查询文本：全角转半角、去首尾标点、合并空白、英文转小写
+
+    Args:
+        query: 原始查询
+
+    Returns:
+        归一化后的查询
+    """
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(_TRAILING_PUNCTUATION)
+
+
+class SemanticQueryCache:
+    """有界 LRU 语义缓存"""
+
+    def __init__(
+        self,
+        embed_model: Optional[Any] = None,
+        similarity_threshold: float = 0.92,
+        max_entries: int = 1024
+    ):
+        """
+        初始化语义缓存
+
+        Args:
+            embed_model: 用于计算查询向量的 Embedding 模型（默认使用 Settings.embed_model）
+            similarity_threshold: 语义命中的最低余弦相似度
+            max_entries: 最大缓存条目数
+        """
+        self.embed_model = embed_model or Settings.embed_model
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+
+        # 归一化查询 -> {"embedding": 向量, "response": Response}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: list = []
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "invalidations": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self._matrix_keys = []
+
+    @staticmethod
+    def _normalize(embedding: Any) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def embed(self, query: str) -> np.ndarray:
+        """计算归一化的查询向量"""
+        return self._normalize(self.embed_model.get_query_embedding(query))
+
+    async def aembed(self, query: str) -> np.ndarray:
+        """异步计算归一化的查询向量"""
+        return self._normalize(await self.embed_model.aget_query_embedding(query))
+
+    def get_exact(self, query: str) -> Optional[Response]:
+        """按归一化文本查找"""
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            return entry["response"]
+
+    def get_semantic(self, embedding: np.ndarray) -> Optional[Response]:
+        """按查询向量相似度查找"""
+        with self._lock:
+            if not self._entries:
+                return None
+            if self._matrix is None:
+                self._matrix_keys = list(self._entries)
+                self._matrix = np.stack([self._entries[k]["embedding"] for k in self._matrix_keys])
+
+            similarities = self._matrix @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                return None
+
+            key = self._matrix_keys[best]
+            self._entries.move_to_end(key)
+            self.stats["semantic_hits"] += 1
+            return self._entries[key]["response"]
+
+    def put(self, query: str, embedding: np.ndarray, response: Response) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = {"embedding": embedding, "response": response}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+
+class CachedQueryEngine(BaseQueryEngine):
+    """
+    带语义缓存的查询引擎
+
+    包装任意 LlamaIndex 查询引擎。缓存未命中时，把已经算好的查询向量放进
+    QueryBundle 传给底层引擎，检索阶段不会重复调用 Embedding 接口。
+    """
+
+    def __init__(
+        self,
+        query_engine: BaseQueryEngine,
+        cache: Optional[SemanticQueryCache] = None,
+        index_version: Optional[Callable[[], Any]] = None,
+        **kwargs: Any
+    ):
+        """
+        初始化带缓存的查询引擎
+
+        Args:
+            query_engine: 底层查询引擎
+            cache: 语义缓存（默认新建）
+            index_version: 返回当前索引版本的函数，版本变化时清空缓存，
+                例如 lambda: vector_store.version
+        """
+        self.query_engine = query_engine
+        self.cache = cache if cache is not None else SemanticQueryCache()
+        self.index_version = index_version
+        self._cached_version = index_version() if index_version else None
+        super().__init__(callback_manager=kwargs.get("callback_manager"))
+
+    def _get_prompt_modules(self) -> Dict[str, Any]:
+        return {"query_engine": self.query_engine}
+
+    def _check_version(self) -> None:
+        if self.index_version is None:
+            return
+        version = self.index_version()
+        if version != self._cached_version:
+            self.cache.clear()
+            self.cache.stats["invalidations"] += 1
+            self._cached_version = version
+
+    @staticmethod
+    def _from_cache(response: Response, hit_type: str) -> Response:
+        metadata = dict(response.metadata or {})
+        metadata["cache"] = hit_type
+        return Response(response=response.response, source_nodes=response.source_nodes, metadata=metadata)
+
+    @staticmethod
+    def _with_embedding(query_bundle: QueryBundle, embedding: np.ndarray) -> QueryBundle:
+        return QueryBundle(
+            query_str=query_bundle.query_str,
+            custom_embedding_strs=query_bundle.custom_embedding_strs,
+            embedding=embedding.tolist(),
+        )
+
+    def _query(self, query_bundle: QueryBundle) -> Response:
+        self._check_version()
+
+        cached = self.cache.get_exact(query_bundle.query_str)
+        if cached is not None:
+            return self._from_cache(cached, "exact")
+
+        embedding = self.cache.embed(query_bundle.query_str)
+        cached = self.cache.get_semantic(embedding)
+        if cached is not None:
+            return self._from_cache(cached, "semantic")
+
+        self.cache.stats["misses"] += 1
+        response = self.query_engine.query(self._with_embedding(query_bundle, embedding))
+        # 流式响应无法缓存
+        if isinstance(response, Response):
+            self.cache.put(query_bundle.query_str, embedding, response)
+        return response
+
+    async def _aquery(self, query_bundle: QueryBundle) -> Response:
+        self._check_version()
+
+        cached = self.cache.get_exact(query_bundle.query_str)
+        if cached is not None:
+            return self._from_cache(cached, "exact")
+
+        embedding = await self.cache.aembed(query_bundle.query_str)
+        cached = self.cache.get_semantic(embedding)
+        if cached is not None:
+            return self._from_cache(cached, "semantic")
+
+        self.cache.stats["misses"] += 1
+        response = await self.query_engine.aquery(self._with_embedding(query_bundle, embedding))
+        if isinstance(response, Response):
+            self.cache.put(query_bundle.query_str, embedding, response)
+        return response
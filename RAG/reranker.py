@@ -0,0 +1,312 @@
+"""
+重排序（Rerank）阶段
+
+先用向量检索取回较大的候选集（如 20 个），再用更精确的打分器重排，只把
+最相关的几个片段交给 LLM 生成回答。重排按批进行并受延迟预算约束：
+预算耗尽或打分器出错时保留已打分的结果，剩余候选按原检索顺序补齐；一个
+批次都没完成时直接退回原检索顺序。
+
+打分器的 score(query, nodes, timeout) 在 timeout 秒内没有打完时可以只返回前
+一部分候选的分数，其余候选视为未打分。
+
+打分器：
+- LexicalScorer: 本地轻量打分，结合向量相似度与查询词覆盖率，无额外依赖
+- CrossEncoderScorer: 本地 Cross-Encoder 模型（需要 sentence-transformers）
+- RerankAPIScorer: OpenAI 兼容风格的 /rerank 接口，按批请求
+"""
+
+import asyncio
+import functools
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+from llama_index.core.base.base_query_engine import BaseQueryEngine
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.base.response.schema import Response
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.response_synthesizers import BaseSynthesizer, get_response_synthesizer
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+from hybrid_retriever import tokenize
+
+
+def _node_texts(nodes: List[NodeWithScore]) -> List[str]:
+    return [node.node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+
+
+class LexicalScorer:
+    """
+    本地轻量打分器
+
+    分数 = dense_weight × 向量相似度 + (1 - dense_weight) × 查询词覆盖率，
+    覆盖率按词项长度加权（二元组比单字更有区分度）。
+    """
+
+    def __init__(self, dense_weight: float = 0.5):
+        self.dense_weight = dense_weight
+
+    def score(self, query: str, nodes: List[NodeWithScore], timeout: Optional[float] = None) -> List[float]:
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        query_terms = set(tokenize(query))
+        total = sum(len(term) for term in query_terms) or 1
+        scores = []
+        for node in nodes:
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            text = node.node.get_content(metadata_mode=MetadataMode.EMBED)
+            terms = set(tokenize(text))
+            coverage = sum(len(term) for term in query_terms if term in terms) / total
+            dense = node.score if node.score is not None else 0.0
+            scores.append(self.dense_weight * dense + (1 - self.dense_weight) * coverage)
+        return scores
+
+
+class CrossEncoderScorer:
+    """本地 Cross-Encoder 打分器（如 BAAI/bge-reranker-base）"""
+
+    def __init__(
+        self,
+        model_name: str = "BAAI/bge-reranker-base",
+        device: Optional[str] = None,
+        chunk_size: int = 4
+    ):
+        """
+        Args:
+            model_name: 模型名称
+            device: 运行设备（如 "cuda"），默认自动选择
+            chunk_size: 每次推理的候选数，超时检查在两次推理之间进行
+        """
+        self.chunk_size = chunk_size
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError:
+            raise ImportError("使用 CrossEncoderScorer 需要安装 sentence-transformers: "
+                              "pip install sentence-transformers")
+        self.model = CrossEncoder(model_name, device=device)
+
+    def score(self, query: str, nodes: List[NodeWithScore], timeout: Optional[float] = None) -> List[float]:
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        pairs = [(query, text) for text in _node_texts(nodes)]
+        scores: List[float] = []
+        for i in range(0, len(pairs), self.chunk_size):
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            scores.extend(float(s) for s in self.model.predict(pairs[i:i + self.chunk_size]))
+        return scores
+
+
+class RerankAPIScorer:
+    """
+    远程重排接口打分器
+
+    请求格式：{"model": ..., "query": ..., "documents": [...]}
+    响应格式：{"results": [{"index": 0, "relevance_score": 0.98}, ...]}
+    """
+
+    def __init__(
+        self,
+        api_base: str = "https://www.xpulink.ai/v1",
+        api_key: Optional[str] = None,
+        model: str = "bge-reranker-v2-m3"
+    ):
+        """
+        初始化重排接口打分器
+
+        Args:
+            api_base: API 基础地址
+            api_key: API 密钥（默认从环境变量 XPU_API_KEY 获取）
+            model: 重排模型名称
+        """
+        self.api_base = api_base.rstrip('/')
+        self.api_key = api_key or os.getenv("XPU_API_KEY")
+        self.model = model
+        self.session = requests.Session()
+
+        if not self.api_key:
+            raise ValueError("需要提供 API Key")
+
+    def score(self, query: str, nodes: List[NodeWithScore], timeout: Optional[float] = None) -> List[float]:
+        response = self.session.post(
+            f"{self.api_base}/rerank",
+            headers={'Authorization': f'Bearer {self.api_key}'},
+            json={"model": self.model, "query": query, "documents": _node_texts(nodes)},
+            timeout=timeout or 30
+        )
+        response.raise_for_status()
+        scores = [0.0] * len(nodes)
+        for item in response.json()["results"]:
+            scores[item["index"]] = item["relevance_score"]
+        return scores
+
+
+class BudgetedReranker(BaseNodePostprocessor):
+    """
+    带延迟预算的重排器
+
+    可作为 node_postprocessors 直接用于 LlamaIndex 查询引擎。
+    """
+
+    scorer: Any = Field(description="打分器，需实现 score(query, nodes, timeout)")
+    top_n: int = Field(default=3, description="重排后保留的片段数")
+    latency_budget_ms: float = Field(default=300.0, description="单次查询的重排延迟预算")
+    batch_size: int = Field(default=16, description="每批打分的候选数")
+
+    _last_stats: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "BudgetedReranker"
+
+    @property
+    def last_stats(self) -> Dict[str, Any]:
+        """最近一次重排的统计：候选数、已打分数、耗时、是否超出预算"""
+        return self._last_stats
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None
+    ) -> List[NodeWithScore]:
+        if query_bundle is None or len(nodes) <= 1:
+            self._last_stats = {"candidates": len(nodes), "scored": 0, "rerank_ms": 0.0,
+                                "over_budget": False, "error": None}
+            return nodes[:self.top_n]
+
+        start = time.perf_counter()
+        deadline = start + self.latency_budget_ms / 1000
+        scored = []
+        over_budget = False
+        error = None
+
+        for i in range(0, len(nodes), self.batch_size):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                over_budget = True
+                break
+            batch = nodes[i:i + self.batch_size]
+            try:
+                scores = self.scorer.score(query_bundle.query_str, batch, timeout=remaining)
+            except requests.exceptions.Timeout:
+                over_budget = True
+                break
+            except Exception as e:
+                # 重排只是优化，打分器出错时退回已打分结果 + 原检索顺序
+                error = f"{type(e).__name__}: {e}"
+                break
+            scored.extend(
+                NodeWithScore(node=node.node, score=score) for node, score in zip(batch, scores)
+            )
+            if len(scores) < len(batch):
+                # 打分器在预算内只完成了一部分
+                over_budget = True
+                break
+
+        if time.perf_counter() > deadline:
+            over_budget = True
+
+        # 已打分的候选按新分数排序，未打分的保持原检索顺序排在后面
+        scored.sort(key=lambda n: n.score if n.score is not None and not math.isnan(n.score)
+                    else float("-inf"), reverse=True)
+        result = (scored + list(nodes[len(scored):]))[:self.top_n]
+
+        self._last_stats = {
+            "candidates": len(nodes),
+            "scored": len(scored),
+            "rerank_ms": round((time.perf_counter() - start) * 1000, 1),
+            "over_budget": over_budget,
+            "error": error,
+        }
+        return result
+
+
+class RerankQueryEngine(BaseQueryEngine):
+    """
+    检索 → 重排 → 生成 的查询引擎
+
+    各阶段耗时记录在 response.metadata["timings"] 中。
+    """
+
+    def __init__(
+        self,
+        retriever: BaseRetriever,
+        reranker: BudgetedReranker,
+        response_synthesizer: Optional[BaseSynthesizer] = None,
+        **kwargs: Any
+    ):
+        """
+        初始化查询引擎
+
+        Args:
+            retriever: 候选检索器（similarity_top_k 设为候选集大小，如 20）
+            reranker: 重排器
+            response_synthesizer: 回答生成器（默认 compact 模式）
+        """
+        self.retriever = retriever
+        self.reranker = reranker
+        self.response_synthesizer = response_synthesizer or get_response_synthesizer(
+            response_mode="compact"
+        )
+        super().__init__(callback_manager=kwargs.get("callback_manager"))
+
+    def _get_prompt_modules(self) -> Dict[str, Any]:
+        return {"response_synthesizer": self.response_synthesizer}
+
+    def _attach_timings(
+        self, response: Response, start: float, retrieved: float, reranked: float, end: float
+    ) -> Response:
+        timings = {
+            "retrieval_ms": round((retrieved - start) * 1000, 1),
+            "rerank_ms": round((reranked - retrieved) * 1000, 1),
+            "synthesis_ms": round((end - reranked) * 1000, 1),
+            "total_ms": round((end - start) * 1000, 1),
+        }
+        for key in ("candidates", "scored", "over_budget", "error"):
+            if key in self.reranker.last_stats:
+                timings[key] = self.reranker.last_stats[key]
+        response.metadata = dict(response.metadata or {})
+        response.metadata["timings"] = timings
+        return response
+
+    def _query(self, query_bundle: QueryBundle) -> Response:
+        start = time.perf_counter()
+        candidates = self.retriever.retrieve(query_bundle)
+        retrieved = time.perf_counter()
+        nodes = self.reranker.postprocess_nodes(candidates, query_bundle=query_bundle)
+        reranked = time.perf_counter()
+        response = self.response_synthesizer.synthesize(query_bundle, nodes)
+        end = time.perf_counter()
+
+        return self._attach_timings(response, start, retrieved, reranked, end)
+
+    async def _aquery(self, query_bundle: QueryBundle) -> Response:
+        start = time.perf_counter()
+        candidates = await self.retriever.aretrieve(query_bundle)
+        retrieved = time.perf_counter()
+        # 打分是同步的（本地模型或阻塞 HTTP 请求），放到线程池中执行，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        nodes = await loop.run_in_executor(
+            None, functools.partial(self.reranker.postprocess_nodes, candidates, query_bundle=query_bundle)
+        )
+        reranked = time.perf_counter()
+        response = await self.response_synthesizer.asynthesize(query_bundle, nodes)
+        end = time.perf_counter()
+
+        return self._attach_timings(response, start, retrieved, reranked, end)
+
+
+def print_timings(timings: Dict[str, Any]):
+    """打印查询各阶段耗时"""
+    total = timings["total_ms"] or 1e-9
+    print("⏱️  查询耗时分解:")
+    for key, label in [("retrieval_ms", "检索"), ("rerank_ms", "重排"), ("synthesis_ms", "生成")]:
+        print(f"  - {label}: {timings[key]:.1f} ms ({timings[key] / total:.0%})")
+    print(f"  - 总计: {timings['total_ms']:.1f} ms")
+    if "candidates" in timings:
+        note = "，超出预算，未打分的候选保持原顺序" if timings["over_budget"] else ""
+        if timings.get("error"):
+            note = f"，打分器出错（{timings['error']}），未打分的候选保持原顺序"
+        print(f"  - 重排: {timings['scored']}/{timings['candidates']} 个候选已打分{note}")
@@ -0,0 +1,158 @@
+"""
+流式 RAG 查询
+
+先检索并立即返回来源片段，再逐个 token 流式输出 LLM 的回答。用户感知到的
+等待时间是检索延迟加首 token 延迟，而不是完整生成一段回答所需的时间。
+
+提供异步生成器 astream_query() 和同步生成器 stream_query() 两种接口，
+事件依次为：
+    {"type": "sources", "nodes": [...], "retrieval_ms": ...}（含重排耗时）
+    {"type": "token", "delta": "..."}（多次）
+    {"type": "done", "response": "...", "stats": {...}}
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncGenerator, Dict, Generator, List, Optional
+
+from llama_index.core import Settings
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.indices.prompt_helper import PromptHelper
+from llama_index.core.prompts import BasePromptTemplate, PromptTemplate
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+# 紧凑的中文问答模板：把所有检索片段塞进一次 LLM 调用
+COMPACT_QA_PROMPT = PromptTemplate(
+    "以下是参考资料：\n"
+    "---------------------\n"
+    "{context_str}\n"
+    "---------------------\n"
+    "请仅根据参考资料回答问题，资料中没有的信息请直接说明。\n"
+    "问题：{query_str}\n"
+    "回答："
+)
+
+
+class StreamingRAGEngine:
+    """
+    流式 RAG 查询引擎
+
+    与 response_mode="compact" 一样只调用一次 LLM：检索到的片段按 LLM 的
+    上下文窗口截断后放进同一个提示词，不做多轮 refine。
+    """
+
+    def __init__(
+        self,
+        retriever: BaseRetriever,
+        llm: Optional[Any] = None,
+        qa_prompt: Optional[BasePromptTemplate] = None,
+        node_postprocessors: Optional[List[Any]] = None
+    ):
+        """
+        初始化流式查询引擎
+
+        Args:
+            retriever: 检索器（如 index.as_retriever() 或 HybridRetriever）
+            llm: 生成回答的 LLM（默认使用 Settings.llm）
+            qa_prompt: 问答提示词模板，需包含 context_str 和 query_str
+            node_postprocessors: 检索后的节点处理器（如 BudgetedReranker）
+        """
+        self.retriever = retriever
+        self.llm = llm or Settings.llm
+        self.qa_prompt = qa_prompt or COMPACT_QA_PROMPT
+        self.node_postprocessors = node_postprocessors or []
+        self.prompt_helper = PromptHelper.from_llm_metadata(self.llm.metadata)
+
+    def build_prompt(self, query: str, nodes: List[NodeWithScore]) -> str:
+        """把检索片段截断到上下文窗口内并填入提示词模板"""
+        texts = [node.node.get_content(metadata_mode=MetadataMode.LLM) for node in nodes]
+        if texts:
+            texts = self.prompt_helper.truncate(self.qa_prompt, texts, llm=self.llm)
+        return self.qa_prompt.format(context_str="\n\n".join(texts), query_str=query)
+
+    def _postprocess(self, query: str, nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        query_bundle = QueryBundle(query)
+        for postprocessor in self.node_postprocessors:
+            nodes = postprocessor.postprocess_nodes(nodes, query_bundle=query_bundle)
+        return nodes
+
+    @staticmethod
+    def _done_event(chunks: List[str], start: float, retrieval_ms: float,
+                    first_token: Optional[float]) -> Dict[str, Any]:
+        total_ms = (time.perf_counter() - start) * 1000
+        return {
+            "type": "done",
+            "response": "".join(chunks),
+            "stats": {
+                "retrieval_ms": round(retrieval_ms, 1),
+                "first_token_ms": round((first_token - start) * 1000, 1) if first_token else None,
+                "total_ms": round(total_ms, 1),
+                "chunks": len(chunks),
+            },
+        }
+
+    async def astream_query(self, query: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        异步流式查询
+
+        Args:
+            query: 查询问题
+
+        Yields:
+            sources / token / done 事件
+        """
+        start = time.perf_counter()
+        candidates = await self.retriever.aretrieve(QueryBundle(query))
+        # 节点处理器（如重排）是同步的，放到线程池中执行，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        nodes = await loop.run_in_executor(None, self._postprocess, query, candidates)
+        retrieval_ms = (time.perf_counter() - start) * 1000
+        yield {"type": "sources", "nodes": nodes, "retrieval_ms": round(retrieval_ms, 1)}
+
+        chunks, first_token = [], None
+        stream = await self.llm.astream_complete(self.build_prompt(query, nodes))
+        async for chunk in stream:
+            if not chunk.delta:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter()
+            chunks.append(chunk.delta)
+            yield {"type": "token", "delta": chunk.delta}
+
+        yield self._done_event(chunks, start, retrieval_ms, first_token)
+
+    def stream_query(self, query: str) -> Generator[Dict[str, Any], None, None]:
+        """
+        同步流式查询（事件与 astream_query 相同）
+
+        Args:
+            query: 查询问题
+
+        Yields:
+            sources / token / done 事件
+        """
+        start = time.perf_counter()
+        nodes = self._postprocess(query, self.retriever.retrieve(QueryBundle(query)))
+        retrieval_ms = (time.perf_counter() - start) * 1000
+        yield {"type": "sources", "nodes": nodes, "retrieval_ms": round(retrieval_ms, 1)}
+
+        chunks, first_token = [], None
+        for chunk in self.llm.stream_complete(self.build_prompt(query, nodes)):
+            if not chunk.delta:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter()
+            chunks.append(chunk.delta)
+            yield {"type": "token", "delta": chunk.delta}
+
+        yield self._done_event(chunks, start, retrieval_ms, first_token)
+
+
+def print_sources(nodes: List[NodeWithScore], preview_chars: int = 80):
+    """打印来源片段的文件名、相似度和内容预览"""
+    print(f"📚 来源片段 ({len(nodes)} 个):")
+    for i, node in enumerate(nodes, 1):
+        file_name = node.node.metadata.get("file_name", "未知文件")
+        preview = node.node.get_content().replace("\n", " ")[:preview_chars]
+        score = f"{node.score:.3f}" if node.score is not None else "-"
+        print(f"  [{i}] {file_name} (相似度 {score}) {preview}...")
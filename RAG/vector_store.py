@@ -0,0 +1,619 @@
+"""
+量化向量存储
+
+为 LlamaIndex 提供一个内存友好的向量存储实现，支持 float32 / float16 / int8
+三种存储精度。int8 采用逐向量对称标量量化，并可选地将全精度向量写入磁盘，
+在查询时仅对候选结果做全精度重打分（rescoring），以极小的召回损失换取
+2-4 倍的内存节省。
+
+删除只把行标记为失效；compact() 把失效行从内存数组和重打分文件中移除。
+失效行超过 compact_threshold 比例时删除后自动压缩，persist() 前也会压缩，
+因此内存和持久化文件的大小只取决于当前有效的节点数。
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+
+# 各存储精度下每个维度占用的字节数
+DTYPE_BYTES = {
+    "float32": 4,
+    "float16": 2,
+    "int8": 1,
+}
+
+# int8 模式下每个向量额外保存一个 float32 缩放系数
+INT8_SCALE_BYTES = 4
+
+# 每行的簿记开销估算（节点 ID、文档 ID、哈希表项、存活标记）
+ROW_OVERHEAD_BYTES = 160
+
+# 查询时分块计算相似度，避免一次性把整个矩阵转换为 float32
+QUERY_BLOCK_ROWS = 8192
+
+
+class QuantizedVectorStore(BasePydanticVectorStore):
+    """
+    支持 float16 / int8 标量量化的向量存储
+
+    向量在写入时做 L2 归一化，查询时以点积作为余弦相似度。
+    文本由 LlamaIndex 的 docstore 保存，本存储只保存向量和节点 ID。
+    """
+
+    stores_text: bool = False
+
+    storage_dtype: str = "float32"
+    rescore: bool = False
+    rescore_multiplier: int = 4
+    rescore_path: Optional[str] = None
+    compact_threshold: float = 0.25
+
+    _dim: Optional[int] = PrivateAttr(default=None)
+    _size: int = PrivateAttr(default=0)
+    _vectors: Optional[np.ndarray] = PrivateAttr(default=None)
+    _scales: Optional[np.ndarray] = PrivateAttr(default=None)
+    _alive: Optional[np.ndarray] = PrivateAttr(default=None)
+    _ids: List[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: List[Optional[str]] = PrivateAttr(default_factory=list)
+    _id_to_row: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _ref_doc_rows: Dict[str, List[int]] = PrivateAttr(default_factory=dict)
+    _owns_rescore_file: bool = PrivateAttr(default=False)
+    _rescore_file: Any = PrivateAttr(default=None)
+    _rescore_mmap: Optional[np.memmap] = PrivateAttr(default=None)
+    _version: int = PrivateAttr(default=0)
+
+    def __init__(
+        self,
+        storage_dtype: str = "float32",
+        rescore: bool = False,
+        rescore_multiplier: int = 4,
+        rescore_path: Optional[str] = None,
+        compact_threshold: float = 0.25,
+        **kwargs: Any,
+    ) -> None:
+        """
+        初始化量化向量存储
+
+        Args:
+            storage_dtype: 内存中的存储精度（float32/float16/int8）
+            rescore: 是否对候选结果做全精度重打分
+            rescore_multiplier: 重打分候选数量为 top_k 的倍数
+            rescore_path: 全精度向量文件路径（不提供则写入临时文件，close() 或对象回收时删除）
+            compact_threshold: 失效行占比超过该值时自动 compact()
+        """
+        if storage_dtype not in DTYPE_BYTES:
+            raise ValueError(f"不支持的存储精度: {storage_dtype}，可选: {list(DTYPE_BYTES)}")
+        owns_rescore_file = rescore and rescore_path is None
+        if owns_rescore_file:
+            fd, rescore_path = tempfile.mkstemp(suffix=".f32", prefix="rescore_")
+            os.close(fd)
+
+        super().__init__(
+            storage_dtype=storage_dtype,
+            rescore=rescore,
+            rescore_multiplier=rescore_multiplier,
+            rescore_path=rescore_path,
+            compact_threshold=compact_threshold,
+            **kwargs,
+        )
+        self._owns_rescore_file = owns_rescore_file
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "QuantizedVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    @property
+    def version(self) -> int:
+        """内容版本号，每次写入或删除后递增，供查询缓存判断索引是否变化"""
+        return self._version
+
+    @property
+    def node_count(self) -> int:
+        """有效（未删除）的节点数量"""
+        return len(self._id_to_row)
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def _ensure_capacity(self, extra: int) -> None:
+        """按倍增策略扩容底层数组"""
+        needed = self._size + extra
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if needed <= capacity:
+            return
+
+        new_capacity = max(needed, capacity * 2, 1024)
+        vectors = np.zeros((new_capacity, self._dim), dtype=self.storage_dtype)
+        scales = np.ones(new_capacity, dtype=np.float32)
+        alive = np.zeros(new_capacity, dtype=bool)
+        if self._vectors is not None:
+            vectors[:self._size] = self._vectors[:self._size]
+            scales[:self._size] = self._scales[:self._size]
+            alive[:self._size] = self._alive[:self._size]
+        self._vectors, self._scales, self._alive = vectors, scales, alive
+
+    def _quantize(self, matrix: np.ndarray):
+        """将归一化后的 float32 矩阵转换为存储精度，返回 (数据, 缩放系数)"""
+        if self.storage_dtype == "int8":
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+            return quantized, scales.astype(np.float32)
+        return matrix.astype(self.storage_dtype), np.ones(len(matrix), dtype=np.float32)
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        """添加节点向量"""
+        if not nodes:
+            return []
+
+        matrix = np.asarray([node.get_embedding() for node in nodes], dtype=np.float32)
+        if self._dim is None:
+            self._dim = matrix.shape[1]
+        elif matrix.shape[1] != self._dim:
+            raise ValueError(f"向量维度不一致: 期望 {self._dim}，实际 {matrix.shape[1]}")
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+
+        # 覆盖写入的节点先删除旧行
+        for node in nodes:
+            if node.node_id in self._id_to_row:
+                self._delete_row(self._id_to_row.pop(node.node_id))
+
+        self._ensure_capacity(len(nodes))
+        start, end = self._size, self._size + len(nodes)
+        self._vectors[start:end], self._scales[start:end] = self._quantize(matrix)
+        self._alive[start:end] = True
+
+        for offset, node in enumerate(nodes):
+            self._ids.append(node.node_id)
+            self._ref_doc_ids.append(node.ref_doc_id)
+            self._id_to_row[node.node_id] = start + offset
+            if node.ref_doc_id is not None:
+                self._ref_doc_rows.setdefault(node.ref_doc_id, []).append(start + offset)
+        self._size = end
+
+        if self.rescore:
+            self._append_full_precision(matrix)
+
+        self._version += 1
+        return [node.node_id for node in nodes]
+
+    def _append_full_precision(self, matrix: np.ndarray) -> None:
+        """追加全精度向量到磁盘文件，行号与内存中的行一一对应"""
+        if self._rescore_file is None:
+            self._rescore_file = open(self.rescore_path, "ab")
+        self._rescore_file.write(matrix.astype("<f4").tobytes())
+        self._rescore_file.flush()
+        self._rescore_mmap = None
+
+    # ------------------------------------------------------------------
+    # 删除
+    # ------------------------------------------------------------------
+
+    def _delete_row(self, row: int) -> None:
+        self._alive[row] = False
+        self._version += 1
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        """删除属于某个文档的全部节点"""
+        for row in self._ref_doc_rows.pop(ref_doc_id, []):
+            if self._alive[row]:
+                self._delete_row(row)
+                self._id_to_row.pop(self._ids[row], None)
+        self._maybe_compact()
+
+    def delete_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[Any] = None,
+        **delete_kwargs: Any,
+    ) -> None:
+        """按节点 ID 删除"""
+        if filters is not None:
+            raise NotImplementedError("QuantizedVectorStore 暂不支持元数据过滤")
+        for node_id in node_ids or []:
+            row = self._id_to_row.pop(node_id, None)
+            if row is not None:
+                self._delete_row(row)
+        self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        dead = self._size - len(self._id_to_row)
+        if dead and dead > self.compact_threshold * self._size:
+            self.compact()
+
+    def compact(self) -> int:
+        """
+        移除已删除的行，重写内存数组和重打分文件
+
+        Returns:
+            移除的行数
+        """
+        removed = self._size - len(self._id_to_row)
+        if removed == 0:
+            return 0
+
+        keep = np.flatnonzero(self._alive[:self._size])
+        if self.rescore:
+            self._rewrite_rescore_file(keep)
+        if len(keep):
+            self._vectors = self._vectors[keep]
+            self._scales = self._scales[keep]
+            self._alive = np.ones(len(keep), dtype=bool)
+        else:
+            self._vectors = self._scales = self._alive = None
+        self._ids = [self._ids[row] for row in keep]
+        self._ref_doc_ids = [self._ref_doc_ids[row] for row in keep]
+        self._size = len(keep)
+        self._rebuild_maps()
+        self._version += 1
+        return removed
+
+    def _rewrite_rescore_file(self, keep: np.ndarray) -> None:
+        """只保留 keep 中的行，先写临时文件再替换，中途失败时原文件不受影响"""
+        if self._rescore_file is not None:
+            self._rescore_file.close()
+            self._rescore_file = None
+        self._rescore_mmap = None
+
+        tmp_path = self.rescore_path + ".tmp"
+        source = np.memmap(self.rescore_path, dtype="<f4", mode="r", shape=(self._size, self._dim))
+        with open(tmp_path, "wb") as f:
+            for start in range(0, len(keep), QUERY_BLOCK_ROWS):
+                f.write(np.asarray(source[keep[start:start + QUERY_BLOCK_ROWS]]).tobytes())
+        del source
+        os.replace(tmp_path, self.rescore_path)
+
+    def _rebuild_maps(self) -> None:
+        """根据 _ids / _ref_doc_ids / _alive 重建节点 ID 和文档 ID 到行号的映射"""
+        self._id_to_row, self._ref_doc_rows = {}, {}
+        for row, (node_id, ref_doc_id) in enumerate(zip(self._ids, self._ref_doc_ids)):
+            if not self._alive[row]:
+                continue
+            self._id_to_row[node_id] = row
+            if ref_doc_id is not None:
+                self._ref_doc_rows.setdefault(ref_doc_id, []).append(row)
+
+    def close(self) -> None:
+        """关闭重打分文件；文件是构造时创建的临时文件时一并删除"""
+        if self._rescore_file is not None:
+            self._rescore_file.close()
+            self._rescore_file = None
+        self._rescore_mmap = None
+        if self._owns_rescore_file and self.rescore_path and os.path.exists(self.rescore_path):
+            os.remove(self.rescore_path)
+            self._owns_rescore_file = False
+
+    def __del__(self) -> None:
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def clear(self) -> None:
+        """清空所有向量"""
+        self._dim = None
+        self._size = 0
+        self._vectors = self._scales = self._alive = None
+        self._ids, self._ref_doc_ids, self._id_to_row = [], [], {}
+        self._ref_doc_rows = {}
+        self._version += 1
+        if self._rescore_file is not None:
+            self._rescore_file.close()
+            self._rescore_file = None
+        self._rescore_mmap = None
+        if self.rescore_path and os.path.exists(self.rescore_path):
+            open(self.rescore_path, "wb").close()
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def _approximate_scores(self, query_vec: np.ndarray) -> np.ndarray:
+        """分块计算量化向量与查询向量的相似度"""
+        scores = np.empty(self._size, dtype=np.float32)
+        for start in range(0, self._size, QUERY_BLOCK_ROWS):
+            end = min(start + QUERY_BLOCK_ROWS, self._size)
+            block = self._vectors[start:end].astype(np.float32)
+            scores[start:end] = block @ query_vec
+        if self.storage_dtype == "int8":
+            scores *= self._scales[:self._size]
+        scores[~self._alive[:self._size]] = -np.inf
+        return scores
+
+    def _full_precision_rows(self, rows: np.ndarray):
+        """从磁盘读取候选行的全精度向量，返回 (向量, 排序后的行号)"""
+        rows = np.sort(rows)
+        if self._rescore_mmap is None or self._rescore_mmap.shape[0] != self._size:
+            self._rescore_mmap = np.memmap(
+                self.rescore_path, dtype="<f4", mode="r", shape=(self._size, self._dim)
+            )
+        return np.asarray(self._rescore_mmap[rows]), rows
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """查询最相似的节点"""
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise NotImplementedError(f"QuantizedVectorStore 不支持查询模式: {query.mode}")
+        if query.filters is not None:
+            raise NotImplementedError("QuantizedVectorStore 暂不支持元数据过滤")
+        if self._size == 0 or query.query_embedding is None:
+            return VectorStoreQueryResult(nodes=None, similarities=[], ids=[])
+
+        query_vec = np.asarray(query.query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query_vec)
+        if norm > 0:
+            query_vec = query_vec / norm
+
+        scores = self._approximate_scores(query_vec)
+
+        if query.node_ids is not None or query.doc_ids is not None:
+            allowed = np.zeros(self._size, dtype=bool)
+            node_ids = set(query.node_ids or [])
+            doc_ids = set(query.doc_ids or [])
+            for row in range(self._size):
+                allowed[row] = self._ids[row] in node_ids or self._ref_doc_ids[row] in doc_ids
+            scores[~allowed] = -np.inf
+
+        top_k = min(query.similarity_top_k, self.node_count)
+        if top_k <= 0:
+            return VectorStoreQueryResult(nodes=None, similarities=[], ids=[])
+
+        n_candidates = top_k
+        if self.rescore and self.storage_dtype != "float32":
+            n_candidates = min(top_k * self.rescore_multiplier, self.node_count)
+
+        candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        candidates = candidates[np.isfinite(scores[candidates])]
+
+        if n_candidates > top_k:
+            full, candidates = self._full_precision_rows(candidates)
+            candidate_scores = full @ query_vec
+        else:
+            candidate_scores = scores[candidates]
+
+        order = np.argsort(-candidate_scores)[:top_k]
+        rows = candidates[order]
+
+        return VectorStoreQueryResult(
+            nodes=None,
+            similarities=[float(s) for s in candidate_scores[order]],
+            ids=[self._ids[row] for row in rows],
+        )
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    def memory_usage_bytes(self) -> Dict[str, int]:
+        """返回当前内存占用明细（字节）"""
+        rows = self._size
+        vector_bytes = 0 if self._vectors is None else int(self._vectors[:rows].nbytes)
+        scale_bytes = rows * INT8_SCALE_BYTES if self.storage_dtype == "int8" else 0
+        return {
+            "vectors": vector_bytes,
+            "scales": scale_bytes,
+            "bookkeeping": rows * ROW_OVERHEAD_BYTES,
+            "rescore_disk": rows * (self._dim or 0) * 4 if self.rescore else 0,
+        }
+
+    def persist(self, persist_path: str, fs: Optional[Any] = None) -> None:
+        """
+        持久化到磁盘
+
+        写入前先 compact()，不保存已删除的行。重打分向量在临时文件中时移动到
+        持久化位置并改为直接追加到该文件，之后再次持久化不需要复制。
+
+        Args:
+            persist_path: 元数据 JSON 路径，向量保存在同名的 .npz / .f32 文件中
+        """
+        dirpath = os.path.dirname(persist_path)
+        if dirpath:
+            os.makedirs(dirpath, exist_ok=True)
+        self.compact()
+
+        rows = self._size
+        np.savez(
+            persist_path + ".npz",
+            vectors=self._vectors[:rows] if rows else np.zeros((0, 0), dtype=self.storage_dtype),
+            scales=self._scales[:rows] if rows else np.zeros(0, dtype=np.float32),
+            alive=self._alive[:rows] if rows else np.zeros(0, dtype=bool),
+        )
+
+        rescore_copy = None
+        if self.rescore:
+            rescore_copy = persist_path + ".f32"
+            if os.path.abspath(rescore_copy) != os.path.abspath(self.rescore_path):
+                if self._rescore_file is not None:
+                    self._rescore_file.close()
+                    self._rescore_file = None
+                self._rescore_mmap = None
+                if self._owns_rescore_file:
+                    shutil.move(self.rescore_path, rescore_copy)
+                    self.rescore_path = rescore_copy
+                    self._owns_rescore_file = False
+                else:
+                    shutil.copyfile(self.rescore_path, rescore_copy)
+
+        with open(persist_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "storage_dtype": self.storage_dtype,
+                "rescore": self.rescore,
+                "rescore_multiplier": self.rescore_multiplier,
+                "rescore_path": rescore_copy,
+                "compact_threshold": self.compact_threshold,
+                "dim": self._dim,
+                "ids": self._ids,
+                "ref_doc_ids": self._ref_doc_ids,
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str, fs: Optional[Any] = None) -> "QuantizedVectorStore":
+        """从 persist() 保存的文件加载"""
+        with open(persist_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        store = cls(
+            storage_dtype=meta["storage_dtype"],
+            rescore=meta["rescore"],
+            rescore_multiplier=meta["rescore_multiplier"],
+            rescore_path=meta["rescore_path"],
+            compact_threshold=meta.get("compact_threshold", 0.25),
+        )
+        arrays = np.load(persist_path + ".npz")
+        store._dim = meta["dim"]
+        store._size = len(meta["ids"])
+        store._ids = meta["ids"]
+        store._ref_doc_ids = meta["ref_doc_ids"]
+        if store._size:
+            store._vectors = arrays["vectors"]
+            store._scales = arrays["scales"]
+            store._alive = arrays["alive"]
+            store._rebuild_maps()
+        return store
+
+
+def estimate_vector_db_size(documents, embedding_dim=1024, storage_dtype="float32",
+                            rescore=False, chunk_size=1024, chunk_overlap=20):
+    """
+    预测向量数据库的存储大小
+
+    按固定的每字符字节数和分块长度粗略估算，不调用分块器和 Embedding 接口。
+    需要准确的分块数、元数据大小和导入耗时时使用 profiler.CorpusProfiler。
+
+    Args:
+        documents: 文档列表
+        embedding_dim: 向量维度（BGE-M3 默认为 1024）
+        storage_dtype: 向量存储精度（float32/float16/int8）
+        rescore: 是否在磁盘上保留全精度向量用于重打分
+        chunk_size: 分块大小（LlamaIndex 默认 1024）
+        chunk_overlap: 分块重叠（LlamaIndex 默认 20）
+
+    Returns:
+        dict: 包含各项大小统计的字典
+    """
+    if not documents:
+        return {
+            'error': '没有文档可供分析',
+            'total_size_mb': 0
+        }
+    if storage_dtype not in DTYPE_BYTES:
+        raise ValueError(f"不支持的存储精度: {storage_dtype}，可选: {list(DTYPE_BYTES)}")
+
+    mb = 1024 * 1024
+
+    # 估算文档被分块的数量
+    effective_chunk_size = chunk_size - chunk_overlap
+    total_chars = sum(len(doc.text) for doc in documents)
+    estimated_chunks = max(1, total_chars // effective_chunk_size)
+
+    def vector_bytes(dtype):
+        per_vector = embedding_dim * DTYPE_BYTES[dtype]
+        if dtype == "int8":
+            per_vector += INT8_SCALE_BYTES
+        return estimated_chunks * per_vector
+
+    # 各存储精度的向量内存占用，便于对比
+    storage_modes = {
+        dtype: round(vector_bytes(dtype) / mb, 2) for dtype in DTYPE_BYTES
+    }
+    vector_size_mb = vector_bytes(storage_dtype) / mb
+
+    # 计算文本存储大小（UTF-8 编码，约每字符 2-3 字节，这里取 2.5）
+    text_size_mb = total_chars * 2.5 / mb
+
+    # 计算元数据存储大小（估算每个 chunk 约 500 字节元数据）
+    metadata_size_mb = estimated_chunks * 500 / mb
+
+    # 扁平向量存储没有图索引，开销仅为每行的簿记信息
+    index_overhead_mb = estimated_chunks * ROW_OVERHEAD_BYTES / mb
+
+    # 重打分用的全精度向量保存在磁盘上，不计入内存
+    rescore_disk_mb = estimated_chunks * embedding_dim * 4 / mb if rescore else 0.0
+
+    total_size_mb = vector_size_mb + text_size_mb + metadata_size_mb + index_overhead_mb
+
+    return {
+        'total_documents': len(documents),
+        'total_characters': total_chars,
+        'estimated_chunks': estimated_chunks,
+        'embedding_dimension': embedding_dim,
+        'storage_dtype': storage_dtype,
+        'storage_modes_mb': storage_modes,
+        'vector_storage_mb': round(vector_size_mb, 2),
+        'text_storage_mb': round(text_size_mb, 2),
+        'metadata_storage_mb': round(metadata_size_mb, 2),
+        'index_overhead_mb': round(index_overhead_mb, 2),
+        'rescore_disk_mb': round(rescore_disk_mb, 2),
+        'total_size_mb': round(total_size_mb, 2),
+        'total_size_gb': round(total_size_mb / 1024, 3)
+    }
+
+
+def print_size_estimation(estimation):
+    """打印格式化的大小预测结果"""
+    if 'error' in estimation:
+        print(f"❌ {estimation['error']}")
+        return
+
+    print("=" * 60)
+    print("📊 向量数据库大小预测")
+    print("=" * 60)
+    print(f"\n📄 文档统计:")
+    print(f"  - 文档数量: {estimation['total_documents']}")
+    print(f"  - 总字符数: {estimation['total_characters']:,}")
+    print(f"  - 预计分块数: {estimation['estimated_chunks']:,}")
+    print(f"  - 向量维度: {estimation['embedding_dimension']}")
+
+    print(f"\n💾 存储空间预测 (存储精度: {estimation['storage_dtype']}):")
+    print(f"  - 向量存储: {estimation['vector_storage_mb']:,.2f} MB")
+    print(f"  - 文本存储: {estimation['text_storage_mb']:,.2f} MB")
+    print(f"  - 元数据存储: {estimation['metadata_storage_mb']:,.2f} MB")
+    print(f"  - 索引开销: {estimation['index_overhead_mb']:,.2f} MB")
+    if estimation['rescore_disk_mb']:
+        print(f"  - 重打分向量 (磁盘): {estimation['rescore_disk_mb']:,.2f} MB")
+
+    print(f"\n🔢 不同存储精度的向量内存对比:")
+    for dtype, size_mb in estimation['storage_modes_mb'].items():
+        marker = " ← 当前" if dtype == estimation['storage_dtype'] else ""
+        print(f"  - {dtype:<8}: {size_mb:,.2f} MB{marker}")
+
+    print(f"\n📦 总计:")
+    print(f"  - 总大小: {estimation['total_size_mb']:,.2f} MB ({estimation['total_size_gb']:.3f} GB)")
+
+    # 添加建议
+    total_mb = estimation['total_size_mb']
+    print(f"\n💡 建议:")
+    if total_mb < 100:
+        print("  ✅ 内存占用较小，可以轻松在内存中处理")
+    elif total_mb < 1000:
+        print("  ⚠️  内存占用适中，确保有足够的可用内存")
+        if estimation['storage_dtype'] == "float32":
+            print("     - 可使用 float16 / int8 量化存储降低 2-4 倍向量内存")
+    else:
+        print("  ⚠️  内存占用较大，建议考虑:")
+        if estimation['storage_dtype'] != "int8":
+            print("     - 使用 int8 量化存储并开启重打分")
+        print("     - 使用持久化向量数据库（如 Chroma、Weaviate）")
+        print("     - 分批处理文档")
+        print("     - 使用更强大的服务器")
+
+    print("=" * 60)
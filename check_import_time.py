@@ -0,0 +1,177 @@
+"""
+冷启动耗时检查
+
+短生命周期的命令行和 serverless 调用每次都要付出导入和初始化的开销。本脚本
+在子进程中测量：
+- 各入口模块的导入耗时（python -X importtime 的累计值）
+- 一次 quick_diagnosis 从进程启动到返回的耗时（使用本地模拟服务，不依赖网络）
+并与预算比较，超出预算时退出码为 1，可以放在 CI 或发布前的检查中。
+
+用法:
+    python check_import_time.py                         # 检查并打印报告
+    python check_import_time.py --runs 5 --output import_time.json
+"""
+
+import argparse
+import compileall
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 模块 -> (所在目录, 导入耗时预算毫秒)
+IMPORT_BUDGETS_MS = {
+    "device_agent": ("DeviceAgent", 30),
+    "lora_finetune": ("LoRA", 30),
+}
+
+# 一次 quick_diagnosis 从子进程启动到返回的预算（毫秒，含解释器启动）
+COLD_START_BUDGET_MS = 400
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+_COLD_START_CODE = """
+import json, sys, time
+start = time.perf_counter()
+from device_agent import quick_diagnosis
+imported = time.perf_counter()
+quick_diagnosis({"device_id": "PUMP-001", "temperature": 85.5}, api_key="test", base_url=sys.argv[1])
+done = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "diagnosis_ms": (done - imported) * 1000}))
+"""
+
+
+def measure_import(module: str, directory: str) -> Dict[str, Any]:
+    """
+    用 -X importtime 测量模块的导入耗时
+
+    Args:
+        module: 模块名
+        directory: 模块所在目录（相对仓库根目录）
+
+    Returns:
+        {"cumulative_ms", "self_ms", "top": 耗时最多的直接依赖}
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.join(ROOT, directory), capture_output=True, text=True, check=True
+    )
+    children = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        if name == module and not indent:
+            ranked = sorted(children, key=lambda c: -c["cumulative_ms"])
+            return {"cumulative_ms": int(cumulative_us) / 1000, "self_ms": int(self_us) / 1000, "top": ranked[:5]}
+        if len(indent) == 2:
+            children.append({"module": name, "cumulative_ms": int(cumulative_us) / 1000})
+        elif not indent:
+            # 与被测模块无关的顶层导入（如 site），之前收集的子模块不属于被测模块
+            children = []
+    raise RuntimeError(f"未在 -X importtime 输出中找到 {module}")
+
+
+def measure_cold_start(base_url: str) -> Dict[str, float]:
+    """
+    在新进程中导入 device_agent 并完成一次 quick_diagnosis
+
+    Returns:
+        {"total_ms": 子进程总耗时, "import_ms": 导入耗时, "diagnosis_ms": 首次诊断耗时}
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", _COLD_START_CODE, base_url],
+        cwd=os.path.join(ROOT, "DeviceAgent"), capture_output=True, text=True, check=True
+    )
+    total_ms = (time.perf_counter() - start) * 1000
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return {"total_ms": total_ms, **timings}
+
+
+def run_checks(runs: int = 3, cold_start: bool = True) -> Dict[str, Any]:
+    """
+    测量各项耗时（取 runs 次的中位数）并与预算比较
+
+    Returns:
+        报告字典，passed 为是否全部在预算内
+    """
+    # 测量的是部署后的常态（已有 .pyc），先编译相关目录
+    compileall.compile_dir(ROOT, maxlevels=0, quiet=1)
+    for directory, _ in IMPORT_BUDGETS_MS.values():
+        compileall.compile_dir(os.path.join(ROOT, directory), quiet=1)
+
+    report: Dict[str, Any] = {"imports": {}, "cold_start": None, "passed": True}
+    for module, (directory, budget_ms) in IMPORT_BUDGETS_MS.items():
+        samples = [measure_import(module, directory) for _ in range(runs)]
+        cumulative = statistics.median(s["cumulative_ms"] for s in samples)
+        passed = cumulative <= budget_ms
+        report["imports"][module] = {
+            "cumulative_ms": round(cumulative, 1),
+            "budget_ms": budget_ms,
+            "passed": passed,
+            "top": samples[-1]["top"],
+        }
+        report["passed"] &= passed
+
+    if cold_start:
+        sys.path.insert(0, ROOT)
+        from mock_server import start_mock_server
+
+        server, base_url = start_mock_server(tokens_per_second=100000)
+        try:
+            samples = [measure_cold_start(base_url) for _ in range(runs)]
+        finally:
+            server.shutdown()
+        cold = {key: round(statistics.median(s[key] for s in samples), 1) for key in samples[0]}
+        cold["budget_ms"] = COLD_START_BUDGET_MS
+        cold["passed"] = cold["total_ms"] <= COLD_START_BUDGET_MS
+        report["cold_start"] = cold
+        report["passed"] &= cold["passed"]
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    """打印检查报告"""
+    print("=" * 60)
+    print("⏱️  冷启动耗时检查")
+    print("=" * 60)
+    for module, result in report["imports"].items():
+        mark = "✅" if result["passed"] else "❌"
+        print(f"{mark} import {module}: {result['cumulative_ms']:.1f} ms (预算 {result['budget_ms']} ms)")
+        for child in result["top"][:3]:
+            print(f"     - {child['module']}: {child['cumulative_ms']:.1f} ms")
+    cold = report["cold_start"]
+    if cold is not None:
+        mark = "✅" if cold["passed"] else "❌"
+        print(f"{mark} quick_diagnosis 冷启动: {cold['total_ms']:.0f} ms (预算 {cold['budget_ms']} ms)")
+        print(f"     - 导入 {cold['import_ms']:.1f} ms, 首次诊断 {cold['diagnosis_ms']:.1f} ms, "
+              f"其余为解释器启动")
+    print("=" * 60)
+    print("✅ 全部在预算内" if report["passed"] else "❌ 超出预算")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="检查模块导入和 quick_diagnosis 冷启动耗时")
+    parser.add_argument("--runs", type=int, default=3, help="每项测量次数，取中位数")
+    parser.add_argument("--skip-cold-start", action="store_true", help="只检查导入耗时")
+    parser.add_argument("--output", help="把报告写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    report = run_checks(runs=args.runs, cold_start=not args.skip_cold_start)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+按需导入
+
+requests 等依赖的导入需要上百毫秒，而短生命周期的命令行和 serverless 调用
+往往在真正发请求前就结束了（参数错误、只做本地估算等）。LazyModule 在第一次
+访问属性时才导入模块，原有的 requests.post、requests.exceptions.RequestException
+等写法不需要改动。
+
+使用示例:
+    requests = LazyModule("requests")
+    response = requests.post(url, json=payload)  # 此时才导入 requests
+"""
+
+import importlib
+from types import ModuleType
+from typing import Any, Optional
+
+
+class LazyModule:
+    """第一次访问属性时才导入的模块代理"""
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name: 模块名，如 "requests"
+        """
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "已导入" if self._module is not None else "未导入"
+        return f"<LazyModule {self._name} ({state})>"
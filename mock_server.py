@@ -0,0 +1,568 @@
+"""
+XPULink API 本地模拟服务
+
+用于在没有网络或 API Key 的情况下测试本仓库的示例代码，只依赖标准库。
+
+已模拟的接口（均在 /v1 下）：
+- POST /files                        单请求上传文件（multipart/form-data）
+- GET  /files/{id}                   查询文件信息
+- POST /uploads                      创建分片上传会话
+- POST /uploads/{id}/parts           上传一个分片（multipart/form-data，字段 data）
+- POST /uploads/{id}/complete        按 part_ids 顺序合并分片，可校验整体 md5
+- POST /fine_tuning/jobs             创建微调任务（queued → running → succeeded）
+- GET  /fine_tuning/jobs             列出微调任务
+- GET  /fine_tuning/jobs/{id}        查询任务状态
+- GET  /fine_tuning/jobs/{id}/events 任务事件列表；?stream=true 时以 SSE 推送状态变化
+- POST /chat/completions             返回确定性的模拟回答和 usage，生成耗时按 --tokens-per-second 计算；
+                                     stream=true 时以 SSE 逐 token 推送
+
+微调任务的排队和运行时长由 --job-queue-seconds / --job-run-seconds 控制，
+suffix 中包含 "fail" 的任务会以 failed 结束。--chat-error-rate 让部分对话请求
+返回 429 或 500，用于测试重试和错误统计；--chat-slots 限制同时生成的请求数，
+超出的请求排队等待，用于压测时模拟服务端容量。
+
+使用方式：
+    python mock_server.py --port 8000
+    # 然后把 base_url 设为 http://127.0.0.1:8000/v1
+
+也可以在代码中启动：
+    server, base_url = start_mock_server()
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}-{uuid.uuid4().hex[:24]}"
+
+
+def parse_multipart(body: bytes, content_type: str) -> Dict[str, Dict[str, Any]]:
+    """
+    解析 multipart/form-data 请求体
+
+    Returns:
+        字段名 -> {"filename": 文件名或 None, "data": 字节}
+    """
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not match:
+        raise ValueError("缺少 multipart boundary")
+    delimiter = b"--" + match.group(1).encode("latin-1")
+
+    fields = {}
+    for part in body.split(delimiter)[1:]:
+        if part.startswith(b"--"):
+            break
+        header_blob, _, data = part.partition(b"\r\n\r\n")
+        headers = header_blob.decode("utf-8", errors="replace")
+        name = re.search(r'name="([^"]*)"', headers)
+        filename = re.search(r'filename="([^"]*)"', headers)
+        if name:
+            # 去掉分隔符前的 CRLF
+            fields[name.group(1)] = {
+                "filename": filename.group(1) if filename else None,
+                "data": data[:-2] if data.endswith(b"\r\n") else data,
+            }
+    return fields
+
+
+class MockState:
+    """模拟服务的内存状态"""
+
+    def __init__(
+        self,
+        part_failure_rate: float = 0.0,
+        latency: float = 0.0,
+        job_queue_seconds: float = 1.0,
+        job_run_seconds: float = 5.0,
+        tokens_per_second: float = 200.0,
+        chat_error_rate: float = 0.0,
+        chat_slots: int = 0
+    ):
+        """
+        Args:
+            part_failure_rate: 分片上传随机返回 500 的概率（用于测试重试和断点续传）
+            latency: 每个请求额外增加的延迟（秒）
+            job_queue_seconds: 微调任务的排队时长
+            job_run_seconds: 微调任务的运行时长
+            tokens_per_second: 模拟的生成速度
+            chat_error_rate: 对话请求返回 429/500 的比例
+            chat_slots: 同时生成的最大请求数（0 表示不限制）
+        """
+        self.part_failure_rate = part_failure_rate
+        self.latency = latency
+        self.job_queue_seconds = job_queue_seconds
+        self.job_run_seconds = job_run_seconds
+        self.tokens_per_second = tokens_per_second
+        self.chat_error_rate = chat_error_rate
+        self.chat_slots = threading.BoundedSemaphore(chat_slots) if chat_slots else None
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.uploads: Dict[str, Dict[str, Any]] = {}
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self._request_count = 0
+        self._chat_count = 0
+
+    def should_fail(self) -> bool:
+        if not self.part_failure_rate:
+            return False
+        with self.lock:
+            self._request_count += 1
+            # 确定性地按比例失败，便于复现
+            return (self._request_count * self.part_failure_rate) % 1 < self.part_failure_rate
+
+    def chat_error(self) -> Optional[int]:
+        """按 chat_error_rate 确定性地返回错误状态码（429 和 500 交替），不出错时返回 None"""
+        if not self.chat_error_rate:
+            return None
+        with self.lock:
+            self._chat_count += 1
+            count = self._chat_count
+        if (count * self.chat_error_rate) % 1 < self.chat_error_rate:
+            return 429 if count % 2 else 500
+        return None
+
+    def add_file(self, filename: str, purpose: str, data: bytes) -> Dict[str, Any]:
+        file_object = {
+            "id": _new_id("file"),
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self.lock:
+            self.files[file_object["id"]] = {"object": file_object, "data": data}
+        return file_object
+
+    def job_snapshot(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """按当前时间计算任务状态，返回任务对象和已发生的事件"""
+        entry = self.jobs.get(job_id)
+        if entry is None:
+            return None
+        job = dict(entry["job"])
+        now = time.time()
+        started_at = job["created_at"] + entry["queue_seconds"]
+        finished_at = started_at + entry["run_seconds"]
+
+        events = [{"created_at": job["created_at"], "status": "queued", "message": "任务已创建，排队中"}]
+        if now >= started_at:
+            job["status"] = "running"
+            events.append({"created_at": started_at, "status": "running", "message": "开始训练"})
+        if now >= finished_at:
+            job["status"] = entry["final_status"]
+            job["finished_at"] = finished_at
+            if entry["final_status"] == "succeeded":
+                job["fine_tuned_model"] = f"ft:{job['model']}:{job.get('suffix') or 'custom'}:{job['id'][-8:]}"
+                events.append({"created_at": finished_at, "status": "succeeded", "message": "训练完成"})
+            else:
+                job["error"] = {"message": "模拟的训练失败"}
+                events.append({"created_at": finished_at, "status": "failed", "message": "训练失败"})
+        else:
+            job["estimated_finish"] = finished_at
+
+        job["events"] = [
+            {"object": "fine_tuning.job.event", "id": f"{job_id}-ev{i}", "level": "info",
+             "type": "status", "data": {"status": event["status"]},
+             "created_at": event["created_at"], "message": event["message"]}
+            for i, event in enumerate(events)
+        ]
+        return job
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """请求处理器，路由表见模块文档"""
+
+    server_version = "XPULinkMock/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if getattr(self.server, "verbose", False):
+            super().log_message(format, *args)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str) -> None:
+        self._send_json(status, {"error": {"message": message, "type": "invalid_request_error"}})
+
+    def _json_body(self) -> Dict[str, Any]:
+        body = self._read_body()
+        return json.loads(body) if body else {}
+
+    def _route(self, method: str) -> Optional[Tuple[Any, tuple]]:
+        path = self.path.split("?", 1)[0].rstrip("/")
+        for route_method, pattern, handler in self.ROUTES:
+            if route_method != method:
+                continue
+            match = re.fullmatch(pattern, path)
+            if match:
+                return handler, match.groups()
+        return None
+
+    def _dispatch(self, method: str) -> None:
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        route = self._route(method)
+        if route is None:
+            self._read_body()
+            self._send_error(404, f"未找到接口: {method} {self.path}")
+            return
+        handler, args = route
+        try:
+            handler(self, *args)
+        except (ValueError, KeyError, json.JSONDecodeError) as e:
+            self._send_error(400, f"请求格式错误: {e}")
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    # ------------------------------------------------------------------ 文件
+
+    def create_file(self) -> None:
+        fields = parse_multipart(self._read_body(), self.headers.get("Content-Type", ""))
+        upload = fields["file"]
+        purpose = fields.get("purpose", {}).get("data", b"fine-tune").decode("utf-8")
+        self._send_json(200, self.state.add_file(upload["filename"] or "file", purpose, upload["data"]))
+
+    def get_file(self, file_id: str) -> None:
+        entry = self.state.files.get(file_id)
+        if entry is None:
+            self._send_error(404, f"文件不存在: {file_id}")
+            return
+        self._send_json(200, entry["object"])
+
+    # -------------------------------------------------------------- 分片上传
+
+    def create_upload(self) -> None:
+        payload = self._json_body()
+        upload = {
+            "id": _new_id("upload"),
+            "object": "upload",
+            "bytes": int(payload["bytes"]),
+            "filename": payload["filename"],
+            "purpose": payload.get("purpose", "fine-tune"),
+            "status": "pending",
+            "created_at": int(time.time()),
+            "expires_at": int(time.time()) + 3600,
+            "file": None,
+        }
+        with self.state.lock:
+            self.state.uploads[upload["id"]] = {"object": upload, "parts": {}}
+        self._send_json(200, upload)
+
+    def add_upload_part(self, upload_id: str) -> None:
+        body = self._read_body()
+        entry = self.state.uploads.get(upload_id)
+        if entry is None or entry["object"]["status"] != "pending":
+            self._send_error(404, f"上传会话不存在或已结束: {upload_id}")
+            return
+        if self.state.should_fail():
+            self._send_error(500, "模拟的服务端错误")
+            return
+        fields = parse_multipart(body, self.headers.get("Content-Type", ""))
+        part = {
+            "id": _new_id("part"),
+            "object": "upload.part",
+            "created_at": int(time.time()),
+            "upload_id": upload_id,
+        }
+        with self.state.lock:
+            entry["parts"][part["id"]] = fields["data"]["data"]
+        self._send_json(200, part)
+
+    def complete_upload(self, upload_id: str) -> None:
+        payload = self._json_body()
+        entry = self.state.uploads.get(upload_id)
+        if entry is None or entry["object"]["status"] != "pending":
+            self._send_error(404, f"上传会话不存在或已结束: {upload_id}")
+            return
+
+        missing = [part_id for part_id in payload["part_ids"] if part_id not in entry["parts"]]
+        if missing:
+            self._send_error(400, f"未知的分片: {missing[:3]}")
+            return
+        data = b"".join(entry["parts"][part_id] for part_id in payload["part_ids"])
+        upload = entry["object"]
+        if len(data) != upload["bytes"]:
+            self._send_error(400, f"字节数不匹配: 期望 {upload['bytes']}, 实际 {len(data)}")
+            return
+        if payload.get("md5") and hashlib.md5(data).hexdigest() != payload["md5"]:
+            self._send_error(400, "md5 校验失败")
+            return
+
+        upload["status"] = "completed"
+        upload["file"] = self.state.add_file(upload["filename"], upload["purpose"], data)
+        entry["parts"].clear()
+        self._send_json(200, upload)
+
+    # -------------------------------------------------------------- 微调任务
+
+    def create_job(self) -> None:
+        payload = self._json_body()
+        if payload["training_file"] not in self.state.files:
+            self._send_error(400, f"训练文件不存在: {payload['training_file']}")
+            return
+        job = {
+            "id": _new_id("ftjob"),
+            "object": "fine_tuning.job",
+            "model": payload["model"],
+            "training_file": payload["training_file"],
+            "hyperparameters": payload.get("hyperparameters", {}),
+            "suffix": payload.get("suffix"),
+            "status": "queued",
+            "created_at": time.time(),
+            "finished_at": None,
+            "fine_tuned_model": None,
+        }
+        suffix = payload.get("suffix") or ""
+        with self.state.lock:
+            self.state.jobs[job["id"]] = {
+                "job": job,
+                "queue_seconds": self.state.job_queue_seconds,
+                "run_seconds": self.state.job_run_seconds,
+                "final_status": "failed" if "fail" in suffix else "succeeded",
+            }
+        self._send_json(200, job)
+
+    def list_jobs(self) -> None:
+        jobs = [self.state.job_snapshot(job_id) for job_id in list(self.state.jobs)]
+        for job in jobs:
+            job.pop("events")
+        jobs.sort(key=lambda job: job["created_at"], reverse=True)
+        self._send_json(200, {"object": "list", "data": jobs, "has_more": False})
+
+    def get_job(self, job_id: str) -> None:
+        job = self.state.job_snapshot(job_id)
+        if job is None:
+            self._send_error(404, f"任务不存在: {job_id}")
+            return
+        job.pop("events")
+        self._send_json(200, job)
+
+    def job_events(self, job_id: str) -> None:
+        job = self.state.job_snapshot(job_id)
+        if job is None:
+            self._send_error(404, f"任务不存在: {job_id}")
+            return
+        if "stream=true" not in self.path:
+            self._send_json(200, {"object": "list", "data": job["events"][::-1], "has_more": False})
+            return
+
+        # SSE：推送已有事件，之后每当状态变化时推送新事件，任务结束后发送 [DONE]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        sent = 0
+        try:
+            while True:
+                job = self.state.job_snapshot(job_id)
+                for event in job["events"][sent:]:
+                    self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                sent = len(job["events"])
+                self.wfile.flush()
+                if job["status"] in ("succeeded", "failed", "cancelled"):
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                    return
+                time.sleep(0.05)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    # ------------------------------------------------------------------ 对话
+
+    @staticmethod
+    def _count_tokens(text: str) -> int:
+        # 粗略估算：约 2 个字符一个 token
+        return max(1, len(text) // 2)
+
+    def _mock_answer(self, model: str, messages: list, max_tokens: int) -> str:
+        prompt = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        digest = hashlib.md5(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+        pieces = [f"[{model}] 关于“{prompt[:40]}”的模拟回答 {digest[:8]}。"]
+        length = len(pieces[0])
+        # 回答长度接近 max_tokens（最多 512 token）
+        while length // 2 < min(max_tokens, 512):
+            piece = f" 补充说明 {digest[length % 24:][:8]}。"
+            pieces.append(piece)
+            length += len(piece)
+        return "".join(pieces)
+
+    def _send_chat_stream(self, model: str, answer: str, prompt_tokens: int) -> None:
+        completion_id = _new_id("chatcmpl")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(chunk: Dict[str, Any]) -> None:
+            chunk.update({"id": completion_id, "object": "chat.completion.chunk",
+                          "created": int(time.time()), "model": model})
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            # 每 2 个字符作为一个 token 推送
+            pieces = [answer[i:i + 2] for i in range(0, len(answer), 2)]
+            for i, piece in enumerate(pieces):
+                delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+                send({"choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                time.sleep(1 / self.state.tokens_per_second)
+            send({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            send({"choices": [], "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+                                            "total_tokens": prompt_tokens + len(pieces)}})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def chat_completions(self) -> None:
+        payload = self._json_body()
+        status = self.state.chat_error()
+        if status is not None:
+            if status == 429:
+                self.send_response(429)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            else:
+                self._send_error(status, "模拟的服务端错误")
+            return
+
+        messages = payload["messages"]
+        model = payload["model"]
+        answer = self._mock_answer(model, messages, int(payload.get("max_tokens") or 256))
+        prompt_tokens = sum(self._count_tokens(m.get("content") or "") for m in messages)
+        completion_tokens = self._count_tokens(answer)
+
+        slots = self.state.chat_slots
+        if slots is not None:
+            slots.acquire()
+        try:
+            # 预填充按生成速度的 10 倍估算
+            time.sleep(prompt_tokens / (self.state.tokens_per_second * 10))
+            if payload.get("stream"):
+                self._send_chat_stream(model, answer, prompt_tokens)
+                return
+            time.sleep(completion_tokens / self.state.tokens_per_second)
+        finally:
+            if slots is not None:
+                slots.release()
+
+        self._send_json(200, {
+            "id": _new_id("chatcmpl"),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    ROUTES = [
+        ("POST", r"/v1/files", create_file),
+        ("GET", r"/v1/files/([^/]+)", get_file),
+        ("POST", r"/v1/uploads", create_upload),
+        ("POST", r"/v1/uploads/([^/]+)/parts", add_upload_part),
+        ("POST", r"/v1/uploads/([^/]+)/complete", complete_upload),
+        ("POST", r"/v1/fine_tuning/jobs", create_job),
+        ("GET", r"/v1/fine_tuning/jobs", list_jobs),
+        ("GET", r"/v1/fine_tuning/jobs/([^/]+)", get_job),
+        ("GET", r"/v1/fine_tuning/jobs/([^/]+)/events", job_events),
+        ("POST", r"/v1/chat/completions", chat_completions),
+    ]
+
+
+def start_mock_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    verbose: bool = False,
+    **state_kwargs: Any
+) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    在后台线程中启动模拟服务
+
+    Args:
+        host: 监听地址
+        port: 监听端口（0 表示随机端口）
+        verbose: 是否打印请求日志
+        **state_kwargs: 传给 MockState 的参数
+
+    Returns:
+        (服务对象, base_url)，结束时调用 server.shutdown()
+    """
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(**state_kwargs)
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XPULink API 本地模拟服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口")
+    parser.add_argument("--part-failure-rate", type=float, default=0.0,
+                        help="分片上传随机失败的比例，用于测试重试")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求额外延迟（秒）")
+    parser.add_argument("--job-queue-seconds", type=float, default=1.0, help="微调任务排队时长（秒）")
+    parser.add_argument("--job-run-seconds", type=float, default=5.0, help="微调任务运行时长（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="模拟的生成速度（token/秒）")
+    parser.add_argument("--chat-error-rate", type=float, default=0.0,
+                        help="对话请求返回 429/500 的比例，用于测试重试和错误统计")
+    parser.add_argument("--chat-slots", type=int, default=0,
+                        help="同时生成的最大对话请求数，超出的排队（0 表示不限制）")
+    parser.add_argument("--verbose", action="store_true", help="打印请求日志")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(
+        part_failure_rate=args.part_failure_rate,
+        latency=args.latency,
+        job_queue_seconds=args.job_queue_seconds,
+        job_run_seconds=args.job_run_seconds,
+        tokens_per_second=args.tokens_per_second,
+        chat_error_rate=args.chat_error_rate,
+        chat_slots=args.chat_slots
+    )
+    server.verbose = args.verbose
+    print(f"🚀 模拟服务已启动: http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 模拟服务已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,420 @@
+"""
+XPULink 文本生成接口测试
+
+不带参数运行时发送一个对话请求,检查云端模型能否正常跑通:
+    python text_model.py
+
+load 子命令对接口做压测,在上线前确认实际容量:
+    # 闭环: 16 个并发用户,每个用户收到回答后立即发下一个请求,持续 60 秒
+    python text_model.py load --mode closed --concurrency 16 --duration 60
+
+    # 开环: 按泊松过程每秒到达 5 个请求,不论之前的请求是否完成
+    python text_model.py load --mode open --rate 5 --duration 60 \\
+        --prompt-tokens 100:1000 --max-tokens 64,128,256
+
+    # 对本地模拟服务压测
+    python mock_server.py --port 8000 --chat-slots 8 &
+    python text_model.py load --base-url http://127.0.0.1:8000/v1 --api-key test
+
+长度分布的写法: "128"(固定值)、"100:1000"(均匀分布的整数)、"64,128,256"(从中随机选取)。
+压测使用流式输出,报告吞吐量、首 token 延迟(TTFT)、token 间延迟、端到端延迟的
+P50/P95/P99 以及按类型分类的错误率。
+"""
+
+import argparse
+import asyncio
+import json
 import os
-import requests
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
 
-# 从环境变量读取 API Key
-API_KEY = os.getenv("XPULINK_API_KEY")
-if not API_KEY:
-    raise ValueError("请在环境变量中设置 XPULINK_API_KEY")
+import requests
 
 # 云端模型接口信息
 MODEL_NAME = "qwen3-32b"
-BASE_URL = "https://www.xpulink.ai/v1/chat/completions"
-
-# 构造请求头
-headers = {
-    "Authorization": f"Bearer {API_KEY}",
-    "Content-Type": "application/json"
-}
-
-# 构造请求体
-payload = {
-    "model": MODEL_NAME,
-    "messages": [
-        {"role": "user", "content": "你好，请简单介绍一下你自己。"}
-    ],
-    "max_tokens": 50,
-    "temperature": 0.7
-}
-
-# 发送请求并打印结果
-try:
-    response = requests.post(BASE_URL, headers=headers, json=payload, timeout=30)
-    response.raise_for_status()
-    result = response.json()
-    print("模型返回内容：", result["choices"][0]["message"]["content"])
-    print("测试通过！云端模型可正常跑通。")
-except Exception as e:
-    print("测试失败：", e)
+BASE_URL = "https://www.xpulink.ai/v1"
+
+# 构造压测提示词的词表(每个词约 1 个 token)
+PROMPT_WORDS = ["data", "model", "token", "cloud", "system", "design", "memory", "network",
+                "query", "index", "cache", "server", "vector", "stream", "batch", "latency"]
+
+
+def smoke_test(api_key: str, base_url: str = BASE_URL, model: str = MODEL_NAME) -> bool:
+    """发送一个对话请求,检查云端模型能否正常跑通"""
+    # 构造请求头
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+    # 构造请求体
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "user", "content": "你好，请简单介绍一下你自己。"}
+        ],
+        "max_tokens": 50,
+        "temperature": 0.7
+    }
+
+    # 发送请求并打印结果
+    try:
+        response = requests.post(f"{base_url}/chat/completions", headers=headers, json=payload, timeout=30)
+        response.raise_for_status()
+        result = response.json()
+        print("模型返回内容：", result["choices"][0]["message"]["content"])
+        print("测试通过！云端模型可正常跑通。")
+        return True
+    except Exception as e:
+        print("测试失败：", e)
+        return False
+
+
+class Distribution:
+    """整数分布:固定值、均匀分布或从候选值中随机选取"""
+
+    def __init__(self, spec: str):
+        """
+        Args:
+            spec: "128"、"100:1000" 或 "64,128,256"
+        """
+        self.spec = spec
+        if ":" in spec:
+            low, high = (int(x) for x in spec.split(":", 1))
+            if low > high:
+                raise ValueError(f"分布的下限大于上限: {spec}")
+            self._sample = lambda rng: rng.randint(low, high)
+        elif "," in spec:
+            choices = [int(x) for x in spec.split(",")]
+            self._sample = lambda rng: rng.choice(choices)
+        else:
+            value = int(spec)
+            self._sample = lambda rng: value
+
+    def sample(self, rng: random.Random) -> int:
+        return self._sample(rng)
+
+    def __repr__(self) -> str:
+        return self.spec
+
+
+def make_prompt(n_tokens: int, rng: random.Random) -> str:
+    """生成约 n_tokens 个 token 的提示词,开头带随机编号以避免命中服务端的前缀缓存"""
+    words = " ".join(rng.choice(PROMPT_WORDS) for _ in range(max(0, n_tokens - 8)))
+    return f"#{rng.getrandbits(32):08x} Summarize the following words in one paragraph: {words}"
+
+
+def _error_kind(status: int) -> str:
+    if status == 429:
+        return "http_429"
+    if status >= 500:
+        return "http_5xx"
+    return "http_4xx"
+
+
+async def send_request(
+    session: "aiohttp.ClientSession",
+    url: str,
+    model: str,
+    prompt: str,
+    max_tokens: int,
+    scheduled: float
+) -> Dict[str, Any]:
+    """
+    发送一个流式对话请求并记录时间点
+
+    Args:
+        session: aiohttp 会话
+        url: /chat/completions 地址
+        model: 模型名称
+        prompt: 提示词
+        max_tokens: 最大生成 token 数
+        scheduled: 计划发送时间(开环模式下延迟从该时间算起,包含客户端排队)
+
+    Returns:
+        dict: 是否成功、错误类型、TTFT、token 间隔、端到端延迟和 token 数
+    """
+    import aiohttp
+
+    record = {"ok": False, "error": None, "scheduled": scheduled, "start": time.perf_counter(),
+              "ttft": None, "itl": [], "e2e": None, "output_tokens": 0, "prompt_tokens": None}
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": max_tokens,
+        "temperature": 0.7,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+    chunks = 0
+    last_token = None
+    usage = None
+    done = False
+    try:
+        async with session.post(url, json=payload) as response:
+            if response.status != 200:
+                await response.read()
+                record["error"] = _error_kind(response.status)
+                return record
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    done = True
+                    break
+                chunk = json.loads(data)
+                usage = chunk.get("usage") or usage
+                choices = chunk.get("choices") or []
+                if not choices or not choices[0].get("delta", {}).get("content"):
+                    continue
+                now = time.perf_counter()
+                if last_token is None:
+                    record["ttft"] = now - scheduled
+                else:
+                    record["itl"].append(now - last_token)
+                last_token = now
+                chunks += 1
+    except asyncio.TimeoutError:
+        record["error"] = "timeout"
+        return record
+    except aiohttp.ClientConnectionError:
+        record["error"] = "connection"
+        return record
+    except (aiohttp.ClientError, json.JSONDecodeError, UnicodeDecodeError):
+        record["error"] = "stream_error"
+        return record
+
+    if not done or last_token is None:
+        record["error"] = "stream_error"
+        return record
+    record["ok"] = True
+    record["e2e"] = time.perf_counter() - scheduled
+    record["output_tokens"] = (usage or {}).get("completion_tokens") or chunks
+    record["prompt_tokens"] = (usage or {}).get("prompt_tokens")
+    return record
+
+
+async def run_load(
+    base_url: str,
+    api_key: str,
+    model: str = MODEL_NAME,
+    mode: str = "closed",
+    concurrency: int = 8,
+    rate: float = 1.0,
+    duration: float = 30.0,
+    max_requests: Optional[int] = None,
+    prompt_tokens: str = "256",
+    max_tokens: str = "128",
+    timeout: float = 120.0,
+    max_in_flight: int = 1000,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    运行压测
+
+    Args:
+        base_url: API 基础地址
+        api_key: API 密钥
+        model: 模型名称
+        mode: "closed"(固定并发,收到回答后再发下一个)或 "open"(按泊松过程以固定速率发送)
+        concurrency: 闭环模式的并发用户数
+        rate: 开环模式的平均请求速率(请求/秒)
+        duration: 发送请求的时长(秒),之后等待在途请求完成
+        max_requests: 最多发送的请求数
+        prompt_tokens: 提示词长度分布
+        max_tokens: max_tokens 分布
+        timeout: 单个请求的超时时间(秒)
+        max_in_flight: 开环模式的最大在途请求数,超出时丢弃新请求并记为 client_overload
+        seed: 随机种子
+
+    Returns:
+        summarize_load 的结果
+    """
+    import aiohttp
+
+    rng = random.Random(seed)
+    prompt_dist, max_tokens_dist = Distribution(prompt_tokens), Distribution(max_tokens)
+    url = f"{base_url.rstrip('/')}/chat/completions"
+    records: List[Dict[str, Any]] = []
+    sent = 0
+
+    def next_request():
+        return make_prompt(prompt_dist.sample(rng), rng), max_tokens_dist.sample(rng)
+
+    def budget_left(now: float) -> bool:
+        return now < deadline and (max_requests is None or sent < max_requests)
+
+    connector = aiohttp.TCPConnector(limit=concurrency if mode == "closed" else max_in_flight)
+    headers = {"Authorization": f"Bearer {api_key}"}
+    async with aiohttp.ClientSession(connector=connector, headers=headers,
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        start = time.perf_counter()
+        deadline = start + duration
+
+        if mode == "closed":
+            async def user():
+                nonlocal sent
+                while budget_left(time.perf_counter()):
+                    sent += 1
+                    prompt, tokens = next_request()
+                    records.append(await send_request(session, url, model, prompt, tokens, time.perf_counter()))
+
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+        elif mode == "open":
+            in_flight = set()
+            scheduled = start
+            while True:
+                scheduled += rng.expovariate(rate)
+                if not budget_left(scheduled):
+                    break
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                sent += 1
+                if len(in_flight) >= max_in_flight:
+                    records.append({"ok": False, "error": "client_overload", "scheduled": scheduled, "start": scheduled,
+                                    "ttft": None, "itl": [], "e2e": None, "output_tokens": 0, "prompt_tokens": None})
+                    continue
+                prompt, tokens = next_request()
+                task = asyncio.ensure_future(send_request(session, url, model, prompt, tokens, scheduled))
+                task.add_done_callback(lambda t: (in_flight.discard(t), records.append(t.result())))
+                in_flight.add(task)
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        else:
+            raise ValueError(f"未知的压测模式: {mode}")
+
+        elapsed = time.perf_counter() - start
+
+    config = {"model": model, "mode": mode, "concurrency": concurrency if mode == "closed" else None,
+              "rate": rate if mode == "open" else None, "duration": duration,
+              "prompt_tokens": prompt_tokens, "max_tokens": max_tokens}
+    return summarize_load(records, elapsed, config)
+
+
+def _percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    values = sorted(values)
+
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q / 100 * len(values)))] * 1000, 1)
+
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99),
+            "mean": round(sum(values) / len(values) * 1000, 1)}
+
+
+def summarize_load(records: List[Dict[str, Any]], elapsed: float, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    汇总压测结果
+
+    Returns:
+        dict: 吞吐量、延迟分位数(毫秒)和错误分类
+    """
+    ok = [r for r in records if r["ok"]]
+    errors: Dict[str, int] = {}
+    for r in records:
+        if r["error"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    output_tokens = sum(r["output_tokens"] for r in ok)
+    return {
+        "config": config,
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": len(records),
+        "succeeded": len(ok),
+        "error_rate": round(1 - len(ok) / len(records), 4) if records else None,
+        "errors": errors,
+        "requests_per_second": round(len(ok) / elapsed, 2) if elapsed else None,
+        "output_tokens_per_second": round(output_tokens / elapsed, 1) if elapsed else None,
+        "output_tokens": output_tokens,
+        "ttft_ms": _percentiles([r["ttft"] for r in ok]),
+        "itl_ms": _percentiles([gap for r in ok for gap in r["itl"]]),
+        "e2e_ms": _percentiles([r["e2e"] for r in ok]),
+    }
+
+
+def print_load_report(report: Dict[str, Any]):
+    """打印压测报告"""
+    config = report["config"]
+    load = (f"{config['concurrency']} 并发" if config["mode"] == "closed"
+            else f"{config['rate']} 请求/秒")
+    print("=" * 60)
+    print(f"🚦 压测结果: {config['model']}, {config['mode']} 模式, {load}")
+    print(f"   提示词 {config['prompt_tokens']} token, max_tokens {config['max_tokens']}")
+    print("=" * 60)
+    print(f"  - 请求数: {report['requests']}, 成功: {report['succeeded']}, 耗时 {report['elapsed_seconds']} 秒")
+    print(f"  - 吞吐量: {report['requests_per_second']} 请求/秒, {report['output_tokens_per_second']} 输出 token/秒")
+    for key, label in [("ttft_ms", "首 token 延迟"), ("itl_ms", "token 间延迟"), ("e2e_ms", "端到端延迟")]:
+        stats = report[key]
+        if stats:
+            print(f"  - {label}: P50 {stats['p50']} ms, P95 {stats['p95']} ms, "
+                  f"P99 {stats['p99']} ms, 平均 {stats['mean']} ms")
+
+    if report["errors"]:
+        print(f"\n❌ 错误率: {report['error_rate']:.2%}")
+        for kind, count in sorted(report["errors"].items(), key=lambda item: -item[1]):
+            print(f"  - {kind}: {count} ({count / report['requests']:.2%})")
+    print("=" * 60)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="XPULink 文本生成接口测试与压测")
+    parser.add_argument("--base-url", default=BASE_URL, help="API 基础地址")
+    parser.add_argument("--api-key", default=None, help="API 密钥(默认读取环境变量 XPULINK_API_KEY)")
+    parser.add_argument("--model", default=MODEL_NAME, help="模型名称")
+    subparsers = parser.add_subparsers(dest="command")
+
+    load = subparsers.add_parser("load", help="压测")
+    load.add_argument("--mode", choices=["closed", "open"], default="closed", help="闭环或开环")
+    load.add_argument("--concurrency", type=int, default=8, help="闭环模式的并发用户数")
+    load.add_argument("--rate", type=float, default=1.0, help="开环模式的平均请求速率(请求/秒)")
+    load.add_argument("--duration", type=float, default=30.0, help="发送请求的时长(秒)")
+    load.add_argument("--requests", type=int, default=None, help="最多发送的请求数")
+    load.add_argument("--prompt-tokens", default="256", help="提示词长度分布")
+    load.add_argument("--max-tokens", default="128", help="max_tokens 分布")
+    load.add_argument("--timeout", type=float, default=120.0, help="单个请求的超时时间(秒)")
+    load.add_argument("--max-in-flight", type=int, default=1000, help="开环模式的最大在途请求数")
+    load.add_argument("--seed", type=int, default=0, help="随机种子")
+    load.add_argument("--output", default=None, help="把报告保存为 JSON 文件")
+
+    # 公共参数也可以写在子命令之后
+    for option in ("--base-url", "--api-key", "--model"):
+        load.add_argument(option, default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+
+    args = parser.parse_args(argv)
+
+    # 从环境变量读取 API Key
+    api_key = args.api_key or os.getenv("XPULINK_API_KEY")
+    if not api_key:
+        raise ValueError("请在环境变量中设置 XPULINK_API_KEY")
+
+    if args.command != "load":
+        return 0 if smoke_test(api_key, args.base_url, args.model) else 1
+
+    report = asyncio.run(run_load(
+        base_url=args.base_url,
+        api_key=api_key,
+        model=args.model,
+        mode=args.mode,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        duration=args.duration,
+        max_requests=args.requests,
+        prompt_tokens=args.prompt_tokens,
+        max_tokens=args.max_tokens,
+        timeout=args.timeout,
+        max_in_flight=args.max_in_flight,
+        seed=args.seed
+    ))
+    print_load_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 报告已保存到: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+"""
+XPULink 客户端的自适应并发控制与熔断
+
+所有调用 XPULink 的客户端(DeviceMonitorAgent、EmbeddingClient、XPULinkLoRAFineTuner)
+共用同一套客户端流控:
+- AIMDLimiter: 在途请求上限按 AIMD 调整。请求成功且接口被充分利用时每个往返
+  加 1,遇到 429/503/504 或超时时乘以 backoff_ratio(每个往返最多降一次)。
+  可选的延迟触发(latency_tolerance):延迟超过基线(最近两个窗口内的最小延迟)
+  的若干倍时也降低上限,只适合请求大小相近的接口;对话和上传接口的请求长短
+  差别很大,长请求会被误判为拥塞,因此默认关闭。
+- CircuitBreaker: 连续失败或窗口内失败率过高时打开,在 reset_timeout 内直接抛出
+  CircuitOpenError,不再发请求;之后放行少量探测请求,成功则恢复。
+- AdaptiveController: 组合以上两者,通过 call() 包装一次请求。同一接口的多个
+  客户端通过 get_controller(name) 共享同一个控制器。
+
+使用示例:
+    controller = get_controller("xpulink-chat")
+    response = controller.call(requests.post, url, json=payload, timeout=60)
+    print_controller_stats()
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+# 请求结果分类
+SUCCESS = "success"            # 成功
+OVERLOAD = "overload"          # 过载: 429/503/504 或超时
+ERROR = "error"                # 服务端错误或连接失败
+CLIENT_ERROR = "client_error"  # 4xx: 请求本身有问题,不说明服务端不健康
+
+OVERLOAD_STATUS_CODES = {429, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开时快速失败"""
+
+
+def classify_response(response: Any) -> str:
+    """按 HTTP 状态码对响应分类(没有 status_code 的返回值视为成功)"""
+    status = getattr(response, "status_code", None)
+    if status is None:
+        status = getattr(response, "status", None)
+    if status is None or status < 400:
+        return SUCCESS
+    if status in OVERLOAD_STATUS_CODES:
+        return OVERLOAD
+    if status >= 500:
+        return ERROR
+    return CLIENT_ERROR
+
+
+def classify_exception(error: BaseException) -> str:
+    """对请求异常分类: 超时视为过载,其他视为错误"""
+    if isinstance(error, TimeoutError) or "Timeout" in type(error).__name__:
+        return OVERLOAD
+    return ERROR
+
+
+class AIMDLimiter:
+    """AIMD 在途请求上限"""
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff_ratio: float = 0.7,
+        latency_tolerance: Optional[float] = None,
+        window_size: int = 100
+    ):
+        """
+        Args:
+            initial_limit: 初始上限
+            min_limit: 最小上限
+            max_limit: 最大上限
+            backoff_ratio: 过载时上限乘以该系数
+            latency_tolerance: 延迟超过基线的多少倍视为拥塞,None 表示只按 429/503/504
+                和超时降低上限(请求大小差别很大时应保持 None)
+            window_size: 计算基线延迟的窗口大小(请求数)
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.window_size = window_size
+
+        self._limit = float(initial_limit)
+        self._inflight = 0
+        self._cond = threading.Condition()
+        self._window_min = math.inf
+        self._previous_window_min = math.inf
+        self._window_count = 0
+        self._last_decrease = 0.0
+        self.stats = {"requests": 0, "increases": 0, "decreases": 0, "wait_seconds": 0.0}
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    @property
+    def baseline(self) -> Optional[float]:
+        """基线延迟(秒),样本不足时为 None"""
+        baseline = min(self._window_min, self._previous_window_min)
+        return baseline if baseline != math.inf else None
+
+    def acquire(self, timeout: Optional[float] = None) -> int:
+        """
+        等待一个名额
+
+        Returns:
+            获得名额后的在途请求数
+        """
+        start = time.monotonic()
+        with self._cond:
+            while self._inflight >= self.limit:
+                remaining = None if timeout is None else timeout - (time.monotonic() - start)
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"等待并发名额超时 (上限 {self.limit})")
+                self._cond.wait(remaining)
+            self._inflight += 1
+            self.stats["requests"] += 1
+            self.stats["wait_seconds"] += time.monotonic() - start
+            return self._inflight
+
+    def release(self, latency: float, outcome: str, inflight_at_start: int) -> None:
+        """
+        归还名额并根据结果调整上限
+
+        Args:
+            latency: 请求耗时(秒)
+            outcome: 请求结果分类
+            inflight_at_start: 发出请求时的在途请求数
+        """
+        with self._cond:
+            self._inflight -= 1
+            now = time.monotonic()
+            if outcome == OVERLOAD:
+                self._decrease(now, self.baseline or latency)
+            elif outcome == SUCCESS:
+                baseline = self.baseline
+                self._observe(latency)
+                if (self.latency_tolerance is not None and baseline is not None
+                        and latency > self.latency_tolerance * baseline):
+                    self._decrease(now, baseline)
+                elif inflight_at_start * 2 >= self._limit:
+                    # 只有接口被充分利用时才加大上限,每个往返约加 1
+                    new_limit = min(self.max_limit, self._limit + 1 / self._limit)
+                    if int(new_limit) > int(self._limit):
+                        self.stats["increases"] += 1
+                    self._limit = new_limit
+            self._cond.notify_all()
+
+    def _observe(self, latency: float) -> None:
+        self._window_min = min(self._window_min, latency)
+        self._window_count += 1
+        if self._window_count >= self.window_size:
+            self._previous_window_min = self._window_min
+            self._window_min = math.inf
+            self._window_count = 0
+
+    def _decrease(self, now: float, rtt: float) -> None:
+        # 同一个往返内的多个过载信号只降一次
+        if now - self._last_decrease < rtt:
+            return
+        self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+        self._last_decrease = now
+        self.stats["decreases"] += 1
+
+
+class CircuitBreaker:
+    """熔断器: closed(正常) → open(快速失败) → half_open(探测) → closed"""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        failure_rate_threshold: float = 0.5,
+        window_size: int = 20,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后打开
+            failure_rate_threshold: 窗口内失败率达到多少后打开
+            window_size: 计算失败率的窗口大小(请求数)
+            reset_timeout: 打开后多久开始探测(秒)
+            half_open_max_calls: 探测阶段同时放行的请求数
+        """
+        self.failure_threshold = failure_threshold
+        self.failure_rate_threshold = failure_rate_threshold
+        self.window_size = window_size
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = "closed"
+        self._lock = threading.Lock()
+        self._window: deque = deque(maxlen=window_size)
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def before_call(self) -> None:
+        """请求前检查,熔断时抛出 CircuitOpenError"""
+        with self._lock:
+            if self.state == "open":
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpenError(f"接口暂时不可用,熔断中 (约 {remaining:.0f} 秒后重试)")
+                self.state = "half_open"
+                self._half_open_calls = 0
+            if self.state == "half_open":
+                if self._half_open_calls >= self.half_open_max_calls:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpenError("接口暂时不可用,正在探测是否恢复")
+                self._half_open_calls += 1
+
+    def release_probe(self) -> None:
+        """放弃一次已放行但未发出的请求(如等待并发名额超时),归还探测名额"""
+        with self._lock:
+            if self.state == "half_open" and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record(self, outcome: str) -> None:
+        """记录请求结果"""
+        failed = outcome in (OVERLOAD, ERROR)
+        with self._lock:
+            if self.state == "half_open":
+                if failed:
+                    self._open()
+                else:
+                    self.state = "closed"
+                    self._window.clear()
+                    self._consecutive_failures = 0
+                return
+
+            self._window.append(failed)
+            self._consecutive_failures = self._consecutive_failures + 1 if failed else 0
+            failure_rate = sum(self._window) / len(self._window)
+            if (self._consecutive_failures >= self.failure_threshold
+                    or (len(self._window) >= self.window_size and failure_rate >= self.failure_rate_threshold)):
+                self._open()
+
+    def _open(self) -> None:
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._window.clear()
+        self._consecutive_failures = 0
+        self.stats["opened"] += 1
+
+
+class AdaptiveController:
+    """自适应并发上限 + 熔断器"""
+
+    def __init__(
+        self,
+        name: str = "xpulink",
+        limiter: Optional[AIMDLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        acquire_timeout: Optional[float] = None
+    ):
+        """
+        Args:
+            name: 控制器名称
+            limiter: 并发上限(默认 AIMDLimiter())
+            breaker: 熔断器(默认 CircuitBreaker())
+            acquire_timeout: 等待名额的最长时间(秒),None 表示一直等待
+        """
+        self.name = name
+        self.limiter = limiter if limiter is not None else AIMDLimiter()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.acquire_timeout = acquire_timeout
+        self.outcomes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        在流控下执行一次请求
+
+        Args:
+            fn: 发送请求的函数(如 requests.post),返回值按状态码分类
+            *args, **kwargs: 传给 fn 的参数
+
+        Returns:
+            fn 的返回值
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+        """
+        self.breaker.before_call()
+        try:
+            inflight = self.limiter.acquire(self.acquire_timeout)
+        except BaseException:
+            # 没有发出请求,归还半开状态的探测名额
+            self.breaker.release_probe()
+            raise
+        start = time.monotonic()
+        outcome = ERROR
+        try:
+            result = fn(*args, **kwargs)
+            outcome = classify_response(result)
+            return result
+        except BaseException as e:
+            outcome = classify_exception(e)
+            raise
+        finally:
+            self.limiter.release(time.monotonic() - start, outcome, inflight)
+            self.breaker.record(outcome)
+            with self._lock:
+                self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前上限、在途请求数、基线延迟、熔断状态和各类结果计数"""
+        baseline = self.limiter.baseline
+        return {
+            "name": self.name,
+            "limit": self.limiter.limit,
+            "inflight": self.limiter.inflight,
+            "baseline_ms": round(baseline * 1000, 1) if baseline is not None else None,
+            "breaker": self.breaker.state,
+            "outcomes": dict(self.outcomes),
+            "limiter": dict(self.limiter.stats),
+            "breaker_stats": dict(self.breaker.stats),
+        }
+
+
+_controllers: Dict[str, AdaptiveController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(name: str = "xpulink", **kwargs: Any) -> AdaptiveController:
+    """
+    获取进程内共享的控制器,不存在时创建
+
+    Args:
+        name: 控制器名称,访问同一接口的客户端应使用同一个名称
+        **kwargs: 首次创建时传给 AdaptiveController 的参数
+
+    Returns:
+        AdaptiveController
+    """
+    with _controllers_lock:
+        if name not in _controllers:
+            _controllers[name] = AdaptiveController(name=name, **kwargs)
+        return _controllers[name]
+
+
+def print_controller_stats(*controllers: AdaptiveController):
+    """打印控制器状态(默认打印所有共享控制器)"""
+    controllers = controllers or tuple(_controllers.values())
+    print("=" * 60)
+    print("🚦 客户端流控状态")
+    print("=" * 60)
+    for controller in controllers:
+        snapshot = controller.snapshot()
+        baseline = f"{snapshot['baseline_ms']} ms" if snapshot["baseline_ms"] is not None else "-"
+        outcomes = ", ".join(f"{k} {v}" for k, v in sorted(snapshot["outcomes"].items())) or "无请求"
+        print(f"  - {snapshot['name']}: 上限 {snapshot['limit']}, 在途 {snapshot['inflight']}, "
+              f"基线延迟 {baseline}, 熔断器 {snapshot['breaker']}")
+        print(f"    结果: {outcomes}; 上调 {snapshot['limiter']['increases']} 次, "
+              f"下调 {snapshot['limiter']['decreases']} 次, 熔断 {snapshot['breaker_stats']['opened']} 次, "
+              f"拒绝 {snapshot['breaker_stats']['rejected']} 次")
+    print("=" * 60)